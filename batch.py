@@ -0,0 +1,339 @@
+from __future__ import annotations
+
+import glob
+import hashlib
+import json
+import logging
+import multiprocessing
+import time
+import traceback
+from collections import Counter
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+from downloader import DownloadCache, download_many
+from main import run_pipeline
+from pose_detector import DetectorConfig, MultiPoseDetector, PoseDetector, create_detector
+
+logger = logging.getLogger(__name__)
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".webm", ".m4v")
+DONE_MARKER = ".done"
+
+# Warm detector of the current worker process, created by ``_init_worker``.
+_worker_detector: Optional[PoseDetector | MultiPoseDetector] = None
+
+
+@dataclass(frozen=True)
+class BatchItem:
+    input_path: Path
+    output_dir: Path
+
+
+@dataclass
+class BatchItemResult:
+    input_path: str
+    output_dir: str
+    status: str
+    frames: int = 0
+    elapsed_s: float = 0.0
+    error: Optional[str] = None
+
+
+def collect_inputs(spec: str) -> List[Path]:
+    """Resolve a directory, glob pattern, or manifest file to a list of videos.
+
+    A directory yields the videos directly inside it. A manifest is a text
+    file with one path per line (blank lines and ``#`` comments skipped);
+    relative paths are resolved against the manifest's directory.
+    """
+
+    path = Path(spec).expanduser()
+    if path.is_dir():
+        return sorted(item for item in path.iterdir() if item.suffix.lower() in VIDEO_EXTENSIONS)
+    if path.is_file() and path.suffix.lower() not in VIDEO_EXTENSIONS:
+        inputs = []
+        for line in path.read_text(encoding="utf-8").splitlines():
+            line = line.strip()
+            if line and not line.startswith("#"):
+                entry = Path(line).expanduser()
+                inputs.append(entry if entry.is_absolute() else path.parent / entry)
+        return inputs
+    if path.is_file():
+        return [path]
+    return sorted(Path(match) for match in glob.glob(str(path), recursive=True))
+
+
+def plan_batch(inputs: List[Path], output_root: Path) -> List[BatchItem]:
+    """Give every input its own output subdirectory named after the file.
+
+    Inputs whose names collide get a short hash of their full path appended,
+    so the same file always maps to the same directory between runs.
+    """
+
+    stems = Counter(path.stem for path in inputs)
+    items = []
+    for path in inputs:
+        name = path.stem
+        if stems[name] > 1:
+            name = f"{name}-{hashlib.sha1(str(path.resolve()).encode('utf-8')).hexdigest()[:8]}"
+        items.append(BatchItem(input_path=path, output_dir=output_root / name))
+    return items
+
+
+def _init_worker(detector_config: DetectorConfig) -> None:
+    global _worker_detector
+    _worker_detector = create_detector(detector_config)
+
+
+def _process_item(item: BatchItem, target_fps: Optional[float], options: Mapping[str, Any]) -> BatchItemResult:
+    """Run the pipeline for one video with the worker's warm detector."""
+
+    item.output_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        result = run_pipeline(item.input_path, item.output_dir, target_fps, detector=_worker_detector, **options)
+    except Exception as exc:  # noqa: BLE001 - one bad file must not stop the batch
+        logger.error("Failed to process %s: %s", item.input_path, exc)
+        return BatchItemResult(
+            input_path=str(item.input_path),
+            output_dir=str(item.output_dir),
+            status="failed",
+            error="".join(traceback.format_exception_only(type(exc), exc)).strip(),
+        )
+    outcome = BatchItemResult(
+        input_path=str(item.input_path),
+        output_dir=str(item.output_dir),
+        status="completed",
+        frames=result.frames,
+        elapsed_s=result.elapsed_s,
+    )
+    (item.output_dir / DONE_MARKER).write_text(json.dumps(asdict(outcome), indent=2), encoding="utf-8")
+    return outcome
+
+
+def run_batch(
+    spec: str,
+    output_root: Path,
+    target_fps: Optional[float],
+    *,
+    workers: int = 1,
+    rerun: bool = False,
+    options: Optional[Mapping[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Process every video matched by ``spec`` on ``workers`` processes.
+
+    ``options`` are keyword arguments for ``run_pipeline``. Each worker loads
+    one ``PoseDetector`` and reuses it for all of its videos. Items whose
+    output directory has a ``.done`` marker are skipped unless ``rerun`` is
+    set. A summary of throughput and failures is written to
+    ``batch_summary.json`` in ``output_root`` and returned; it is merged
+    with the summary of earlier runs (see ``_write_summary``).
+    """
+
+    options = dict(options or {})
+    detector_config = options.setdefault("detector_config", DetectorConfig())
+    items = plan_batch(collect_inputs(spec), output_root)
+    if not items:
+        raise ValueError(f"No videos found for {spec}")
+    output_root.mkdir(parents=True, exist_ok=True)
+
+    results: List[BatchItemResult] = []
+    todo: List[BatchItem] = []
+    for item in items:
+        if not rerun and (item.output_dir / DONE_MARKER).exists():
+            results.append(BatchItemResult(str(item.input_path), str(item.output_dir), status="skipped"))
+        else:
+            todo.append(item)
+    logger.info("Batch: %d videos, %d already done, %d workers", len(items), len(items) - len(todo), workers)
+
+    started = time.perf_counter()
+    if todo and workers <= 1:
+        _init_worker(detector_config)
+        try:
+            for number, item in enumerate(todo, 1):
+                results.append(_process_item(item, target_fps, options))
+                logger.info("Batch progress: %d/%d", number, len(todo))
+        finally:
+            _worker_detector.close()
+    elif todo:
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(detector_config,),
+        ) as pool:
+            futures: Dict[Future, BatchItem] = {
+                pool.submit(_process_item, item, target_fps, options): item for item in todo
+            }
+            for number, future in enumerate(as_completed(futures), 1):
+                item = futures[future]
+                try:
+                    results.append(future.result())
+                except BrokenProcessPool as exc:
+                    results.append(
+                        BatchItemResult(str(item.input_path), str(item.output_dir), status="failed", error=repr(exc))
+                    )
+                logger.info("Batch progress: %d/%d (%s)", number, len(todo), item.input_path.name)
+    elapsed = time.perf_counter() - started
+
+    summary_path = output_root / "batch_summary.json"
+    summary = _write_summary(summary_path, results, elapsed, workers)
+    logger.info(
+        "Batch finished: %d completed, %d skipped, %d failed in %.1fs (%.1f frames/s); summary in %s",
+        summary["completed"],
+        summary["skipped"],
+        summary["failed"],
+        elapsed,
+        summary["frames_per_s"],
+        summary_path,
+    )
+    return summary
+
+
+def run_download_batch(
+    urls: Sequence[str],
+    output_root: Path,
+    target_fps: Optional[float],
+    cache: DownloadCache,
+    *,
+    download_workers: int = 2,
+    workers: int = 1,
+    rerun: bool = False,
+    cookies_from_browser: Optional[str] = None,
+    concurrent_fragments: int = 4,
+    options: Optional[Mapping[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Download ``urls`` into ``cache`` and process each video as soon as it is downloaded.
+
+    Downloads run on ``download_workers`` threads (see
+    ``downloader.download_many``) while finished videos are processed,
+    in this process with ``workers <= 1`` or on a pool of ``workers``
+    processes otherwise. Outputs go to ``output_root/<extractor>-<id>``;
+    ``.done`` markers, ``rerun``, and ``batch_summary.json`` work as in
+    ``run_batch``. Failed downloads are listed as failures.
+    """
+
+    options = dict(options or {})
+    detector_config = options.setdefault("detector_config", DetectorConfig())
+    if not urls:
+        raise ValueError("No URLs to download")
+    output_root.mkdir(parents=True, exist_ok=True)
+    logger.info("Download batch: %d URLs, %d download threads, %d workers", len(urls), download_workers, workers)
+
+    results: List[BatchItemResult] = []
+    started = time.perf_counter()
+    pool: Optional[ProcessPoolExecutor] = None
+    futures: Dict[Future, BatchItem] = {}
+    if workers > 1:
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(detector_config,),
+        )
+    else:
+        _init_worker(detector_config)
+    try:
+        downloads = download_many(
+            urls,
+            cache,
+            workers=download_workers,
+            cookies_from_browser=cookies_from_browser,
+            concurrent_fragments=concurrent_fragments,
+        )
+        for url, outcome in downloads:
+            if isinstance(outcome, BaseException):
+                error = "".join(traceback.format_exception_only(type(outcome), outcome)).strip()
+                results.append(BatchItemResult(url, "", status="failed", error=error))
+                continue
+            logger.info("Downloaded %s -> %s", url, outcome)
+            item = BatchItem(input_path=outcome, output_dir=output_root / f"{outcome.parent.name}-{outcome.stem}")
+            if not rerun and (item.output_dir / DONE_MARKER).exists():
+                results.append(BatchItemResult(str(item.input_path), str(item.output_dir), status="skipped"))
+            elif pool is not None:
+                futures[pool.submit(_process_item, item, target_fps, options)] = item
+            else:
+                results.append(_process_item(item, target_fps, options))
+        for future in as_completed(futures):
+            item = futures[future]
+            try:
+                results.append(future.result())
+            except BrokenProcessPool as exc:
+                results.append(
+                    BatchItemResult(str(item.input_path), str(item.output_dir), status="failed", error=repr(exc))
+                )
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        elif _worker_detector is not None:
+            _worker_detector.close()
+    elapsed = time.perf_counter() - started
+
+    summary_path = output_root / "batch_summary.json"
+    summary = _write_summary(summary_path, results, elapsed, workers)
+    logger.info(
+        "Download batch finished: %d completed, %d skipped, %d failed in %.1fs; summary in %s",
+        summary["completed"],
+        summary["skipped"],
+        summary["failed"],
+        elapsed,
+        summary_path,
+    )
+    return summary
+
+
+def _write_summary(path: Path, results: List[BatchItemResult], elapsed_s: float, workers: int) -> Dict[str, Any]:
+    """Summarize this run into ``path``, keeping the items of earlier runs.
+
+    Counts and throughput describe this run. Each video has one item:
+    videos skipped as already done keep the item of the run that processed
+    them, and items of earlier runs that were not part of this one stay.
+    """
+
+    summary = _summarize(results, elapsed_s, workers)
+    items = {_item_key(item): item for item in _read_summary_items(path)}
+    for item in summary["items"]:
+        key = _item_key(item)
+        if item["status"] != "skipped" or key not in items:
+            items[key] = item
+    summary["items"] = sorted(items.values(), key=lambda item: item["input_path"])
+    path.write_text(json.dumps(summary, indent=2, ensure_ascii=False), encoding="utf-8")
+    return summary
+
+
+def _read_summary_items(path: Path) -> List[Dict[str, Any]]:
+    if not path.exists():
+        return []
+    try:
+        return list(json.loads(path.read_text(encoding="utf-8")).get("items", []))
+    except (OSError, ValueError, AttributeError) as exc:
+        logger.warning("Ignoring unreadable batch summary %s: %s", path, exc)
+        return []
+
+
+def _item_key(item: Mapping[str, Any]) -> str:
+    # Failed downloads have no output directory; their URL identifies them.
+    return item["output_dir"] or item["input_path"]
+
+
+def _summarize(results: List[BatchItemResult], elapsed_s: float, workers: int) -> Dict[str, Any]:
+    statuses = Counter(result.status for result in results)
+    completed = [result for result in results if result.status == "completed"]
+    frames = sum(result.frames for result in completed)
+    return {
+        "videos": len(results),
+        "completed": statuses["completed"],
+        "skipped": statuses["skipped"],
+        "failed": statuses["failed"],
+        "workers": workers,
+        "elapsed_s": elapsed_s,
+        "frames": frames,
+        "frames_per_s": frames / elapsed_s if elapsed_s > 0 else 0.0,
+        "videos_per_min": 60.0 * len(completed) / elapsed_s if elapsed_s > 0 else 0.0,
+        "failures": [{"input_path": r.input_path, "error": r.error} for r in results if r.status == "failed"],
+        "items": [asdict(result) for result in sorted(results, key=lambda result: result.input_path)],
+    }
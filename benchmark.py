@@ -0,0 +1,322 @@
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import multiprocessing
+import platform
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from math_report import MathReportWriter
+from motion_analysis import MotionAnalyzer
+from pose_detector import DETECTOR_PROFILES, JOINT_INDEX, JOINT_NAMES, DetectorConfig, KeypointArray, PoseDetector
+from skeleton_builder import SKELETON_CONNECTIONS, SkeletonBuilder
+from video_encoder import EncoderConfig
+from video_loader import VideoLoader
+from visualizer import Visualizer
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+logger = logging.getLogger(__name__)
+
+BENCHMARK_STAGES = ("decode", "convert", "detect", "build", "analyze", "draw", "encode", "report")
+
+# Standing figure in relative frame coordinates, in ``JOINT_NAMES`` order.
+_FIGURE = np.array(
+    [
+        (0.50, 0.18),
+        (0.44, 0.30),
+        (0.56, 0.30),
+        (0.40, 0.42),
+        (0.60, 0.42),
+        (0.38, 0.53),
+        (0.62, 0.53),
+        (0.46, 0.55),
+        (0.54, 0.55),
+        (0.45, 0.70),
+        (0.55, 0.70),
+        (0.45, 0.85),
+        (0.55, 0.85),
+    ]
+)
+_CONNECTION_IDS = [(JOINT_INDEX[a], JOINT_INDEX[b]) for a, b in SKELETON_CONNECTIONS]
+
+
+@dataclass(frozen=True)
+class BenchmarkCase:
+    width: int
+    height: int
+    fps: float
+    seconds: float
+
+    @property
+    def name(self) -> str:
+        return f"{self.width}x{self.height}@{self.fps:g}fps_{self.seconds:g}s"
+
+    @property
+    def frame_count(self) -> int:
+        return int(round(self.fps * self.seconds))
+
+
+def _figure_pixels(frame_idx: int, fps: float, width: int, height: int) -> np.ndarray:
+    """Figure joints in pixels, swaying sideways and waving the arms."""
+
+    t = frame_idx / fps
+    points = _FIGURE.copy()
+    points[:, 0] += 0.15 * np.sin(2 * np.pi * 0.25 * t)
+    points[3:7, 1] -= 0.08 * (1 + np.sin(2 * np.pi * 1.0 * t))
+    return points * (width, height)
+
+
+def generate_video(path: Path, case: BenchmarkCase) -> Path:
+    """Write a synthetic clip: textured background plus a moving stick figure."""
+
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), case.fps, (case.width, case.height))
+    if not writer.isOpened():
+        raise ValueError(f"Unable to open output video for writing: {path}")
+    rng = np.random.default_rng(0)
+    gradient = np.linspace(40, 200, case.width, dtype=np.float32)[None, :, None]
+    background = np.clip(gradient + rng.normal(0, 12, (case.height, case.width, 3)), 0, 255).astype(np.uint8)
+    try:
+        for frame_idx in range(case.frame_count):
+            frame = np.roll(background, frame_idx % case.width, axis=1)
+            pixels = _figure_pixels(frame_idx, case.fps, case.width, case.height).astype(int)
+            thickness = max(2, case.height // 60)
+            for a, b in _CONNECTION_IDS:
+                cv2.line(frame, tuple(pixels[a]), tuple(pixels[b]), (30, 30, 220), thickness)
+            cv2.circle(frame, tuple(pixels[0]), 3 * thickness, (30, 30, 220), -1)
+            writer.write(frame)
+    finally:
+        writer.release()
+    return path
+
+
+class StubDetector:
+    """Stand-in for ``PoseDetector`` that returns the synthetic figure without inference."""
+
+    def __init__(self, fps: float = 30.0) -> None:
+        self.fps = fps
+        self._frame = 0
+
+    def detect_array(self, rgb_frame: np.ndarray, frame_width: int, frame_height: int) -> KeypointArray:
+        data = np.zeros((len(JOINT_NAMES), 4), dtype=np.float32)
+        data[:, :2] = _figure_pixels(self._frame, self.fps, frame_width, frame_height)
+        data[:, 3] = 0.9
+        self._frame += 1
+        return KeypointArray(data=data, valid=np.ones(len(JOINT_NAMES), dtype=bool))
+
+    def reset(self) -> None:
+        self._frame = 0
+
+    def close(self) -> None:
+        pass
+
+
+def _peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak / (1024**2 if platform.system() == "Darwin" else 1024)
+
+
+def _latency_stats(samples: Sequence[float]) -> Dict[str, float]:
+    values = np.asarray(samples, dtype=float)
+    if not values.size:
+        return {"frames": 0, "total_s": 0.0, "fps": 0.0, "mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0}
+    total = float(values.sum())
+    p50, p95 = np.percentile(values, [50, 95])
+    return {
+        "frames": int(values.size),
+        "total_s": total,
+        "fps": values.size / total if total > 0 else 0.0,
+        "mean_ms": 1000.0 * total / values.size,
+        "p50_ms": 1000.0 * float(p50),
+        "p95_ms": 1000.0 * float(p95),
+    }
+
+
+def _timed(samples: List[float], func: Callable[..., Any], *args: Any) -> Any:
+    start = time.perf_counter()
+    result = func(*args)
+    samples.append(time.perf_counter() - start)
+    return result
+
+
+def run_case(case: BenchmarkCase, work_dir: Path, detector_profile: Optional[str]) -> Dict[str, Any]:
+    """Generate the clip for ``case`` and time every pipeline stage frame by frame.
+
+    ``detector_profile=None`` uses ``StubDetector``.
+    """
+
+    case_dir = work_dir / case.name
+    case_dir.mkdir(parents=True, exist_ok=True)
+    video_path = generate_video(case_dir / "input.mp4", case)
+
+    timings: Dict[str, List[float]] = {stage: [] for stage in BENCHMARK_STAGES}
+    setup_start = time.perf_counter()
+    if detector_profile is None:
+        detector = StubDetector(case.fps)
+    else:
+        detector = PoseDetector(DetectorConfig(profile=detector_profile))
+    detector_setup_s = time.perf_counter() - setup_start
+
+    loader = VideoLoader(str(video_path), reuse_buffers=True)
+    width, height = loader.meta.width, loader.meta.height
+    builder = SkeletonBuilder(fps=loader.output_fps)
+    analyzer = MotionAnalyzer(operation_log="templates")
+    # Encode synchronously so the "encode" stage measures the encoder itself.
+    visualizer = Visualizer(
+        case_dir / "overlay.mp4",
+        loader.output_fps,
+        (width, height),
+        encoder=EncoderConfig(async_write=False),
+    )
+    writer = MathReportWriter(case_dir, operation_log="templates")
+
+    frames = loader.frames()
+    delta_t = 1.0 / loader.output_fps
+    started = time.perf_counter()
+    writer.open()
+    try:
+        while True:
+            frame = _timed(timings["decode"], next, frames, None)
+            if frame is None:
+                timings["decode"].pop()
+                break
+            rgb = _timed(timings["convert"], lambda: frame.rgb)
+            keypoints = _timed(timings["detect"], detector.detect_array, rgb, width, height)
+            skeleton = _timed(timings["build"], builder.build, keypoints, frame.timestamp_s)
+            report = _timed(timings["analyze"], analyzer.analyze, skeleton.positions, delta_t, skeleton.valid)
+            _timed(timings["draw"], visualizer.render, frame.bgr, skeleton.positions, report, skeleton.valid)
+            _timed(timings["encode"], visualizer.write, frame.bgr)
+            _timed(timings["report"], writer.write_frame, report)
+    finally:
+        writer.close()
+        visualizer.close()
+        detector.close()
+        loader.release()
+    wall_s = time.perf_counter() - started
+
+    frame_count = len(timings["decode"])
+    return {
+        "case": asdict(case),
+        "name": case.name,
+        "detector": detector_profile or "stub",
+        "frames": frame_count,
+        "wall_s": wall_s,
+        "fps": frame_count / wall_s if wall_s > 0 else 0.0,
+        "detector_setup_s": detector_setup_s,
+        "peak_rss_mb": _peak_rss_mb(),
+        "stages": {stage: _latency_stats(samples) for stage, samples in timings.items()},
+    }
+
+
+def _environment() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=Path(__file__).resolve().parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+    }
+
+
+def run_benchmark(
+    cases: Sequence[BenchmarkCase],
+    output_path: Path,
+    detector_profile: Optional[str] = None,
+    work_dir: Optional[Path] = None,
+) -> Dict[str, Any]:
+    """Run every case in a fresh process (for a clean peak RSS) and write JSON results."""
+
+    results: Dict[str, Any] = {"environment": _environment(), "cases": []}
+    with tempfile.TemporaryDirectory(prefix="video-output-bench-") as tmp_dir:
+        base_dir = Path(work_dir) if work_dir is not None else Path(tmp_dir)
+        context = multiprocessing.get_context("spawn")
+        for case in cases:
+            logger.info("Benchmark case %s (%d frames)", case.name, case.frame_count)
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                result = pool.submit(run_case, case, base_dir, detector_profile).result()
+            results["cases"].append(result)
+            logger.info(
+                "  %.1f fps end to end; %s",
+                result["fps"],
+                ", ".join(f"{stage} p50 {stats['p50_ms']:.2f}ms" for stage, stats in result["stages"].items()),
+            )
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    logger.info("Benchmark results saved to %s", output_path)
+    return results
+
+
+def _parse_resolution(value: str) -> Tuple[int, int]:
+    width, _, height = value.lower().partition("x")
+    return int(width), int(height)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark pipeline stages on synthetic videos.")
+    parser.add_argument("--output", default="benchmark.json", help="JSON results file")
+    parser.add_argument(
+        "--resolutions",
+        nargs="+",
+        default=["640x360", "1280x720", "1920x1080"],
+        help="Frame sizes as WIDTHxHEIGHT",
+    )
+    parser.add_argument("--fps", nargs="+", type=float, default=[30.0], help="Frame rates of the generated clips")
+    parser.add_argument("--seconds", nargs="+", type=float, default=[10.0], help="Lengths of the generated clips")
+    parser.add_argument(
+        "--detector",
+        choices=["stub", *DETECTOR_PROFILES],
+        default="stub",
+        help="Pose detector: 'stub' skips inference to isolate the other stages",
+    )
+    parser.add_argument("--work-dir", help="Keep generated clips and outputs here instead of a temp directory")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    cases = [
+        BenchmarkCase(width, height, fps, seconds)
+        for width, height in map(_parse_resolution, args.resolutions)
+        for fps in args.fps
+        for seconds in args.seconds
+    ]
+    run_benchmark(
+        cases,
+        Path(args.output),
+        detector_profile=None if args.detector == "stub" else args.detector,
+        work_dir=Path(args.work_dir) if args.work_dir else None,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import logging
+import math
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from gap_filling import GapFillConfig, GapFiller
+from keyframes import KeyframeConfig, KeyframeSampler, KeyframeStats
+from pose_detector import DetectorConfig, PoseDetector
+from skeleton_builder import SkeletonBuilder, SkeletonFrame
+from video_loader import VideoLoader
+
+logger = logging.getLogger(__name__)
+
+# Detector of the current worker process, created once by ``_init_worker``.
+_worker_detector: Optional[PoseDetector] = None
+
+
+@dataclass(frozen=True)
+class VideoChunk:
+    """A range of source frames processed by one worker.
+
+    Frames in ``[warmup_start, start)`` only warm up detector tracking and
+    skeleton smoothing; results are kept for ``[start, end)``. ``segment``
+    numbers the source range the chunk belongs to (``FrameData.segment``).
+    """
+
+    warmup_start: int
+    start: int
+    end: Optional[int]
+    segment: int = 0
+
+
+@dataclass(frozen=True)
+class ChunkFrame:
+    """Position of a frame processed by a worker (no image data)."""
+
+    index: int
+    timestamp_s: float
+    segment: int = 0
+
+
+def plan_chunks(
+    frame_count: int,
+    fps: float,
+    chunk_s: float,
+    overlap_s: float,
+    ranges: Sequence[Tuple[int, Optional[int]]] = ((0, None),),
+) -> List[VideoChunk]:
+    """Split source frame ``ranges`` into consecutive chunks with a warm-up overlap.
+
+    Warm-up never reaches back past the start of a range, since tracking and
+    smoothing start over at every range boundary.
+    """
+
+    chunk_frames = max(1, int(round(chunk_s * fps)))
+    overlap_frames = max(0, int(round(overlap_s * fps)))
+    chunks: List[VideoChunk] = []
+    for segment, (range_start, range_end) in enumerate(ranges):
+        if range_end is None and frame_count <= range_start:
+            chunks.append(VideoChunk(warmup_start=range_start, start=range_start, end=None, segment=segment))
+            continue
+        stop = frame_count if range_end is None else range_end
+        chunk_total = max(1, math.ceil((stop - range_start) / chunk_frames))
+        for idx in range(chunk_total):
+            start = range_start + idx * chunk_frames
+            end: Optional[int] = min(start + chunk_frames, stop)
+            if idx == chunk_total - 1:
+                # An open-ended range reads to EOF because CAP_PROP_FRAME_COUNT is only an estimate.
+                end = range_end
+            warmup_start = max(range_start, start - overlap_frames)
+            chunks.append(VideoChunk(warmup_start=warmup_start, start=start, end=end, segment=segment))
+    return chunks
+
+
+def _init_worker(detector_config: Optional[DetectorConfig]) -> None:
+    global _worker_detector
+    _worker_detector = PoseDetector(detector_config)
+
+
+def _process_chunk(
+    path: str,
+    target_fps: Optional[float],
+    chunk: VideoChunk,
+    builder_options: Dict[str, Any],
+    keyframe_config: Optional[KeyframeConfig] = None,
+    gap_fill_config: Optional[GapFillConfig] = None,
+) -> Tuple[List[Tuple[ChunkFrame, SkeletonFrame]], Optional[KeyframeStats]]:
+    """Detect and build skeletons for one chunk with the worker's warm detector."""
+
+    loader = VideoLoader(path, target_fps=target_fps, reuse_buffers=True)
+    detector = _worker_detector
+    detector.reset()
+    builder = SkeletonBuilder(**builder_options)
+    width, height = loader.meta.width, loader.meta.height
+    sampler = KeyframeSampler(detector, keyframe_config, width, height) if keyframe_config is not None else None
+    results: List[Tuple[ChunkFrame, SkeletonFrame]] = []
+    try:
+        frames = loader.frames(chunk.warmup_start, chunk.end, segment=chunk.segment)
+        if sampler is not None:
+            detections = sampler.detect(frames)
+        else:
+            detections = ((frame, detector.detect_array(frame.rgb, width, height)) for frame in frames)
+        if gap_fill_config is not None:
+            detections = GapFiller(gap_fill_config).fill(detections)
+        for frame, keypoints in detections:
+            skeleton = builder.build(keypoints, frame.timestamp_s)
+            if frame.source_index >= chunk.start:
+                results.append((ChunkFrame(frame.index, frame.timestamp_s, frame.segment), skeleton))
+    finally:
+        loader.release()
+    return results, sampler.stats if sampler is not None else None
+
+
+class ChunkedDetector:
+    """Run pose detection over video chunks on a pool of worker processes.
+
+    Each worker process loads one ``PoseDetector`` and reuses it (reset)
+    for all of its chunks; every chunk gets a fresh ``SkeletonBuilder``.
+    Results are stitched back in frame order; at most ``2 * workers`` chunks
+    are in flight so finished results do not pile up in memory. With a
+    ``keyframe_config`` workers detect keyframes only; their statistics
+    (warm-up frames included) are summed in ``keyframe_stats``. With a
+    ``gap_fill_config`` each worker fills gaps within its chunk; a gap that
+    runs past the end of a chunk stays unfilled.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        target_fps: Optional[float],
+        workers: int,
+        chunk_s: float = 60.0,
+        overlap_s: float = 2.0,
+        builder_options: Optional[Dict[str, Any]] = None,
+        detector_config: Optional[DetectorConfig] = None,
+        keyframe_config: Optional[KeyframeConfig] = None,
+        gap_fill_config: Optional[GapFillConfig] = None,
+    ) -> None:
+        self.path = path
+        self.target_fps = target_fps
+        self.workers = max(1, workers)
+        self.chunk_s = chunk_s
+        self.overlap_s = overlap_s
+        self.builder_options = dict(builder_options or {})
+        self.detector_config = detector_config
+        self.keyframe_config = keyframe_config
+        self.gap_fill_config = gap_fill_config
+        self.keyframe_stats = KeyframeStats()
+
+    def _submit(self, pool: ProcessPoolExecutor, chunk: VideoChunk) -> Future:
+        return pool.submit(
+            _process_chunk,
+            self.path,
+            self.target_fps,
+            chunk,
+            self.builder_options,
+            self.keyframe_config,
+            self.gap_fill_config,
+        )
+
+    def skeletons(
+        self,
+        frame_count: int,
+        fps: float,
+        ranges: Sequence[Tuple[int, Optional[int]]] = ((0, None),),
+    ) -> Iterator[Tuple[ChunkFrame, SkeletonFrame]]:
+        """Yield ``(frame position, skeleton)`` pairs in order for source frame ``ranges``.
+
+        The positions carry everything analysis needs, so the caller only
+        has to decode frames itself when it draws on the source images.
+        """
+
+        chunks = plan_chunks(frame_count, fps, self.chunk_s, self.overlap_s, ranges)
+        logger.info("Processing %d chunks on %d worker processes", len(chunks), self.workers)
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self.detector_config,),
+        ) as pool:
+            pending: Deque[Future] = deque()
+            remaining = iter(chunks)
+            try:
+                for chunk in remaining:
+                    pending.append(self._submit(pool, chunk))
+                    if len(pending) >= 2 * self.workers:
+                        break
+                while pending:
+                    results, stats = pending.popleft().result()
+                    if stats is not None:
+                        self.keyframe_stats.merge(stats)
+                    next_chunk = next(remaining, None)
+                    if next_chunk is not None:
+                        pending.append(self._submit(pool, next_chunk))
+                    yield from results
+            finally:
+                for future in pending:
+                    future.cancel()
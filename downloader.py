@@ -1,13 +1,26 @@
 from __future__ import annotations
 
+import hashlib
+import json
 import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Optional, Sequence, Tuple
+from typing import Any, Dict, Iterable, Iterator, Optional, Sequence, Tuple
 
 import yt_dlp
 
 logger = logging.getLogger(__name__)
 
+# Files yt-dlp leaves behind while a download is unfinished.
+_PARTIAL_SUFFIXES = (".part", ".ytdl", ".temp")
+
+# Extractors whose IDs are not unique per video: the generic extractor names
+# a direct file link by its basename, so http://a/clip.mp4 and
+# http://b/clip.mp4 share an ID.
+_URL_KEYED_EXTRACTORS = ("Generic",)
+
 
 def _parse_cookies_from_browser(spec: Optional[str]) -> Optional[str | Tuple[str, ...]]:
     """Parse cookies-from-browser spec for yt-dlp.
@@ -37,32 +50,195 @@ def _parse_cookies_from_browser(spec: Optional[str]) -> Optional[str | Tuple[str
     return cleaned
 
 
-def download_video(url: str, output_dir: Path, cookies_from_browser: Optional[str] = None) -> Path:
+class DownloadCache:
+    """Downloaded videos stored under ``root/<extractor>/<video id>.<ext>``.
+
+    ``index.json`` maps URLs to cached files, so a repeated URL needs no
+    network access at all; another URL of an already cached video is
+    recognized by the extractor and ID in its info before any media is
+    fetched. Extractors without stable IDs (``_URL_KEYED_EXTRACTORS``) get
+    a hash of the page URL appended to the ID, so only the same URL is
+    reused. Unfinished downloads keep their ``.part`` files in the cache
+    directory and are resumed by the next attempt.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    @property
+    def index_path(self) -> Path:
+        return self.root / "index.json"
+
+    @property
+    def outtmpl(self) -> str:
+        # ``cache_id`` is set by ``download_video``; results resolved through another extractor only have ``id``.
+        return str(self.root / "%(extractor_key)s" / "%(cache_id,id)s.%(ext)s")
+
+    @staticmethod
+    def cache_id(info: Dict[str, Any], url: str) -> Optional[str]:
+        """File name stem of a video in the cache, or None when its info has no ID."""
+
+        video_id = info.get("id")
+        if not video_id or not info.get("extractor_key"):
+            return None
+        if info["extractor_key"] in _URL_KEYED_EXTRACTORS:
+            page_url = info.get("webpage_url") or url
+            return f"{video_id}-{hashlib.sha1(page_url.encode('utf-8')).hexdigest()[:12]}"
+        return str(video_id)
+
+    def _index(self) -> Dict[str, str]:
+        try:
+            return json.loads(self.index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def lookup(self, url: str) -> Optional[Path]:
+        with self._lock:
+            entry = self._index().get(url)
+        if entry is None:
+            return None
+        path = self.root / entry
+        return path if path.is_file() else None
+
+    def find(self, extractor_key: str, video_id: str) -> Optional[Path]:
+        """Finished file of a video, ignoring partial downloads and unmerged format files."""
+
+        directory = self.root / extractor_key
+        if not directory.is_dir():
+            return None
+        for path in sorted(directory.glob(f"{video_id}.*")):
+            if path.suffix in _PARTIAL_SUFFIXES or path.stem != video_id:
+                continue
+            return path
+        return None
+
+    def record(self, url: str, path: Path) -> None:
+        with self._lock:
+            index = self._index()
+            index[url] = path.relative_to(self.root).as_posix()
+            temp = self.index_path.with_suffix(".tmp")
+            temp.write_text(json.dumps(index, indent=2, ensure_ascii=False), encoding="utf-8")
+            os.replace(temp, self.index_path)
+
+
+def _downloaded_path(ydl: yt_dlp.YoutubeDL, info: Dict[str, Any]) -> Path:
+    requested = info.get("requested_downloads") or []
+    if requested and requested[-1].get("filepath"):
+        return Path(requested[-1]["filepath"])
+    path = Path(ydl.prepare_filename(info))
+    if path.suffix.lower() != ".mp4":
+        mp4_candidate = path.with_suffix(".mp4")
+        if mp4_candidate.exists():
+            return mp4_candidate
+    return path
+
+
+def download_video(
+    url: str,
+    output_dir: Path,
+    cookies_from_browser: Optional[str] = None,
+    *,
+    cache: Optional[DownloadCache] = None,
+    concurrent_fragments: int = 4,
+    quiet: bool = False,
+) -> Path:
     """Download a video using yt-dlp and return the file path.
 
     cookies_from_browser examples: "chrome", "chrome:Default", "firefox".
+    Without a ``cache`` the video goes to ``output_dir/downloaded.<ext>``;
+    with one, cached videos are reused (see ``DownloadCache``). Fragmented
+    formats (HLS/DASH) fetch ``concurrent_fragments`` fragments at a time,
+    and interrupted downloads are resumed. ``quiet`` hides the progress bar.
     """
 
-    output_dir.mkdir(parents=True, exist_ok=True)
-    outtmpl = str(output_dir / "downloaded.%(ext)s")
+    if cache is not None:
+        cached = cache.lookup(url)
+        if cached is not None:
+            logger.info("Using cached download %s for %s", cached, url)
+            return cached
+        outtmpl = cache.outtmpl
+    else:
+        output_dir.mkdir(parents=True, exist_ok=True)
+        outtmpl = str(output_dir / "downloaded.%(ext)s")
     ydl_opts = {
         "outtmpl": outtmpl,
         "format": "bestvideo+bestaudio/best",
         "merge_output_format": "mp4",
         "noplaylist": True,
+        "continuedl": True,
+        "concurrent_fragment_downloads": max(1, concurrent_fragments),
+        "noprogress": quiet,
     }
     cookies_spec = _parse_cookies_from_browser(cookies_from_browser)
     if cookies_spec:
         ydl_opts["cookiesfrombrowser"] = cookies_spec
 
-    logger.info("Downloading video from %s", url)
     with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        info = ydl.extract_info(url, download=True)
-        filename = ydl.prepare_filename(info)
+        if cache is None:
+            logger.info("Downloading video from %s", url)
+            return _downloaded_path(ydl, ydl.extract_info(url, download=True))
+
+        # Resolve the video's extractor and ID first; the media is only fetched on a cache miss.
+        info = ydl.extract_info(url, download=False, process=False)
+        cached = None
+        cache_id = cache.cache_id(info, url)
+        if cache_id is not None:
+            info["cache_id"] = cache_id
+            cached = cache.find(info["extractor_key"], cache_id)
+        if cached is not None:
+            logger.info("Using cached download %s for %s", cached, url)
+        else:
+            logger.info("Downloading video from %s", url)
+            cached = _downloaded_path(ydl, ydl.process_ie_result(info, download=True))
+    cache.record(url, cached)
+    return cached
+
+
+def read_url_list(path: Path) -> Sequence[str]:
+    """URLs from a text file, one per line; blank lines and ``#`` comments are skipped."""
+
+    urls = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if line and not line.startswith("#"):
+            urls.append(line)
+    return urls
+
+
+def download_many(
+    urls: Iterable[str],
+    cache: DownloadCache,
+    *,
+    workers: int = 2,
+    cookies_from_browser: Optional[str] = None,
+    concurrent_fragments: int = 4,
+) -> Iterator[Tuple[str, Path | BaseException]]:
+    """Download ``urls`` into ``cache`` on ``workers`` threads.
+
+    Yields ``(url, path)`` as each download finishes (not in input order),
+    so callers can process finished files while the rest download. A failed
+    download yields ``(url, exception)`` instead of stopping the others.
+    """
 
-    path = Path(filename)
-    if path.suffix.lower() != ".mp4":
-        mp4_candidate = path.with_suffix(".mp4")
-        if mp4_candidate.exists():
-            return mp4_candidate
-    return path
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="download") as pool:
+        futures: Dict[Future, str] = {
+            pool.submit(
+                download_video,
+                url,
+                cache.root,
+                cookies_from_browser,
+                cache=cache,
+                concurrent_fragments=concurrent_fragments,
+                quiet=True,
+            ): url
+            for url in urls
+        }
+        for future in as_completed(futures):
+            url = futures[future]
+            try:
+                yield url, future.result()
+            except Exception as exc:  # noqa: BLE001 - reported per URL
+                logger.error("Download failed for %s: %s", url, exc)
+                yield url, exc
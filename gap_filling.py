@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import logging
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+from pose_detector import JOINT_NAMES, KeypointArray
+from video_loader import FrameData
+
+logger = logging.getLogger(__name__)
+
+# "linear" interpolates straight between the samples around a gap, "cubic"
+# uses a cubic Hermite spline that also matches the joint's velocity at both
+# ends, so motion stays smooth through the gap.
+GAP_FILL_METHODS = ("linear", "cubic")
+
+
+@dataclass(frozen=True)
+class GapFillConfig:
+    """Settings for filling short runs of frames where joints were not detected.
+
+    A joint missing for at most ``max_gap`` consecutive frames between two
+    detections is interpolated with ``method``; longer gaps stay missing.
+    """
+
+    method: str = "linear"
+    max_gap: int = 10
+
+    def __post_init__(self) -> None:
+        if self.method not in GAP_FILL_METHODS:
+            raise ValueError(f"Unknown gap fill method: {self.method}")
+        if self.max_gap < 1:
+            raise ValueError("max_gap must be at least 1")
+
+    def params(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class GapFiller:
+    """Hold frames with missing joints until the gap closes, then interpolate it.
+
+    Frames with nothing to fill pass straight through. Once a joint that
+    was seen before goes missing, frames are held (at most ``max_gap + 1``)
+    until every missing joint is detected again or the gap is too long to
+    fill. Held frames are released in order; all joints of a frame are
+    filled together with array operations, and frames with filled joints
+    get ``source="gap_filled"``. Gaps never span a ``FrameData.segment``
+    boundary, and gaps before the first or after the last detection are
+    not extrapolated.
+    """
+
+    def __init__(self, config: GapFillConfig) -> None:
+        self.config = config
+        self.gaps_filled = 0
+        self.joints_filled = 0
+        self.frames_filled = 0
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget held frames and the last detections (call after flushing)."""
+
+        joints = len(JOINT_NAMES)
+        self._pending: Deque[Tuple[FrameData, KeypointArray]] = deque()
+        # Last two detections of every joint: data, frame index, and timestamp.
+        self._last = np.zeros((joints, 4), dtype=np.float32)
+        self._last_index = np.zeros(joints, dtype=int)
+        self._last_time = np.zeros(joints, dtype=float)
+        self._has_last = np.zeros(joints, dtype=bool)
+        self._before = np.zeros((joints, 4), dtype=np.float32)
+        self._before_time = np.zeros(joints, dtype=float)
+        self._has_before = np.zeros(joints, dtype=bool)
+
+    def fill(self, items: Iterable[Tuple[FrameData, KeypointArray]]) -> Iterator[Tuple[FrameData, KeypointArray]]:
+        """Yield ``(frame, keypoints)`` for every item, in order, with short gaps filled."""
+
+        segment = 0
+        for frame, keypoints in items:
+            if frame.segment != segment:
+                segment = frame.segment
+                yield from self._release(flush=True)
+                self.reset()
+            self._pending.append((frame, keypoints))
+            yield from self._release(flush=False)
+        yield from self._release(flush=True)
+
+    def _release(self, flush: bool) -> Iterator[Tuple[FrameData, KeypointArray]]:
+        while self._pending:
+            frame, keypoints = self._pending[0]
+            # Joints seen recently enough that their gap may still be short enough to fill.
+            missing = ~keypoints.valid & self._has_last & (frame.index - self._last_index <= self.config.max_gap)
+            filled = keypoints
+            if missing.any():
+                later = np.array([item.valid for _, item in list(self._pending)[1:]]).reshape(-1, len(JOINT_NAMES))
+                waiting = missing & ~later.any(axis=0)
+                if waiting.any() and not flush and len(later) < self.config.max_gap:
+                    return
+                self._pending.popleft()
+                filled = self._fill(frame, keypoints, missing, later)
+            else:
+                self._pending.popleft()
+            self._remember(frame, keypoints)
+            yield frame, filled
+
+    def _fill(
+        self,
+        frame: FrameData,
+        keypoints: KeypointArray,
+        missing: np.ndarray,
+        later: np.ndarray,
+    ) -> KeypointArray:
+        if not len(later):
+            return keypoints
+        found = later.any(axis=0)
+        offset = np.argmax(later, axis=0)  # first later held frame where each joint is back
+        held = list(self._pending)
+        gap = np.array([held[row][0].index for row in offset.tolist()]) - self._last_index - 1
+        fill = missing & found & (gap <= self.config.max_gap)
+        if not fill.any():
+            return keypoints
+
+        joints = np.flatnonzero(fill)
+        end = np.stack([held[offset[j]][1].data[j] for j in joints.tolist()]).astype(float)
+        end_time = np.array([held[offset[j]][0].timestamp_s for j in joints.tolist()])
+        start = self._last[joints].astype(float)
+        start_time = self._last_time[joints]
+        span = np.maximum(end_time - start_time, 1e-9)
+        u = ((frame.timestamp_s - start_time) / span)[:, None]
+        if self.config.method == "cubic":
+            points = self._hermite(joints, start, end, start_time, end_time, offset, held, u, span)
+        else:
+            points = start + u * (end - start)
+
+        data = keypoints.data.copy()
+        data[joints] = points
+        valid = keypoints.valid | fill
+        self.gaps_filled += int(np.count_nonzero(self._last_index[joints] + 1 == frame.index))
+        self.joints_filled += len(joints)
+        self.frames_filled += 1
+        return KeypointArray(data=data, valid=valid, source="gap_filled")
+
+    def _hermite(
+        self,
+        joints: np.ndarray,
+        start: np.ndarray,
+        end: np.ndarray,
+        start_time: np.ndarray,
+        end_time: np.ndarray,
+        offset: np.ndarray,
+        held: List[Tuple[FrameData, KeypointArray]],
+        u: np.ndarray,
+        span: np.ndarray,
+    ) -> np.ndarray:
+        """Cubic Hermite interpolation with end tangents from the neighboring detections.
+
+        The start tangent comes from the detection before the gap's start and
+        the end tangent from the frame after the gap's end when the joint is
+        detected there; otherwise the straight-line slope is used.
+        """
+
+        secant = (end - start) / span[:, None]
+        start_slope = secant.copy()
+        known = self._has_before[joints]
+        if known.any():
+            dt = np.maximum(start_time[known] - self._before_time[joints[known]], 1e-9)
+            start_slope[known] = (start[known] - self._before[joints[known]]) / dt[:, None]
+        end_slope = secant.copy()
+        for row, joint in enumerate(joints.tolist()):
+            after = 1 + offset[joint]
+            if after < len(held) and held[after][1].valid[joint]:
+                frame, keypoints = held[after]
+                dt = max(frame.timestamp_s - end_time[row], 1e-9)
+                end_slope[row] = (keypoints.data[joint] - end[row]) / dt
+
+        u2 = u * u
+        u3 = u2 * u
+        return (
+            (2 * u3 - 3 * u2 + 1) * start
+            + (u3 - 2 * u2 + u) * span[:, None] * start_slope
+            + (-2 * u3 + 3 * u2) * end
+            + (u3 - u2) * span[:, None] * end_slope
+        )
+
+    def _remember(self, frame: FrameData, keypoints: KeypointArray) -> None:
+        # Called with the keypoints before filling: only detections anchor later gaps.
+        detected = keypoints.valid
+        self._before[detected] = self._last[detected]
+        self._before_time[detected] = self._last_time[detected]
+        self._has_before[detected] = self._has_last[detected]
+        self._last[detected] = keypoints.data[detected]
+        self._last_index[detected] = frame.index
+        self._last_time[detected] = frame.timestamp_s
+        self._has_last |= detected
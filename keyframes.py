@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from metrics import StageTimer
+from pose_detector import KeypointArray, PoseDetector
+from video_loader import FrameData
+
+logger = logging.getLogger(__name__)
+
+KEYFRAME_MODES = ("stride", "motion", "frame_diff")
+
+# Frame-difference energy is measured on grayscale frames shrunk by this factor.
+_DIFF_SCALE = 0.25
+
+
+@dataclass(frozen=True)
+class KeyframeConfig:
+    """Settings for detecting keypoints on keyframes only.
+
+    ``mode="stride"`` detects every ``stride``-th frame. ``"motion"`` spaces
+    keyframes so the fastest joint moves about ``motion_threshold_px`` between
+    them, using its speed between the last two keyframes. ``"frame_diff"``
+    makes a keyframe once the mean absolute grayscale difference to the last
+    keyframe exceeds ``diff_threshold`` (0-255). In the adaptive modes
+    ``stride`` is the largest allowed gap. Every ``validate_every``-th
+    in-between frame is also detected to measure interpolation error
+    (0 disables validation).
+    """
+
+    mode: str = "stride"
+    stride: int = 4
+    motion_threshold_px: float = 6.0
+    diff_threshold: float = 4.0
+    validate_every: int = 10
+
+    def __post_init__(self) -> None:
+        if self.mode not in KEYFRAME_MODES:
+            raise ValueError(f"Unknown keyframe mode: {self.mode}")
+        if self.stride < 1:
+            raise ValueError("stride must be at least 1")
+
+    def params(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass
+class KeyframeStats:
+    """Per-run keyframe counters and interpolation error (pixels, x/y)."""
+
+    frames: int = 0
+    keyframes: int = 0
+    interpolated: int = 0
+    validated: int = 0
+    detections: int = 0
+    detect_time_s: float = 0.0
+    error_sum_px: float = 0.0
+    error_max_px: float = 0.0
+
+    def merge(self, other: "KeyframeStats") -> None:
+        for item in fields(self):
+            if item.name == "error_max_px":
+                self.error_max_px = max(self.error_max_px, other.error_max_px)
+            else:
+                setattr(self, item.name, getattr(self, item.name) + getattr(other, item.name))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            **asdict(self),
+            "detection_ratio": self.detections / self.frames if self.frames else None,
+            "mean_error_px": self.error_sum_px / self.validated if self.validated else None,
+        }
+
+
+class KeyframeSampler:
+    """Run pose detection on keyframes and interpolate keypoints in between.
+
+    Frames between two keyframes are held until the next keyframe is
+    detected (at most ``stride - 1`` frames), then yielded in order with
+    linearly interpolated keypoints marked ``source="interpolated"``.
+    Joints missing from either keyframe stay invalid. Validation frames are
+    detected as they arrive, so the detector still sees frames in order.
+    Keyframes never span a ``FrameData.segment`` boundary; the detector is
+    reset at each one. Detector calls are also added to ``detect_timer``
+    when given.
+    """
+
+    def __init__(
+        self,
+        detector: PoseDetector,
+        config: KeyframeConfig,
+        frame_width: int,
+        frame_height: int,
+        detect_timer: Optional[StageTimer] = None,
+    ) -> None:
+        self.detector = detector
+        self.config = config
+        self.frame_width = frame_width
+        self.frame_height = frame_height
+        self.detect_timer = detect_timer
+        self.stats = KeyframeStats()
+
+    def _detect(self, frame: FrameData) -> KeypointArray:
+        start = time.perf_counter()
+        keypoints = self.detector.detect_array(frame.rgb, self.frame_width, self.frame_height)
+        elapsed = time.perf_counter() - start
+        self.stats.detect_time_s += elapsed
+        self.stats.detections += 1
+        if self.detect_timer is not None:
+            self.detect_timer.add(elapsed)
+        return keypoints
+
+    @staticmethod
+    def _small_gray(frame: FrameData) -> np.ndarray:
+        return cv2.resize(frame.gray, None, fx=_DIFF_SCALE, fy=_DIFF_SCALE, interpolation=cv2.INTER_AREA)
+
+    def _next_gap(self, previous: Tuple[FrameData, KeypointArray], current: Tuple[FrameData, KeypointArray]) -> int:
+        """Frames until the next keyframe in ``"motion"`` mode."""
+
+        (prev_frame, prev_points), (frame, points) = previous, current
+        common = prev_points.valid & points.valid
+        frames_apart = frame.index - prev_frame.index
+        if not common.any() or frames_apart <= 0:
+            return 1
+        displacement = np.linalg.norm(points.xyz[common, :2] - prev_points.xyz[common, :2], axis=1)
+        speed = float(displacement.max()) / frames_apart
+        if speed <= 0:
+            return self.config.stride
+        return int(min(self.config.stride, max(1, self.config.motion_threshold_px // speed)))
+
+    def detect(self, frames: Iterable[FrameData]) -> Iterator[Tuple[FrameData, KeypointArray]]:
+        """Yield ``(frame, keypoints)`` for every frame, in order."""
+
+        config = self.config
+        key: Optional[Tuple[FrameData, KeypointArray]] = None
+        key_gray: Optional[np.ndarray] = None
+        gap = 1
+        since_validation = 0
+        pending: List[Tuple[FrameData, Optional[KeypointArray]]] = []
+        for frame in frames:
+            if key is not None and frame.segment != key[0].segment:
+                # A new time range: close the previous one and start over.
+                yield from self._finish(key, pending)
+                self.detector.reset()
+                key, pending, gap, since_validation = None, [], 1, 0
+            distance = len(pending) + 1
+            gray: Optional[np.ndarray] = None
+            if key is None:
+                is_keyframe = True
+            elif config.mode == "stride":
+                is_keyframe = distance >= config.stride
+            elif config.mode == "motion":
+                is_keyframe = distance >= gap
+            else:
+                gray = self._small_gray(frame)
+                energy = float(cv2.mean(cv2.absdiff(gray, key_gray))[0])
+                is_keyframe = distance >= config.stride or energy > config.diff_threshold
+
+            if not is_keyframe:
+                truth = None
+                since_validation += 1
+                if config.validate_every and since_validation >= config.validate_every:
+                    since_validation = 0
+                    truth = self._detect(frame)
+                pending.append((frame, truth))
+                continue
+
+            current = (frame, self._detect(frame))
+            if key is not None:
+                yield from self._interpolate(key, current, pending)
+                if config.mode == "motion":
+                    gap = self._next_gap(key, current)
+            if config.mode == "frame_diff":
+                # Reuse the thumbnail already made for the diff; only a segment's first keyframe needs one.
+                key_gray = gray if gray is not None else self._small_gray(frame)
+            pending = []
+            key = current
+            self.stats.frames += 1
+            self.stats.keyframes += 1
+            yield current
+
+        if key is not None:
+            yield from self._finish(key, pending)
+
+    def _finish(
+        self,
+        key: Tuple[FrameData, KeypointArray],
+        pending: List[Tuple[FrameData, Optional[KeypointArray]]],
+    ) -> Iterator[Tuple[FrameData, KeypointArray]]:
+        """Flush frames held after the last keyframe when the stream or segment ends."""
+
+        if not pending:
+            return
+        # Make the last held frame a keyframe and interpolate up to it.
+        frame, truth = pending.pop()
+        current = (frame, truth if truth is not None else self._detect(frame))
+        yield from self._interpolate(key, current, pending)
+        self.stats.frames += 1
+        self.stats.keyframes += 1
+        yield current
+
+    def _interpolate(
+        self,
+        start: Tuple[FrameData, KeypointArray],
+        end: Tuple[FrameData, KeypointArray],
+        pending: List[Tuple[FrameData, Optional[KeypointArray]]],
+    ) -> Iterator[Tuple[FrameData, KeypointArray]]:
+        (start_frame, start_points), (end_frame, end_points) = start, end
+        span = end_frame.timestamp_s - start_frame.timestamp_s
+        valid = start_points.valid & end_points.valid
+        step = end_points.data - start_points.data
+        for frame, truth in pending:
+            weight = (frame.timestamp_s - start_frame.timestamp_s) / span if span > 0 else 0.0
+            data = start_points.data + np.float32(weight) * step
+            data[~valid] = 0.0
+            keypoints = KeypointArray(data=data, valid=valid.copy(), source="interpolated")
+            self.stats.frames += 1
+            if truth is None:
+                self.stats.interpolated += 1
+                yield frame, keypoints
+                continue
+            # Validation frames keep their detected keypoints.
+            self._record_error(keypoints, truth)
+            yield frame, truth
+
+    def _record_error(self, interpolated: KeypointArray, detected: KeypointArray) -> None:
+        common = interpolated.valid & detected.valid
+        if not common.any():
+            return
+        error = float(np.linalg.norm(interpolated.xyz[common, :2] - detected.xyz[common, :2], axis=1).mean())
+        self.stats.validated += 1
+        self.stats.error_sum_px += error
+        self.stats.error_max_px = max(self.stats.error_max_px, error)
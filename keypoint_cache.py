@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Mapping, Optional
+
+import numpy as np
+
+from pose_detector import JOINT_NAMES, KEYPOINT_SOURCES, KeypointArray
+
+logger = logging.getLogger(__name__)
+
+CACHE_FORMAT_VERSION = 3
+_HASH_BLOCK_SIZE = 1 << 20
+
+
+@dataclass(frozen=True)
+class CachedFrame:
+    """A frame replayed from the keypoint cache (no image data)."""
+
+    index: int
+    timestamp_s: float
+    keypoints: KeypointArray
+    segment: int = 0
+
+
+@dataclass
+class CachedKeypoints:
+    """Raw per-frame detector output for one video.
+
+    ``keypoints`` is ``(frames, joints, 4)`` float32 and ``valid`` is
+    ``(frames, joints)``; ``sources`` indexes ``KEYPOINT_SOURCES`` per frame
+    and ``segments`` holds the time range number (``FrameData.segment``).
+    ``meta`` holds frame size and rates needed to run the rest of the
+    pipeline without opening the video.
+    """
+
+    indices: np.ndarray
+    timestamps: np.ndarray
+    keypoints: np.ndarray
+    valid: np.ndarray
+    sources: np.ndarray
+    segments: np.ndarray
+    meta: Dict[str, Any]
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def frames(self) -> Iterator[CachedFrame]:
+        for row in range(len(self.indices)):
+            yield CachedFrame(
+                index=int(self.indices[row]),
+                timestamp_s=float(self.timestamps[row]),
+                keypoints=KeypointArray(
+                    data=self.keypoints[row],
+                    valid=self.valid[row],
+                    source=KEYPOINT_SOURCES[self.sources[row]],
+                ),
+                segment=int(self.segments[row]),
+            )
+
+
+class KeypointRecorder:
+    """Accumulate detector output frame by frame into ``CachedKeypoints``."""
+
+    def __init__(self, initial_capacity: int = 1024) -> None:
+        self._size = 0
+        self._allocate(max(1, initial_capacity))
+
+    def _allocate(self, capacity: int) -> None:
+        joints = len(JOINT_NAMES)
+        indices = np.zeros(capacity, dtype=np.int64)
+        timestamps = np.zeros(capacity, dtype=np.float64)
+        keypoints = np.zeros((capacity, joints, 4), dtype=np.float32)
+        valid = np.zeros((capacity, joints), dtype=bool)
+        sources = np.zeros(capacity, dtype=np.uint8)
+        segments = np.zeros(capacity, dtype=np.int32)
+        if self._size:
+            indices[: self._size] = self._indices[: self._size]
+            timestamps[: self._size] = self._timestamps[: self._size]
+            keypoints[: self._size] = self._keypoints[: self._size]
+            valid[: self._size] = self._valid[: self._size]
+            sources[: self._size] = self._sources[: self._size]
+            segments[: self._size] = self._segments[: self._size]
+        self._indices, self._timestamps, self._keypoints = indices, timestamps, keypoints
+        self._valid, self._sources, self._segments = valid, sources, segments
+
+    def add(self, index: int, timestamp_s: float, keypoints: KeypointArray, segment: int = 0) -> None:
+        if self._size == len(self._indices):
+            self._allocate(2 * len(self._indices))
+        row = self._size
+        self._indices[row] = index
+        self._timestamps[row] = timestamp_s
+        self._keypoints[row] = keypoints.data
+        self._valid[row] = keypoints.valid
+        self._sources[row] = KEYPOINT_SOURCES.index(keypoints.source)
+        self._segments[row] = segment
+        self._size += 1
+
+    def result(self, meta: Mapping[str, Any]) -> CachedKeypoints:
+        size = self._size
+        return CachedKeypoints(
+            indices=self._indices[:size],
+            timestamps=self._timestamps[:size],
+            keypoints=self._keypoints[:size],
+            valid=self._valid[:size],
+            sources=self._sources[:size],
+            segments=self._segments[:size],
+            meta=dict(meta),
+        )
+
+
+class KeypointCache:
+    """On-disk cache of detector output keyed by video content and settings.
+
+    Entries are ``.npz`` files named by a SHA-256 over the video bytes, the
+    detector parameters, and the frame selection settings. Hits refresh the
+    entry's mtime; after each store the least recently used entries are
+    removed until the cache fits in ``max_bytes``. Content hashes are
+    memoized per path, size, and mtime so unchanged videos are not re-read.
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int = 2 * 1024**3) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._hash_index_path = self.cache_dir / "content_hashes.json"
+
+    def key(self, video_path: Path, detector_params: Mapping[str, Any], loader_params: Mapping[str, Any]) -> str:
+        payload = json.dumps(
+            {
+                "version": CACHE_FORMAT_VERSION,
+                "content": self._content_hash(Path(video_path)),
+                "detector": detector_params,
+                "loader": loader_params,
+            },
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.npz"
+
+    def load(self, key: str) -> Optional[CachedKeypoints]:
+        path = self._entry_path(key)
+        if not path.exists():
+            return None
+        try:
+            with np.load(path) as archive:
+                cached = CachedKeypoints(
+                    indices=archive["indices"],
+                    timestamps=archive["timestamps"],
+                    keypoints=archive["keypoints"],
+                    valid=archive["valid"],
+                    sources=archive["sources"],
+                    segments=archive["segments"],
+                    meta=json.loads(str(archive["meta"])),
+                )
+        except (OSError, ValueError, KeyError) as exc:
+            logger.warning("Discarding unreadable keypoint cache entry %s: %s", path, exc)
+            path.unlink(missing_ok=True)
+            return None
+        os.utime(path)
+        logger.info("Keypoint cache hit: %s (%d frames)", path.name, len(cached))
+        return cached
+
+    def store(self, key: str, cached: CachedKeypoints) -> Path:
+        path = self._entry_path(key)
+        fd, tmp_name = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                np.savez_compressed(
+                    handle,
+                    indices=cached.indices,
+                    timestamps=cached.timestamps,
+                    keypoints=cached.keypoints,
+                    valid=cached.valid,
+                    sources=cached.sources,
+                    segments=cached.segments,
+                    meta=np.array(json.dumps(cached.meta)),
+                )
+            os.replace(tmp_name, path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+        logger.info("Keypoint cache stored: %s (%d frames)", path.name, len(cached))
+        self.evict()
+        return path
+
+    def evict(self) -> List[Path]:
+        """Delete least recently used entries until the cache fits in ``max_bytes``."""
+
+        entries = sorted(self.cache_dir.glob("*.npz"), key=lambda item: item.stat().st_mtime)
+        total = sum(item.stat().st_size for item in entries)
+        removed: List[Path] = []
+        for entry in entries:
+            if total <= self.max_bytes:
+                break
+            total -= entry.stat().st_size
+            entry.unlink(missing_ok=True)
+            removed.append(entry)
+            logger.info("Evicted keypoint cache entry %s", entry.name)
+        return removed
+
+    def _content_hash(self, video_path: Path) -> str:
+        stat = video_path.stat()
+        memo_key = str(video_path.resolve())
+        index = self._read_hash_index()
+        memo = index.get(memo_key)
+        if memo and memo.get("size") == stat.st_size and memo.get("mtime_ns") == stat.st_mtime_ns:
+            return memo["sha256"]
+
+        digest = hashlib.sha256()
+        with video_path.open("rb") as handle:
+            for block in iter(lambda: handle.read(_HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+        content_hash = digest.hexdigest()
+        # Re-read so entries added by other runs sharing the cache while hashing are kept.
+        index = self._read_hash_index()
+        index[memo_key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": content_hash}
+        self._write_hash_index(index)
+        return content_hash
+
+    def _read_hash_index(self) -> Dict[str, Dict[str, Any]]:
+        if not self._hash_index_path.exists():
+            return {}
+        try:
+            index = json.loads(self._hash_index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as exc:
+            logger.warning("Ignoring unreadable content hash index %s: %s", self._hash_index_path, exc)
+            return {}
+        return index if isinstance(index, dict) else {}
+
+    def _write_hash_index(self, index: Dict[str, Dict[str, Any]]) -> None:
+        # Replaced atomically like the cache entries, so concurrent runs never read a partial file.
+        fd, tmp_name = tempfile.mkstemp(dir=self.cache_dir, suffix=".json.tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as handle:
+                handle.write(json.dumps(index, indent=2))
+            os.replace(tmp_name, self._hash_index_path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
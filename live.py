@@ -0,0 +1,262 @@
+from __future__ import annotations
+
+import json
+import logging
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from math_report import report_to_dict
+from motion_analysis import MotionAnalyzer
+from pose_detector import DetectorConfig, PoseDetector
+from skeleton_builder import SkeletonBuilder
+from video_loader import FrameData
+
+logger = logging.getLogger(__name__)
+
+STDIN_SOURCE = "-"
+
+
+class LiveSource:
+    """Capture frames on a background thread and hand out only the newest one.
+
+    ``spec`` is a camera index (``"0"``), a stream URL (``rtsp://...``),
+    ``"-"`` for raw BGR frames of ``frame_size`` on stdin, or a video file,
+    which is replayed at real-time speed. A frame that is replaced before the
+    consumer takes it is dropped, so a slow consumer always gets the latest
+    frame instead of a growing backlog.
+
+    Timestamps are seconds since capture started; stdin frames use their
+    sequence number and ``fps`` and file replays the position in the file.
+    """
+
+    def __init__(
+        self,
+        spec: str,
+        fps: Optional[float] = None,
+        frame_size: Optional[Tuple[int, int]] = None,
+    ) -> None:
+        self.spec = spec
+        self.frames_captured = 0
+        self.frames_dropped = 0
+        self._capture: Optional[cv2.VideoCapture] = None
+        self._replay = False
+        if spec == STDIN_SOURCE:
+            if frame_size is None:
+                raise ValueError("Reading frames from stdin needs a frame size")
+            self.width, self.height = frame_size
+            self.fps = fps or 30.0
+        else:
+            self._replay = Path(spec).is_file()
+            self._capture = cv2.VideoCapture(int(spec) if spec.isdigit() else spec)
+            if not self._capture.isOpened():
+                raise ValueError(f"Unable to open live source: {spec}")
+            if not self._replay:
+                # Keep the driver from buffering frames we would only drop later.
+                self._capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            self.width = int(self._capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+            self.height = int(self._capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            self.fps = fps or float(self._capture.get(cv2.CAP_PROP_FPS)) or 30.0
+
+        self._latest: Optional[Tuple[FrameData, float]] = None
+        self._ended = False
+        self._stop = threading.Event()
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="live-capture", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join(timeout=2.0)
+        if self._capture is not None:
+            self._capture.release()
+
+    def _read(self) -> Optional[np.ndarray]:
+        if self._capture is not None:
+            ok, frame = self._capture.read()
+            return frame if ok else None
+        size = self.width * self.height * 3
+        data = sys.stdin.buffer.read(size)
+        if len(data) < size:
+            return None
+        return np.frombuffer(data, dtype=np.uint8).reshape(self.height, self.width, 3)
+
+    def _run(self) -> None:
+        started = time.monotonic()
+        index = 0
+        try:
+            while not self._stop.is_set():
+                frame = self._read()
+                if frame is None:
+                    break
+                if self._replay or self._capture is None:
+                    timestamp_s = index / self.fps
+                    if self._replay:
+                        # Pace the file like a live camera.
+                        delay = started + timestamp_s - time.monotonic()
+                        if delay > 0:
+                            time.sleep(delay)
+                else:
+                    timestamp_s = time.monotonic() - started
+                item = FrameData(index=index, timestamp_s=timestamp_s, bgr=frame, source_index=index)
+                with self._condition:
+                    if self._latest is not None:
+                        self.frames_dropped += 1
+                    self._latest = (item, time.monotonic())
+                    self.frames_captured += 1
+                    self._condition.notify()
+                index += 1
+        except Exception as exc:  # noqa: BLE001 - ends the stream, reported to the consumer's log
+            logger.error("Live capture failed: %s", exc)
+        finally:
+            with self._condition:
+                self._ended = True
+                self._condition.notify()
+
+    def frames(self) -> Iterator[Tuple[FrameData, float]]:
+        """Yield ``(frame, captured_at)`` with ``time.monotonic()`` capture times until the source ends."""
+
+        while True:
+            with self._condition:
+                while self._latest is None and not self._ended:
+                    self._condition.wait()
+                if self._latest is None:
+                    return
+                item, self._latest = self._latest, None
+            yield item
+
+
+class JsonLinesEmitter:
+    """Write one JSON object per line to stdout (``"-"``), ``tcp://host:port``, or a file."""
+
+    def __init__(self, target: str) -> None:
+        self.target = target
+        self._socket: Optional[socket.socket] = None
+        if target == "-":
+            self._stream: IO[str] = sys.stdout
+        elif target.startswith("tcp://"):
+            host, _, port = target[len("tcp://") :].rpartition(":")
+            if not host or not port.isdigit():
+                raise ValueError(f"Expected tcp://host:port, got {target}")
+            self._socket = socket.create_connection((host, int(port)))
+            self._stream = self._socket.makefile("w", encoding="utf-8")
+        else:
+            self._stream = open(target, "w", encoding="utf-8")
+
+    def emit(self, record: Dict[str, Any]) -> None:
+        self._stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._stream.flush()
+
+    def close(self) -> None:
+        if self._stream is not sys.stdout:
+            self._stream.close()
+        if self._socket is not None:
+            self._socket.close()
+
+
+def run_live(
+    source: str,
+    *,
+    output: str = "-",
+    max_latency_s: float = 0.5,
+    max_frames: Optional[int] = None,
+    stdin_fps: Optional[float] = None,
+    stdin_size: Optional[Tuple[int, int]] = None,
+    smoothing: str = "moving_average",
+    smoothing_window: int = 5,
+    operation_log: str = "off",
+    detector_config: Optional[DetectorConfig] = None,
+    detector: Optional[PoseDetector] = None,
+) -> Dict[str, Any]:
+    """Analyze a live source and emit a JSON line per processed frame.
+
+    Each line holds the frame index and timestamp, the capture-to-emit
+    latency, and the ``MotionReport`` (see ``math_report.report_to_dict``).
+    Frames that arrive while the previous one is processed are dropped, and
+    frames already older than ``max_latency_s`` when processing would start
+    are skipped. Runs until the source ends, ``max_frames`` frames are
+    processed, or the output is closed; returns throughput and latency stats.
+    """
+
+    live = LiveSource(source, fps=stdin_fps, frame_size=stdin_size)
+    emitter = JsonLinesEmitter(output)
+    owns_detector = detector is None
+    if detector is None:
+        detector = PoseDetector(detector_config or DetectorConfig())
+    else:
+        detector.reset()
+    builder = SkeletonBuilder(smoothing=smoothing, smoothing_window=smoothing_window, fps=live.fps)
+    analyzer = MotionAnalyzer(operation_log=operation_log)
+    logger.info("Live mode: %s (%dx%d @ %.1f fps) -> %s", source, live.width, live.height, live.fps, output)
+
+    latencies: List[float] = []
+    stale = 0
+    prev_time: Optional[float] = None
+    started = time.monotonic()
+    live.start()
+    try:
+        for frame, captured_at in live.frames():
+            if time.monotonic() - captured_at > max_latency_s:
+                stale += 1
+                continue
+            height, width = frame.bgr.shape[:2]
+            keypoints = detector.detect_array(frame.rgb, width, height)
+            skeleton = builder.build(keypoints, frame.timestamp_s)
+            delta_t = 1.0 / live.fps if prev_time is None else frame.timestamp_s - prev_time
+            prev_time = frame.timestamp_s
+            report = analyzer.analyze(skeleton.positions, delta_t, skeleton.valid)
+            latency = time.monotonic() - captured_at
+            record = {
+                "frame": frame.index,
+                "timestamp_s": frame.timestamp_s,
+                "latency_ms": round(1000.0 * latency, 2),
+                "detected": keypoints.detected,
+                **report_to_dict(report, operation_log),
+            }
+            try:
+                emitter.emit(record)
+            except (BrokenPipeError, ConnectionError) as exc:
+                logger.warning("Live output closed: %s", exc)
+                break
+            latencies.append(latency)
+            if max_frames is not None and len(latencies) >= max_frames:
+                break
+    except KeyboardInterrupt:
+        logger.info("Live mode interrupted")
+    finally:
+        live.stop()
+        emitter.close()
+        if owns_detector:
+            detector.close()
+
+    elapsed = time.monotonic() - started
+    values = np.asarray(latencies) * 1000.0
+    summary = {
+        "frames_captured": live.frames_captured,
+        "frames_processed": len(latencies),
+        "frames_dropped": live.frames_dropped,
+        "frames_stale": stale,
+        "elapsed_s": elapsed,
+        "fps": len(latencies) / elapsed if elapsed > 0 else 0.0,
+        "latency_p50_ms": float(np.percentile(values, 50)) if values.size else None,
+        "latency_p95_ms": float(np.percentile(values, 95)) if values.size else None,
+        "latency_max_ms": float(values.max()) if values.size else None,
+    }
+    logger.info(
+        "Live mode finished: %d/%d frames processed (%d dropped, %d stale), %.1f fps, p95 latency %s",
+        summary["frames_processed"],
+        summary["frames_captured"],
+        summary["frames_dropped"],
+        summary["frames_stale"],
+        summary["fps"],
+        f"{summary['latency_p95_ms']:.1f}ms" if values.size else "n/a",
+    )
+    return summary
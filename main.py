@@ -1,16 +1,32 @@
 from __future__ import annotations
 
 import argparse
+import contextlib
+import json
 import logging
+import time
 from pathlib import Path
+from typing import Iterable, Iterator, Optional, Sequence, Tuple
 
-from downloader import download_video
-from math_report import MathReportWriter
-from motion_analysis import MotionAnalyzer, MotionReport
-from pose_detector import PoseDetector
-from skeleton_builder import SkeletonBuilder
-from video_loader import VideoLoader
-from visualizer import Visualizer
+from chunked import ChunkedDetector, ChunkFrame
+from downloader import DownloadCache, download_video, read_url_list
+from gap_filling import GAP_FILL_METHODS, GapFillConfig, GapFiller
+from keyframes import KEYFRAME_MODES, KeyframeConfig, KeyframeSampler, KeyframeStats
+from keypoint_cache import CachedFrame, KeypointCache, KeypointRecorder
+from math_report import REPORT_FORMATS, REPORT_MODES, MathReportWriter
+from metrics import PROFILE_MODES, PipelineMetrics, create_sink, profiling
+from motion_analysis import OPERATION_LOG_MODES, MotionAnalyzer, MotionReport
+from motion_export import EXPORT_FORMATS, ColumnarMotionWriter
+from motion_summary import SummaryConfig
+from offline import OFFLINE_SMOOTHERS, OfflineConfig, TrajectoryRecorder
+from multi_person import run_multi_person
+from pipeline import PipelineResult, StagedPipeline, run_sequential
+from pose_detector import DETECTOR_PROFILES, DetectorConfig, KeypointArray, PoseDetector
+from skeleton_builder import SkeletonBuilder, SkeletonFrame
+from utils.filters import FILTERS
+from video_loader import FrameData, TimeRange, VideoLoader, merge_ranges, parse_time, parse_time_range
+from video_encoder import ENCODER_BACKENDS, FFMPEG_CODECS, FFMPEG_PRESETS, EncoderConfig
+from visualizer import RENDER_MODES, OverlayStyle, SkeletonTrackWriter, Visualizer
 
 logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
 logger = logging.getLogger(__name__)
@@ -21,49 +37,687 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--input", help="Path to input video (mp4, avi, mov)")
     parser.add_argument("--output", required=False, help="Output directory")
     parser.add_argument("--target-fps", type=float, default=None, help="Normalize FPS to this value")
+    parser.add_argument("--start", help="Analyze from this time (seconds, MM:SS, or HH:MM:SS)")
+    parser.add_argument("--end", help="Analyze up to this time (seconds, MM:SS, or HH:MM:SS)")
+    parser.add_argument(
+        "--range",
+        action="append",
+        default=[],
+        help="Time range START-END to analyze (repeatable, e.g. 1:00-1:30); other frames are not decoded",
+    )
+    parser.add_argument(
+        "--batch",
+        help="Process every video in a directory, glob pattern, or manifest file (one path per line)",
+    )
+    parser.add_argument("--rerun", action="store_true", help="Reprocess batch items that are already done")
+    parser.add_argument(
+        "--live",
+        help="Live mode: camera index, stream URL, '-' for raw BGR frames on stdin, or a file replayed in real time",
+    )
+    parser.add_argument(
+        "--live-output",
+        default="-",
+        help="Live mode JSON Lines destination: '-' (stdout), tcp://host:port, or a file path",
+    )
+    parser.add_argument("--max-latency", type=float, default=0.5, help="Live mode: skip frames older than this (s)")
+    parser.add_argument("--stdin-size", help="Live mode: frame size of stdin frames as WIDTHxHEIGHT")
+    parser.add_argument("--stdin-fps", type=float, help="Live mode: frame rate of stdin frames")
     parser.add_argument("--download-url", help="Download video with yt-dlp before processing")
     parser.add_argument("--cookies-from-browser", help="Browser name for yt-dlp cookies (e.g. chrome, firefox)")
+    parser.add_argument(
+        "--download-urls",
+        help="Text file of URLs (one per line) to download and process, overlapping downloads with processing",
+    )
+    parser.add_argument("--download-cache", help="Directory of cached downloads, reused across runs")
+    parser.add_argument("--download-workers", type=int, default=2, help="Parallel downloads for --download-urls")
+    parser.add_argument(
+        "--concurrent-fragments", type=int, default=4, help="Fragments fetched at once for HLS/DASH downloads"
+    )
+    parser.add_argument(
+        "--pipelined",
+        action="store_true",
+        help="Overlap decode, detection, analysis, and encoding on separate threads",
+    )
+    parser.add_argument("--queue-depth", type=int, default=4, help="Frames buffered between pipelined stages")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="Run detection on N worker processes over time chunks (with --batch: N videos at a time)",
+    )
+    parser.add_argument("--chunk-seconds", type=float, default=60.0, help="Chunk length for --workers")
+    parser.add_argument(
+        "--chunk-overlap",
+        type=float,
+        default=2.0,
+        help="Seconds before each chunk used to warm up tracking and smoothing",
+    )
+    parser.add_argument(
+        "--smoothing",
+        choices=sorted(FILTERS),
+        default="moving_average",
+        help="Keypoint smoothing filter",
+    )
+    parser.add_argument("--smoothing-window", type=int, default=5, help="Window for moving-average smoothing")
+    parser.add_argument(
+        "--offline",
+        choices=OFFLINE_SMOOTHERS,
+        help="Two-pass analysis: smooth the whole trajectory without lag, then use central-difference derivatives",
+    )
+    parser.add_argument("--offline-window", type=int, default=9, help="Savitzky-Golay window in frames (odd)")
+    parser.add_argument("--offline-polyorder", type=int, default=2, help="Savitzky-Golay polynomial order")
+    parser.add_argument("--offline-alpha", type=float, default=0.5, help="Forward-backward smoothing factor")
+    parser.add_argument(
+        "--gap-fill",
+        choices=GAP_FILL_METHODS,
+        help="Interpolate joints over short runs of missed detections (flagged as gap_filled in reports)",
+    )
+    parser.add_argument("--max-gap", type=int, default=10, help="Longest gap to fill, in frames")
+    parser.add_argument(
+        "--report-format",
+        choices=REPORT_FORMATS,
+        default="json",
+        help="Streamed JSON report format: a single JSON document or JSON Lines",
+    )
+    parser.add_argument(
+        "--report-mode",
+        choices=REPORT_MODES,
+        default="frames",
+        help="Per-frame reports, only an aggregate motion_summary.json, or both",
+    )
+    parser.add_argument("--rep-flexed", type=float, default=100.0, help="Summary: angle (deg) a rep must bend below")
+    parser.add_argument(
+        "--rep-extended", type=float, default=150.0, help="Summary: angle (deg) a rep must straighten above"
+    )
+    parser.add_argument(
+        "--operation-log",
+        choices=OPERATION_LOG_MODES,
+        help=(
+            "Formula log: every operation per frame (full), templates once plus per-frame counts, or off "
+            "(default: templates, off with --live)"
+        ),
+    )
+    parser.add_argument(
+        "--export",
+        action="append",
+        choices=EXPORT_FORMATS,
+        default=[],
+        help="Columnar motion data export (repeatable): npz, npy, parquet, arrow",
+    )
+    parser.add_argument("--no-video", action="store_true", help="Skip writing the skeleton overlay video")
+    parser.add_argument(
+        "--render-mode",
+        choices=RENDER_MODES,
+        default="burn_in",
+        help="Draw on the source video, on a black overlay track, or write skeleton data to a sidecar file",
+    )
+    parser.add_argument("--antialias", action="store_true", help="Draw the skeleton with anti-aliased lines")
+    parser.add_argument(
+        "--encoder",
+        choices=ENCODER_BACKENDS,
+        default="auto",
+        help="Video encoder: ffmpeg pipe (falls back to OpenCV when ffmpeg is missing) or OpenCV mp4v",
+    )
+    parser.add_argument("--codec", choices=FFMPEG_CODECS, default="libx264", help="ffmpeg video codec")
+    parser.add_argument("--preset", choices=FFMPEG_PRESETS, default="veryfast", help="ffmpeg encoder preset")
+    parser.add_argument("--crf", type=int, default=23, help="ffmpeg constant rate factor (lower is better quality)")
+    parser.add_argument("--sync-encode", action="store_true", help="Encode on the drawing thread, not a writer thread")
+    parser.add_argument("--keypoint-cache", help="Directory for cached detector keypoints (skips re-detection)")
+    parser.add_argument("--cache-max-mb", type=float, default=2048, help="Keypoint cache size limit in MB")
+    parser.add_argument(
+        "--detector-profile",
+        choices=list(DETECTOR_PROFILES),
+        default="heavy",
+        help="MediaPipe Pose speed/accuracy profile",
+    )
+    parser.add_argument(
+        "--inference-scale",
+        type=float,
+        default=1.0,
+        help="Downscale factor (0-1] applied before pose inference",
+    )
+    parser.add_argument(
+        "--roi-tracking",
+        action="store_true",
+        help="Crop inference to the previous skeleton's bounding box, falling back to the full frame",
+    )
+    parser.add_argument("--roi-margin", type=float, default=0.25, help="ROI margin relative to the skeleton size")
+    parser.add_argument(
+        "--max-people",
+        type=int,
+        default=1,
+        help="Track up to N people with persistent IDs (N > 1 needs --landmarker-model)",
+    )
+    parser.add_argument("--landmarker-model", help="MediaPipe PoseLandmarker .task model for multi-person detection")
+    parser.add_argument("--track-min-iou", type=float, default=0.3, help="Multi-person: box IoU needed to keep an ID")
+    parser.add_argument(
+        "--track-max-missed",
+        type=int,
+        default=15,
+        help="Multi-person: frames a person may be missing before the track is closed",
+    )
+    parser.add_argument(
+        "--keyframes",
+        choices=KEYFRAME_MODES,
+        help="Detect only keyframes (fixed stride, motion, or frame difference) and interpolate the rest",
+    )
+    parser.add_argument("--keyframe-stride", type=int, default=4, help="Keyframe stride / largest keyframe gap")
+    parser.add_argument(
+        "--motion-threshold",
+        type=float,
+        default=6.0,
+        help="Largest joint movement in pixels between keyframes (--keyframes motion)",
+    )
+    parser.add_argument(
+        "--diff-threshold",
+        type=float,
+        default=4.0,
+        help="Mean grayscale difference that starts a keyframe (--keyframes frame_diff)",
+    )
+    parser.add_argument(
+        "--validate-every",
+        type=int,
+        default=10,
+        help="Also detect every Nth interpolated frame to measure interpolation error (0 = off)",
+    )
+    parser.add_argument(
+        "--metrics",
+        action="append",
+        help="Metrics sink (repeatable): log, json[:path], prometheus[:path]; default: log",
+    )
+    parser.add_argument(
+        "--progress-interval",
+        type=float,
+        default=10.0,
+        help="Seconds between progress lines and metrics snapshots (0 = off)",
+    )
+    parser.add_argument("--profile", choices=PROFILE_MODES, help="Capture a cProfile or tracemalloc profile")
     parser.add_argument("--gui", action="store_true", help="Launch GUI")
     return parser.parse_args()
 
 
-def run_pipeline(input_path: Path, output_dir: Path, target_fps: float | None) -> None:
-    loader = VideoLoader(str(input_path), target_fps=target_fps)
-    detector = PoseDetector()
-    builder = SkeletonBuilder()
-    analyzer = MotionAnalyzer()
-    reports: list[MotionReport] = []
+def run_pipeline(
+    input_path: Path,
+    output_dir: Path,
+    target_fps: float | None,
+    *,
+    ranges: Sequence[TimeRange] = (),
+    pipelined: bool = False,
+    queue_depth: int = 4,
+    workers: int = 0,
+    chunk_seconds: float = 60.0,
+    chunk_overlap: float = 2.0,
+    smoothing: str = "moving_average",
+    smoothing_window: int = 5,
+    offline: Optional[OfflineConfig] = None,
+    gap_fill: Optional[GapFillConfig] = None,
+    report_format: str = "json",
+    report_mode: str = "frames",
+    summary_config: Optional[SummaryConfig] = None,
+    operation_log: str = "templates",
+    export_formats: Sequence[str] = (),
+    render_video: bool = True,
+    render_mode: str = "burn_in",
+    overlay_style: Optional[OverlayStyle] = None,
+    encoder_config: Optional[EncoderConfig] = None,
+    keypoint_cache: Optional[Path] = None,
+    cache_max_bytes: int = 2 * 1024**3,
+    detector_config: Optional[DetectorConfig] = None,
+    keyframes: Optional[KeyframeConfig] = None,
+    detector: Optional[PoseDetector] = None,
+    track_min_iou: float = 0.3,
+    track_max_missed: int = 15,
+    metrics_sinks: Sequence[str] = ("log",),
+    progress_interval_s: float = 10.0,
+    profile: Optional[str] = None,
+) -> PipelineResult:
+    """Run detection, analysis, and rendering for one video.
+
+    ``ranges`` limits processing to those time ranges (all frames when
+    empty); the video seeks past everything else, timestamps stay those of
+    the full video, and tracking, smoothing, and analysis start over at each
+    range.
+
+    With ``pipelined=True`` decode, detection, analysis, and encoding run on
+    separate threads connected by bounded queues of ``queue_depth`` items.
+    With ``workers > 1`` detection runs on a process pool over time chunks of
+    ``chunk_seconds``, each warmed up on ``chunk_overlap`` preceding seconds;
+    this process then only decodes frames itself for burn-in output.
+    ``smoothing`` names a filter from ``utils.filters.FILTERS``. With
+    ``offline`` the run takes two passes instead: the first collects the
+    unsmoothed trajectory of the whole video, which is then smoothed without
+    lag and differentiated with central differences (see ``offline``), and
+    the second writes reports and renders the overlay. ``gap_fill`` fills
+    short runs of missed detections by interpolation (see ``gap_filling``);
+    filled frames are reported with ``keypoint_source="gap_filled"``. Reports are
+    streamed to disk frame by frame in ``report_format`` ("json" or "jsonl");
+    ``operation_log`` controls the formula log ("full", "templates", or "off").
+    ``report_mode`` adds (``"both"``) or substitutes (``"summary"``) the
+    per-frame reports with an aggregate ``motion_summary.json`` of speeds,
+    ranges of motion, and repetitions (see ``motion_summary``, configured
+    by ``summary_config``).
+    ``export_formats`` adds columnar motion data exports (see ``motion_export``).
+    With ``render_video=False`` no overlay is written. ``render_mode`` (see
+    ``visualizer.RENDER_MODES``) draws on the source video, on a black
+    overlay track, or writes a skeleton sidecar file without encoding;
+    ``overlay_style`` sets colors, sizes, and anti-aliasing, and
+    ``encoder_config`` the video encoder backend. ``keypoint_cache``
+    is a directory of cached detector output; on a hit detection is skipped,
+    and unless the skeleton is burned into the video the input is not
+    decoded at all.
+    ``detector_config`` selects the detector profile, downscale, and ROI
+    tracking; its parameters are recorded in the report summary. With
+    ``keyframes`` only keyframes are detected and the frames in between get
+    interpolated keypoints; statistics go to ``keyframe_stats.json``.
+    ``detector`` is an already loaded detector built from ``detector_config``
+    to reuse across videos; it is reset before use and left open. With
+    ``detector_config.max_people > 1`` the run is handed to
+    ``multi_person.run_multi_person`` (tracked with ``track_min_iou`` and
+    ``track_max_missed``).
+    Per-stage timings and counters go to ``metrics_sinks`` (see
+    ``metrics.create_sink``) at the end and every ``progress_interval_s``
+    together with a progress line; ``profile`` ("cprofile" or "tracemalloc")
+    captures a profile of the run into ``output_dir``.
+    """
+
+    detector_config = detector_config or DetectorConfig()
+    if detector_config.max_people > 1:
+        unsupported = {
+            "workers": workers > 1,
+            "keyframes": keyframes is not None,
+            "keypoint_cache": keypoint_cache is not None,
+            "export_formats": bool(export_formats),
+            "offline": offline is not None,
+            "gap_fill": gap_fill is not None,
+        }
+        if any(unsupported.values()):
+            names = ", ".join(name for name, used in unsupported.items() if used)
+            raise ValueError(f"Multi-person detection does not support {names}")
+        if pipelined:
+            logger.info("Multi-person detection runs sequentially; ignoring pipelined")
+        return run_multi_person(
+            input_path,
+            output_dir,
+            target_fps,
+            ranges=ranges,
+            smoothing=smoothing,
+            smoothing_window=smoothing_window,
+            report_format=report_format,
+            report_mode=report_mode,
+            summary_config=summary_config,
+            operation_log=operation_log,
+            render_video=render_video,
+            render_mode=render_mode,
+            overlay_style=overlay_style,
+            encoder_config=encoder_config,
+            detector_config=detector_config,
+            detector=detector,
+            track_min_iou=track_min_iou,
+            track_max_missed=track_max_missed,
+            metrics_sinks=metrics_sinks,
+            progress_interval_s=progress_interval_s,
+            profile=profile,
+        )
+
+    started = time.perf_counter()
+    run_metadata = {"detector": detector_config.params()}
+    if keyframes is not None:
+        run_metadata["keyframes"] = keyframes.params()
+    if offline is not None:
+        run_metadata["offline"] = offline.params()
+    if gap_fill is not None:
+        run_metadata["gap_fill"] = gap_fill.params()
+    ranges = merge_ranges(ranges)
+    if ranges:
+        run_metadata["ranges"] = [[item.start_s, item.end_s] for item in ranges]
+
+    # Created first so a missing optional dependency fails the run before any video is opened.
+    exporter = ColumnarMotionWriter(output_dir, export_formats) if export_formats else None
+    cache = KeypointCache(keypoint_cache, cache_max_bytes) if keypoint_cache is not None else None
+    loader_params = {
+        "target_fps": target_fps,
+        "keyframes": run_metadata.get("keyframes"),
+        "ranges": run_metadata.get("ranges"),
+        "gap_fill": run_metadata.get("gap_fill"),
+    }
+    cache_key = cache.key(input_path, detector_config.params(), loader_params) if cache is not None else None
+    cached = cache.load(cache_key) if cache is not None else None
+    recorder = KeypointRecorder() if cache is not None and cached is None else None
 
-    output_video_path = output_dir / "skeleton_overlay.mp4"
-    visualizer = Visualizer(
-        output_path=output_video_path,
-        fps=loader.meta.fps,
-        frame_size=(loader.meta.width, loader.meta.height),
+    if render_mode not in RENDER_MODES:
+        raise ValueError(f"Unsupported render mode: {render_mode}")
+    loader = None
+    if cached is None or (render_video and render_mode == "burn_in"):
+        loader = VideoLoader(str(input_path), target_fps=target_fps, reuse_buffers=True, ranges=ranges)
+        video_info = {"fps": loader.output_fps, "width": loader.meta.width, "height": loader.meta.height}
+    else:
+        video_info = cached.meta
+    owns_detector = detector is None
+    if cached is not None or workers > 1:
+        detector = None
+    elif detector is not None:
+        detector.reset()
+    else:
+        detector = PoseDetector(detector_config)
+    metrics = PipelineMetrics(
+        [create_sink(spec, output_dir) for spec in metrics_sinks],
+        video=Path(input_path).name,
+        expected_frames=loader.output_frame_count if loader is not None else len(cached),
+        progress_interval_s=progress_interval_s,
+    )
+    if loader is not None:
+        metrics.add_collector(
+            lambda: {"frames_decoded": loader.frames_decoded, "frames_dropped": loader.frames_dropped}
+        )
+    sampler = None
+    if detector is not None and keyframes is not None:
+        sampler = KeyframeSampler(
+            detector,
+            keyframes,
+            video_info["width"],
+            video_info["height"],
+            detect_timer=metrics.stage("detect"),
+        )
+    gap_filler = None
+    if gap_fill is not None and detector is not None:
+        gap_filler = GapFiller(gap_fill)
+        metrics.add_collector(
+            lambda: {"gaps_filled": gap_filler.gaps_filled, "gap_filled_joints": gap_filler.joints_filled}
+        )
+    builder_options = {"smoothing": smoothing, "smoothing_window": smoothing_window, "fps": video_info["fps"]}
+    trajectory = None
+    if offline is not None:
+        # The whole trajectory is smoothed afterwards; a one-frame average passes positions through.
+        builder_options.update(smoothing="moving_average", smoothing_window=1)
+        trajectory = TrajectoryRecorder()
+    builder = SkeletonBuilder(**builder_options)
+    analyzer = MotionAnalyzer(operation_log=operation_log)
+    writer = MathReportWriter(
+        output_dir,
+        json_format=report_format,
+        operation_log=operation_log,
+        metadata=run_metadata,
+        mode=report_mode,
+        summary_config=summary_config,
     )
 
-    prev_time = None
-    for frame in loader.frames():
-        keypoints = detector.detect(frame.rgb, loader.meta.width, loader.meta.height)
-        skeleton = builder.build(keypoints)
-        if prev_time is None:
-            delta_t = 1.0 / loader.meta.fps
-        else:
-            delta_t = frame.timestamp_s - prev_time
-        prev_time = frame.timestamp_s
+    frame_size = (video_info["width"], video_info["height"])
+    visualizer = None
+    track_writer = None
+    if render_video and render_mode == "sidecar":
+        output_video_path = output_dir / "skeleton_track.jsonl"
+        track_writer = SkeletonTrackWriter(output_video_path, video_info["fps"], frame_size)
+    elif render_video:
+        output_video_path = output_dir / ("skeleton_overlay.mp4" if render_mode == "burn_in" else "skeleton_track.mp4")
+        visualizer = Visualizer(
+            output_path=output_video_path,
+            fps=video_info["fps"],
+            frame_size=frame_size,
+            style=overlay_style or OverlayStyle(),
+            mode=render_mode,
+            encoder=encoder_config,
+        )
+
+    chunked = None
+    chunk_stream = None
+    if cached is None and workers > 1:
+        chunked = ChunkedDetector(
+            str(input_path),
+            target_fps,
+            workers,
+            chunk_seconds,
+            chunk_overlap,
+            builder_options=builder_options,
+            detector_config=detector_config,
+            keyframe_config=keyframes,
+            gap_fill_config=gap_fill,
+        )
+        # Owns the worker pool; closed explicitly below so a stopped run shuts the pool down right away.
+        chunk_stream = chunked.skeletons(loader.meta.frame_count, loader.meta.fps, loader.source_ranges())
+
+    def detect_keypoints(frames: Iterable[FrameData]) -> Iterator[Tuple[FrameData, KeypointArray]]:
+        segment = 0
+        for frame in frames:
+            if frame.segment != segment:
+                segment = frame.segment
+                detector.reset()
+            with metrics.timer("detect"):
+                keypoints = detector.detect_array(frame.rgb, video_info["width"], video_info["height"])
+            yield frame, keypoints
+
+    def build_skeletons(items: Iterable[Tuple[FrameData, KeypointArray]]) -> Iterator[Tuple[FrameData, SkeletonFrame]]:
+        if gap_filler is not None:
+            items = gap_filler.fill(items)
+        segment = 0
+        for frame, keypoints in items:
+            if frame.segment != segment:
+                segment = frame.segment
+                builder.reset()
+            with metrics.timer("build"):
+                skeleton = builder.build(keypoints, frame.timestamp_s)
+            yield frame, skeleton
+
+    def detect_stage(frames: Iterable[FrameData]) -> Iterator[Tuple[FrameData, SkeletonFrame]]:
+        yield from build_skeletons(detect_keypoints(frames))
+
+    def keyframe_detect_stage(frames: Iterable[FrameData]) -> Iterator[Tuple[FrameData, SkeletonFrame]]:
+        yield from build_skeletons(sampler.detect(frames))
+
+    def chunked_results() -> Iterator[Tuple[ChunkFrame, SkeletonFrame]]:
+        # Detection runs in worker processes; only the wait for their results is measured here.
+        return metrics.timed_iter("detect_wait", chunk_stream)
+
+    def chunked_detect_stage(frames: Iterable[FrameData]) -> Iterator[Tuple[FrameData, SkeletonFrame]]:
+        # Pairs decoded frames with the worker results; only used when drawing on the source frames.
+        skeletons = chunked_results()
+        for frame in frames:
+            position, skeleton = next(skeletons, (None, None))
+            if position is None or position.index != frame.index:
+                index = position.index if position is not None else None
+                raise RuntimeError(f"Chunk results out of sync at frame {frame.index} (got {index})")
+            yield frame, skeleton
 
-        report = analyzer.analyze(skeleton.points_3d, delta_t)
-        reports.append(report)
-        visualizer.draw(frame.bgr, skeleton.points_2d, report)
+    def chunked_result_stage(
+        items: Iterable[Tuple[ChunkFrame, SkeletonFrame]]
+    ) -> Iterator[Tuple[ChunkFrame, SkeletonFrame]]:
+        # Worker results are already skeletons; this keeps at least one stage for offline runs.
+        yield from items
 
-    visualizer.close()
-    detector.close()
-    loader.release()
+    def cached_detect_stage(frames: Iterable[FrameData]) -> Iterator[Tuple[FrameData, SkeletonFrame]]:
+        cached_frames = cached.frames()
+        segment = 0
+        for frame in frames:
+            entry = next(cached_frames, None)
+            if entry is None or entry.index != frame.index:
+                raise RuntimeError(f"Keypoint cache out of sync at frame {frame.index}")
+            if frame.segment != segment:
+                segment = frame.segment
+                builder.reset()
+            with metrics.timer("build"):
+                skeleton = builder.build(entry.keypoints, frame.timestamp_s)
+            yield frame, skeleton
 
-    writer = MathReportWriter(output_dir)
-    writer.write(reports)
+    def cached_build_stage(entries: Iterable[CachedFrame]) -> Iterator[Tuple[CachedFrame, SkeletonFrame]]:
+        segment = 0
+        for entry in entries:
+            if entry.segment != segment:
+                segment = entry.segment
+                builder.reset()
+            with metrics.timer("build"):
+                skeleton = builder.build(entry.keypoints, entry.timestamp_s)
+            yield entry, skeleton
 
-    logger.info("Output video saved to %s", output_video_path)
+    def record_skeleton(frame: FrameData, skeleton: SkeletonFrame) -> None:
+        if recorder is not None:
+            recorder.add(frame.index, frame.timestamp_s, skeleton.keypoints, frame.segment)
+        if not skeleton.keypoints.detected:
+            metrics.increment("detection_misses")
+        if skeleton.keypoints.source != "detected":
+            metrics.increment(f"{skeleton.keypoints.source}_frames")
+        if skeleton.fallbacks:
+            metrics.increment("low_visibility_fallbacks", skeleton.fallbacks)
+
+    def analyze_stage(
+        items: Iterable[Tuple[FrameData, SkeletonFrame]]
+    ) -> Iterator[Tuple[FrameData, SkeletonFrame, MotionReport]]:
+        prev_time = None
+        segment = 0
+        for frame, skeleton in items:
+            if frame.segment != segment:
+                segment = frame.segment
+                analyzer.reset()
+                prev_time = None
+            record_skeleton(frame, skeleton)
+            if prev_time is None:
+                delta_t = 1.0 / video_info["fps"]
+            else:
+                delta_t = frame.timestamp_s - prev_time
+            prev_time = frame.timestamp_s
+            with metrics.timer("analyze"):
+                report = analyzer.analyze(skeleton.positions, delta_t, skeleton.valid)
+            report.keypoint_source = skeleton.keypoints.source
+            yield frame, skeleton, report
+
+    def encode_stage(
+        items: Iterable[Tuple[FrameData, SkeletonFrame, MotionReport]]
+    ) -> Iterator[Tuple[FrameData, SkeletonFrame, MotionReport]]:
+        for frame, skeleton, report in items:
+            if track_writer is not None:
+                with metrics.timer("track"):
+                    track_writer.write_frame(frame.timestamp_s, skeleton.positions, skeleton.valid, report)
+            else:
+                background = frame.bgr if render_mode == "burn_in" else None
+                with metrics.timer("draw"):
+                    image = visualizer.render(background, skeleton.positions, report, skeleton.valid)
+                with metrics.timer("encode"):
+                    visualizer.write(image)
+            yield frame, skeleton, report
+
+    def write_offline() -> None:
+        # Second pass: reports and rendering from the smoothed whole-video trajectory.
+        with metrics.timer("analyze"):
+            motion = trajectory.analyze(offline, operation_log)
+        timestamps = trajectory.timestamps.tolist()
+        segments = trajectory.segments.tolist()
+        frames = None
+        if visualizer is not None and render_mode == "burn_in":
+            frames = metrics.timed_iter("decode", loader.selected_frames())
+        for i, index in enumerate(trajectory.indices):
+            report = motion.report(i)
+            report.keypoint_source = trajectory.sources[i]
+            with metrics.timer("report"):
+                writer.write_frame(report, timestamps[i], segments[i])
+                if exporter is not None:
+                    exporter.write_frame(report, timestamps[i])
+            if track_writer is not None:
+                with metrics.timer("track"):
+                    track_writer.write_frame(timestamps[i], report.positions, report.valid, report)
+            elif visualizer is not None:
+                background = None
+                if frames is not None:
+                    frame = next(frames, None)
+                    if frame is None or frame.index != index:
+                        raise RuntimeError(f"Render pass out of sync at frame {index}")
+                    background = frame.bgr
+                with metrics.timer("draw"):
+                    image = visualizer.render(background, report.positions, report, report.valid)
+                with metrics.timer("encode"):
+                    visualizer.write(image)
+
+    # Only a streaming burn-in render needs the decoded frames here; offline runs render in the second pass.
+    draw_frames = trajectory is None and visualizer is not None and render_mode == "burn_in"
+    if cached is not None:
+        source = metrics.timed_iter("decode", loader.selected_frames()) if draw_frames else cached.frames()
+        stages = [cached_detect_stage if draw_frames else cached_build_stage]
+    elif chunked is not None and not draw_frames:
+        # The workers decode every frame already.
+        source = chunked_results()
+        stages = [chunked_result_stage]
+    else:
+        source = metrics.timed_iter("decode", loader.selected_frames())
+        if chunked is not None:
+            stages = [chunked_detect_stage]
+        else:
+            stages = [keyframe_detect_stage if sampler is not None else detect_stage]
+    if trajectory is None:
+        stages.append(analyze_stage)
+        if visualizer is not None or track_writer is not None:
+            stages.append(encode_stage)
+
+    writer.open()
+    try:
+        with profiling(profile, output_dir):
+            if pipelined:
+                logger.info("Running pipelined execution with queue depth %d", queue_depth)
+                results = StagedPipeline(source, stages, queue_depths=queue_depth).run()
+            else:
+                results = run_sequential(source, stages)
+            # Closing the results stops and joins the pipeline threads before the loader and
+            # detector they use are released below, also when writing a frame fails.
+            with contextlib.closing(results):
+                if trajectory is not None:
+                    for frame, skeleton in results:
+                        record_skeleton(frame, skeleton)
+                        trajectory.add(frame.index, frame.timestamp_s, frame.segment, skeleton)
+                        metrics.frame_done()
+                else:
+                    for frame, _, report in results:
+                        with metrics.timer("report"):
+                            writer.write_frame(report, frame.timestamp_s, frame.segment)
+                            if exporter is not None:
+                                exporter.write_frame(report, frame.timestamp_s)
+                        metrics.frame_done()
+            if trajectory is not None:
+                write_offline()
+    finally:
+        writer.close()
+        if visualizer is not None:
+            visualizer.close()
+        if track_writer is not None:
+            track_writer.close()
+        if detector is not None and owns_detector:
+            detector.close()
+        if chunk_stream is not None:
+            chunk_stream.close()
+        if loader is not None:
+            loader.release()
+
+    if exporter is not None:
+        exporter.close()
+    if recorder is not None:
+        cache.store(cache_key, recorder.result(video_info))
+    keyframe_stats: Optional[KeyframeStats] = None
+    if sampler is not None:
+        keyframe_stats = sampler.stats
+    elif chunked is not None and keyframes is not None:
+        keyframe_stats = chunked.keyframe_stats
+    if keyframe_stats is not None:
+        _write_keyframe_stats(output_dir / "keyframe_stats.json", keyframe_stats)
+
+    if visualizer is not None or track_writer is not None:
+        logger.info("Skeleton output saved to %s", output_video_path)
     logger.info("Math reports saved to %s", output_dir)
+    snapshot = metrics.close()
+    return PipelineResult(
+        output_dir=output_dir,
+        frames=metrics.frames,
+        elapsed_s=time.perf_counter() - started,
+        metrics=snapshot,
+    )
+
+
+def _write_keyframe_stats(path: Path, stats: KeyframeStats) -> None:
+    summary = stats.to_dict()
+    path.write_text(json.dumps(summary, indent=2), encoding="utf-8")
+    mean_error = summary["mean_error_px"]
+    logger.info(
+        "Keyframes: detected %d of %d frames (ratio %.2f, %.2fs inference), mean interpolation error %s",
+        stats.detections,
+        stats.frames,
+        summary["detection_ratio"] or 0.0,
+        stats.detect_time_s,
+        f"{mean_error:.2f}px" if mean_error is not None else "not measured",
+    )
 
 
 def main() -> None:
@@ -74,20 +728,141 @@ def main() -> None:
         launch_gui()
         return
 
+    detector_config = DetectorConfig(
+        profile=args.detector_profile,
+        inference_scale=args.inference_scale,
+        roi_tracking=args.roi_tracking,
+        roi_margin=args.roi_margin,
+        max_people=args.max_people,
+        landmarker_model=args.landmarker_model,
+    )
+
+    if args.live:
+        from live import run_live
+
+        stdin_size = None
+        if args.stdin_size:
+            width, _, height = args.stdin_size.lower().partition("x")
+            if not (width.isdigit() and height.isdigit() and int(width) > 0 and int(height) > 0):
+                raise SystemExit(f"--stdin-size must be WIDTHxHEIGHT, e.g. 640x480 (got {args.stdin_size!r})")
+            stdin_size = (int(width), int(height))
+        run_live(
+            args.live,
+            output=args.live_output,
+            max_latency_s=args.max_latency,
+            stdin_fps=args.stdin_fps,
+            stdin_size=stdin_size,
+            smoothing=args.smoothing,
+            smoothing_window=args.smoothing_window,
+            operation_log=args.operation_log or "off",
+            detector_config=detector_config,
+        )
+        return
+
     if not args.output:
-        raise SystemExit("--output is required unless --gui is used")
+        raise SystemExit("--output is required unless --gui or --live is used")
 
     output_dir = Path(args.output)
     output_dir.mkdir(parents=True, exist_ok=True)
 
+    ranges = [parse_time_range(spec) for spec in args.range]
+    if args.start or args.end:
+        start = parse_time(args.start) if args.start else 0.0
+        ranges.append(TimeRange(start, parse_time(args.end) if args.end else None))
+
+    options = dict(
+        ranges=ranges,
+        metrics_sinks=args.metrics or ["log"],
+        progress_interval_s=args.progress_interval,
+        profile=args.profile,
+        pipelined=args.pipelined,
+        queue_depth=args.queue_depth,
+        chunk_seconds=args.chunk_seconds,
+        chunk_overlap=args.chunk_overlap,
+        smoothing=args.smoothing,
+        smoothing_window=args.smoothing_window,
+        offline=(
+            OfflineConfig(
+                method=args.offline,
+                window=args.offline_window,
+                polyorder=args.offline_polyorder,
+                alpha=args.offline_alpha,
+            )
+            if args.offline
+            else None
+        ),
+        gap_fill=GapFillConfig(method=args.gap_fill, max_gap=args.max_gap) if args.gap_fill else None,
+        report_format=args.report_format,
+        report_mode=args.report_mode,
+        summary_config=SummaryConfig(flexed_deg=args.rep_flexed, extended_deg=args.rep_extended),
+        operation_log=args.operation_log or "templates",
+        export_formats=args.export,
+        render_video=not args.no_video,
+        render_mode=args.render_mode,
+        overlay_style=OverlayStyle(antialias=args.antialias),
+        encoder_config=EncoderConfig(
+            backend=args.encoder,
+            codec=args.codec,
+            preset=args.preset,
+            crf=args.crf,
+            async_write=not args.sync_encode,
+        ),
+        keypoint_cache=Path(args.keypoint_cache) if args.keypoint_cache else None,
+        cache_max_bytes=int(args.cache_max_mb * 1024**2),
+        detector_config=detector_config,
+        track_min_iou=args.track_min_iou,
+        track_max_missed=args.track_max_missed,
+        keyframes=(
+            KeyframeConfig(
+                mode=args.keyframes,
+                stride=args.keyframe_stride,
+                motion_threshold_px=args.motion_threshold,
+                diff_threshold=args.diff_threshold,
+                validate_every=args.validate_every,
+            )
+            if args.keyframes
+            else None
+        ),
+    )
+
+    if args.batch:
+        from batch import run_batch
+
+        run_batch(args.batch, output_dir, args.target_fps, workers=args.workers, rerun=args.rerun, options=options)
+        return
+
+    download_cache = DownloadCache(Path(args.download_cache)) if args.download_cache else None
+    if args.download_urls:
+        from batch import run_download_batch
+
+        run_download_batch(
+            read_url_list(Path(args.download_urls)),
+            output_dir,
+            args.target_fps,
+            download_cache or DownloadCache(output_dir / "downloads"),
+            download_workers=args.download_workers,
+            workers=args.workers,
+            rerun=args.rerun,
+            cookies_from_browser=args.cookies_from_browser,
+            concurrent_fragments=args.concurrent_fragments,
+            options=options,
+        )
+        return
+
     input_path = Path(args.input) if args.input else None
     if args.download_url:
-        input_path = download_video(args.download_url, output_dir, args.cookies_from_browser)
+        input_path = download_video(
+            args.download_url,
+            output_dir,
+            args.cookies_from_browser,
+            cache=download_cache,
+            concurrent_fragments=args.concurrent_fragments,
+        )
 
     if input_path is None:
-        raise SystemExit("Provide --input or --download-url")
+        raise SystemExit("Provide --input, --download-url, --download-urls, or --batch")
 
-    run_pipeline(input_path, output_dir, args.target_fps)
+    run_pipeline(input_path, output_dir, args.target_fps, workers=args.workers, **options)
 
 
 if __name__ == "__main__":
@@ -1,53 +1,246 @@
 from __future__ import annotations
 
 import json
-from dataclasses import asdict
+import shutil
+import tempfile
 from pathlib import Path
-from typing import Dict, List
+from typing import IO, Any, Dict, Iterable, List, Optional
 
-from motion_analysis import MotionReport
+from motion_analysis import OPERATION_LOG_MODES, OPERATION_TEMPLATES, MotionReport, expand_operation_templates
+from motion_summary import MotionSummary, SummaryConfig
+
+TEXT_HEADER = [
+    "Математический отчёт",
+    "=====================",
+    "",
+    "Использованные формулы:",
+    "1. Длина сегмента: L = sqrt((x2-x1)^2 + (y2-y1)^2 + (z2-z1)^2)",
+    "2. Угол между векторами: θ = arccos( (v1·v2) / (||v1|| ||v2||) )",
+    "3. Скорость: v = (p_t - p_(t-1)) / Δt",
+    "4. Ускорение: a = (v_t - v_(t-1)) / Δt",
+    "",
+]
+
+FORMULAS = {
+    "segment_length": "L = sqrt((x2-x1)^2 + (y2-y1)^2 + (z2-z1)^2)",
+    "angle": "theta = arccos( (v1·v2) / (||v1|| ||v2||) )",
+    "velocity": "v = (p_t - p_(t-1)) / Δt",
+    "acceleration": "a = (v_t - v_(t-1)) / Δt",
+}
+
+REPORT_FORMATS = ("json", "jsonl")
+# "frames" writes per-frame reports, "summary" only ``motion_summary.json``
+# (see ``motion_summary``), "both" writes both.
+REPORT_MODES = ("frames", "summary", "both")
+
+
+def report_to_dict(report: MotionReport, operation_log: str = "full") -> Dict[str, Any]:
+    """JSON-serializable view of a ``MotionReport`` (numpy arrays become lists).
+
+    ``operation_log`` selects which operation fields are included (see
+    ``motion_analysis.OPERATION_LOG_MODES``).
+    """
+
+    frame: Dict[str, Any] = {
+        "keypoint_source": report.keypoint_source,
+        "angles_deg": report.angles_deg,
+        "segment_lengths": report.segment_lengths,
+        "joint_metrics": {
+            name: {
+                "position": metrics.position.tolist(),
+                "velocity": metrics.velocity.tolist(),
+                "acceleration": metrics.acceleration.tolist(),
+            }
+            for name, metrics in report.joint_metrics.items()
+        },
+    }
+    if operation_log == "full":
+        frame["math_operations"] = report.math_operations
+    if operation_log != "off" and report.operation_counts is not None:
+        frame["operation_counts"] = report.operation_counts
+    return frame
 
 
 class MathReportWriter:
-    """Write human-readable and JSON reports for the analysis."""
+    """Write human-readable and JSON reports for the analysis.
+
+    Frames are streamed to disk as they arrive, so memory does not grow with
+    video length. ``json_format="json"`` writes ``math_report.json`` with the
+    same top-level layout as before; ``"jsonl"`` writes ``math_report.jsonl``
+    with a summary line followed by one line per frame, which stays readable
+    even if the run crashes. Files are flushed every ``flush_every`` frames.
+
+    With ``operation_log="full"`` every frame lists its operation strings.
+    ``"templates"`` writes each operation template once in the summary and
+    only per-frame counts; ``"off"`` omits the operation log entirely.
+    ``metadata`` (e.g. detector settings) is recorded in the summary.
 
-    def __init__(self, output_dir: Path) -> None:
+    ``mode`` (see ``REPORT_MODES``) adds or substitutes an aggregate
+    ``motion_summary.json`` built with ``summary_config``; in ``"summary"``
+    mode no per-frame files are written at all.
+    """
+
+    def __init__(
+        self,
+        output_dir: Path,
+        json_format: str = "json",
+        flush_every: int = 100,
+        operation_log: str = "full",
+        metadata: Optional[Dict[str, Any]] = None,
+        mode: str = "frames",
+        summary_config: Optional[SummaryConfig] = None,
+    ) -> None:
+        if mode not in REPORT_MODES:
+            raise ValueError(f"Unsupported report mode: {mode}")
+        if json_format not in REPORT_FORMATS:
+            raise ValueError(f"Unsupported report format: {json_format}")
+        if operation_log not in OPERATION_LOG_MODES:
+            raise ValueError(f"Unsupported operation log mode: {operation_log}")
         self.output_dir = output_dir
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.json_format = json_format
+        self.flush_every = max(1, flush_every)
+        self.operation_log = operation_log
+        self.metadata = dict(metadata or {})
+        self.mode = mode
+        self.summary_config = summary_config
+        self._summary: Optional[MotionSummary] = None
+        self._opened = False
+        self._text: Optional[IO[str]] = None
+        self._json: Optional[IO[str]] = None
+        self._operations: Optional[IO[str]] = None
+        self._frames = 0
+        self._operation_count = 0
+
+    @property
+    def json_path(self) -> Path:
+        return self.output_dir / f"math_report.{self.json_format}"
+
+    @property
+    def summary_path(self) -> Path:
+        return self.output_dir / "motion_summary.json"
 
-    def write(self, reports: List[MotionReport]) -> None:
-        text_path = self.output_dir / "math_report.txt"
-        json_path = self.output_dir / "math_report.json"
-
-        math_operations: List[str] = []
-        for report in reports:
-            math_operations.extend(report.math_operations)
-
-        text_lines = [
-            "Математический отчёт",
-            "=====================",
-            "",
-            "Использованные формулы:",
-            "1. Длина сегмента: L = sqrt((x2-x1)^2 + (y2-y1)^2 + (z2-z1)^2)",
-            "2. Угол между векторами: θ = arccos( (v1·v2) / (||v1|| ||v2||) )",
-            "3. Скорость: v = (p_t - p_(t-1)) / Δt",
-            "4. Ускорение: a = (v_t - v_(t-1)) / Δt",
-            "",
-            "Логи вычислений по кадрам:",
-            *[f"- {op}" for op in math_operations],
-        ]
-        text_path.write_text("\n".join(text_lines), encoding="utf-8")
-
-        json_payload = {
-            "summary": {
-                "formulas": {
-                    "segment_length": "L = sqrt((x2-x1)^2 + (y2-y1)^2 + (z2-z1)^2)",
-                    "angle": "theta = arccos( (v1·v2) / (||v1|| ||v2||) )",
-                    "velocity": "v = (p_t - p_(t-1)) / Δt",
-                    "acceleration": "a = (v_t - v_(t-1)) / Δt",
-                }
-            },
-            "frames": [asdict(report) for report in reports],
-            "math_operations": math_operations,
+    def open(self) -> None:
+        self._opened = True
+        self._frames = 0
+        self._operation_count = 0
+        self._summary = MotionSummary(self.summary_config) if self.mode != "frames" else None
+        if self.mode == "summary":
+            return
+        self._text = (self.output_dir / "math_report.txt").open("w", encoding="utf-8")
+        self._text.write("\n".join(self._text_header()))
+        self._json = self.json_path.open("w", encoding="utf-8")
+        summary_payload: Dict[str, Any] = {
+            "formulas": FORMULAS,
+            "operation_log": self.operation_log,
+            **self.metadata,
         }
-        json_path.write_text(json.dumps(json_payload, ensure_ascii=False, indent=2), encoding="utf-8")
+        if self.operation_log == "templates":
+            summary_payload["operation_templates"] = OPERATION_TEMPLATES
+        summary = json.dumps(summary_payload, ensure_ascii=False)
+        if self.json_format == "jsonl":
+            self._json.write(f'{{"summary": {summary}}}\n')
+        else:
+            self._json.write(f'{{"summary": {summary},\n"frames": [\n')
+        if self.json_format == "json" and self.operation_log == "full":
+            # The flat math_operations list comes after all frames; spool it to disk meanwhile.
+            self._operations = tempfile.TemporaryFile("w+", encoding="utf-8", dir=self.output_dir)
+
+    def _text_header(self) -> List[str]:
+        lines = list(TEXT_HEADER)
+        if self.metadata:
+            lines.append("Параметры запуска:")
+            lines.extend(f"- {key}: {json.dumps(value, ensure_ascii=False)}" for key, value in self.metadata.items())
+            lines.append("")
+        if self.operation_log == "full":
+            lines.append("Логи вычислений по кадрам:")
+        elif self.operation_log == "templates":
+            lines.append("Шаблоны операций:")
+            for kind, operations in expand_operation_templates().items():
+                lines.extend(f"- [{kind}] {op}" for op in operations)
+            lines.extend(["", "Логи вычислений по кадрам (число операций по шаблонам):"])
+        else:
+            lines.append("Логи вычислений отключены.")
+        return lines
+
+    def write_frame(self, report: MotionReport, timestamp_s: Optional[float] = None, segment: int = 0) -> None:
+        """Write one frame; ``timestamp_s`` and ``segment`` (time range) feed the summary's events."""
+
+        if not self._opened:
+            self.open()
+        if self._summary is not None:
+            self._summary.update(report, timestamp_s, segment)
+        if self._text is None or self._json is None:
+            self._frames += 1
+            return
+
+        if self.operation_log == "full":
+            for op in report.math_operations:
+                self._text.write(f"\n- {op}")
+        elif self.operation_log == "templates" and report.operation_counts is not None:
+            counts = ", ".join(f"{kind}={count}" for kind, count in report.operation_counts.items())
+            if report.keypoint_source != "detected":
+                counts += f" ({report.keypoint_source})"
+            self._text.write(f"\n- Кадр {self._frames}: {counts}")
+
+        frame = report_to_dict(report, self.operation_log)
+        if self.json_format == "jsonl":
+            self._json.write(json.dumps({"frame": self._frames, **frame}, ensure_ascii=False) + "\n")
+        else:
+            if self._frames:
+                self._json.write(",\n")
+            self._json.write(json.dumps(frame, ensure_ascii=False))
+        if self._operations is not None:
+            for op in report.math_operations:
+                if self._operation_count:
+                    self._operations.write(",\n")
+                self._operations.write(json.dumps(op, ensure_ascii=False))
+                self._operation_count += 1
+
+        self._frames += 1
+        if self._frames % self.flush_every == 0:
+            self.flush()
+
+    def flush(self) -> None:
+        for handle in (self._text, self._json):
+            if handle is not None:
+                handle.flush()
+
+    def close(self) -> None:
+        if not self._opened:
+            self.open()
+        self._opened = False
+        if self._summary is not None:
+            payload = {**self.metadata, **self._summary.to_dict()}
+            self.summary_path.write_text(json.dumps(payload, indent=2, ensure_ascii=False), encoding="utf-8")
+            self._summary = None
+        if self._text is None or self._json is None:
+            return
+        if self._operations is not None:
+            self._json.write('\n],\n"math_operations": [\n')
+            self._operations.seek(0)
+            shutil.copyfileobj(self._operations, self._json)
+            self._json.write("\n]}\n")
+            self._operations.close()
+            self._operations = None
+        elif self.json_format == "json":
+            self._json.write("\n]}\n")
+        self._text.close()
+        self._json.close()
+        self._text = None
+        self._json = None
+
+    def write(self, reports: Iterable[MotionReport]) -> None:
+        self.open()
+        try:
+            for report in reports:
+                self.write_frame(report)
+        finally:
+            self.close()
+
+    def __enter__(self) -> "MathReportWriter":
+        self.open()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
@@ -0,0 +1,333 @@
+from __future__ import annotations
+
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, TypeVar
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ("cprofile", "tracemalloc")
+METRICS_PREFIX = "video_output"
+
+T = TypeVar("T")
+
+
+class StageTimer:
+    """Accumulated wall time of one pipeline stage."""
+
+    __slots__ = ("calls", "total_s", "max_s")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.calls += 1
+        self.total_s += seconds
+        if seconds > self.max_s:
+            self.max_s = seconds
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "calls": self.calls,
+            "total_s": self.total_s,
+            "mean_ms": 1000.0 * self.total_s / self.calls if self.calls else 0.0,
+            "max_ms": 1000.0 * self.max_s,
+        }
+
+
+class MetricsSink:
+    """Receives metric snapshots; ``final`` is set for the end-of-run snapshot."""
+
+    def emit(self, snapshot: Dict[str, Any], final: bool) -> None:
+        raise NotImplementedError
+
+
+class LogSink(MetricsSink):
+    """Log the end-of-run stage breakdown and counters."""
+
+    def emit(self, snapshot: Dict[str, Any], final: bool) -> None:
+        if not final:
+            return
+        stages = snapshot["stages"]
+        busy = sum(stage["total_s"] for stage in stages.values()) or 1.0
+        logger.info(
+            "Metrics: %d frames in %.1fs (%.1f fps); stage time %s",
+            snapshot["frames"],
+            snapshot["elapsed_s"],
+            snapshot["fps"],
+            ", ".join(
+                f"{name} {stage['total_s']:.2f}s ({100.0 * stage['total_s'] / busy:.0f}%, "
+                f"{stage['mean_ms']:.2f}ms/call)"
+                for name, stage in stages.items()
+            ),
+        )
+        if snapshot["counters"]:
+            logger.info("Counters: %s", ", ".join(f"{name}={value}" for name, value in snapshot["counters"].items()))
+
+
+def _atomic_write(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            handle.write(text)
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+class JsonFileSink(MetricsSink):
+    """Keep the latest snapshot in a JSON file (replaced atomically)."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+
+    def emit(self, snapshot: Dict[str, Any], final: bool) -> None:
+        _atomic_write(self.path, json.dumps({**snapshot, "final": final}, indent=2))
+
+
+def _label_value(value: Any) -> str:
+    """Escape a label value for the Prometheus text format (backslash, quote, and newline)."""
+
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class PrometheusFileSink(MetricsSink):
+    """Write the latest snapshot in Prometheus text format (node_exporter textfile collector)."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+
+    def emit(self, snapshot: Dict[str, Any], final: bool) -> None:
+        labels = f'video="{_label_value(snapshot["video"])}"'
+        lines = [
+            f"# TYPE {METRICS_PREFIX}_frames_total counter",
+            f"{METRICS_PREFIX}_frames_total{{{labels}}} {snapshot['frames']}",
+            f"# TYPE {METRICS_PREFIX}_expected_frames gauge",
+            f"{METRICS_PREFIX}_expected_frames{{{labels}}} {snapshot['expected_frames']}",
+            f"# TYPE {METRICS_PREFIX}_elapsed_seconds gauge",
+            f"{METRICS_PREFIX}_elapsed_seconds{{{labels}}} {snapshot['elapsed_s']:.6f}",
+            f"# TYPE {METRICS_PREFIX}_fps gauge",
+            f"{METRICS_PREFIX}_fps{{{labels}}} {snapshot['fps']:.6f}",
+            f"# TYPE {METRICS_PREFIX}_finished gauge",
+            f"{METRICS_PREFIX}_finished{{{labels}}} {int(final)}",
+            f"# TYPE {METRICS_PREFIX}_stage_seconds_total counter",
+        ]
+        for name, stage in snapshot["stages"].items():
+            lines.append(f'{METRICS_PREFIX}_stage_seconds_total{{{labels},stage="{_label_value(name)}"}} {stage["total_s"]:.6f}')
+        lines.append(f"# TYPE {METRICS_PREFIX}_stage_calls_total counter")
+        for name, stage in snapshot["stages"].items():
+            lines.append(f'{METRICS_PREFIX}_stage_calls_total{{{labels},stage="{_label_value(name)}"}} {stage["calls"]}')
+        for name, value in snapshot["counters"].items():
+            lines.append(f"# TYPE {METRICS_PREFIX}_{name}_total counter")
+            lines.append(f"{METRICS_PREFIX}_{name}_total{{{labels}}} {value}")
+        _atomic_write(self.path, "\n".join(lines) + "\n")
+
+
+SINKS: Dict[str, Callable[..., MetricsSink]] = {
+    "log": LogSink,
+    "json": JsonFileSink,
+    "prometheus": PrometheusFileSink,
+}
+
+
+def create_sink(spec: str, output_dir: Path) -> MetricsSink:
+    """Create a sink from ``log``, ``json[:path]``, or ``prometheus[:path]``.
+
+    File sinks default to ``metrics.json`` / ``metrics.prom`` in ``output_dir``.
+    """
+
+    name, _, target = spec.partition(":")
+    if name not in SINKS:
+        raise ValueError(f"Unknown metrics sink: {name} (expected one of {', '.join(SINKS)})")
+    if name == "log":
+        return LogSink()
+    default = "metrics.json" if name == "json" else "metrics.prom"
+    return SINKS[name](Path(target) if target else output_dir / default)
+
+
+class PipelineMetrics:
+    """Per-stage timings, counters, and progress for one ``run_pipeline`` call.
+
+    Stages are timed with ``timer``/``timed_iter``; they may run on different
+    threads because each stage only updates its own entry. Collectors are
+    called on every snapshot to pull counters owned by other objects (e.g.
+    ``VideoLoader.frames_decoded``). Every ``progress_interval_s`` a progress
+    line with fps and ETA is logged and a snapshot goes to the sinks.
+    """
+
+    def __init__(
+        self,
+        sinks: Sequence[MetricsSink] = (),
+        video: str = "",
+        expected_frames: int = 0,
+        progress_interval_s: float = 10.0,
+    ) -> None:
+        self.sinks = list(sinks)
+        self.video = video
+        self.expected_frames = expected_frames
+        self.progress_interval_s = progress_interval_s
+        self.stages: Dict[str, StageTimer] = {}
+        self.counters: Dict[str, int] = {}
+        self.frames = 0
+        self._collectors: List[Callable[[], Dict[str, int]]] = []
+        self._started = time.perf_counter()
+        self._last_progress = self._started
+
+    def stage(self, name: str) -> StageTimer:
+        timer = self.stages.get(name)
+        if timer is None:
+            timer = self.stages.setdefault(name, StageTimer())
+        return timer
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        stage = self.stage(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stage.add(time.perf_counter() - start)
+
+    def timed_iter(self, name: str, items: Iterable[T]) -> Iterator[T]:
+        """Time how long each ``next()`` on ``items`` takes (e.g. decoding)."""
+
+        stage = self.stage(name)
+        iterator = iter(items)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            stage.add(time.perf_counter() - start)
+            yield item
+
+    def increment(self, name: str, value: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def add_collector(self, collector: Callable[[], Dict[str, int]]) -> None:
+        self._collectors.append(collector)
+
+    def frame_done(self) -> None:
+        self.frames += 1
+        if self.progress_interval_s <= 0:
+            return
+        now = time.perf_counter()
+        if now - self._last_progress >= self.progress_interval_s:
+            self._last_progress = now
+            self._log_progress(now - self._started)
+            self._emit(final=False)
+
+    def _log_progress(self, elapsed: float) -> None:
+        fps = self.frames / elapsed if elapsed > 0 else 0.0
+        if self.expected_frames > 0 and fps > 0:
+            remaining = max(0, self.expected_frames - self.frames) / fps
+            logger.info(
+                "Progress: %d/%d frames (%.1f%%), %.1f fps, ETA %s",
+                self.frames,
+                self.expected_frames,
+                100.0 * min(1.0, self.frames / self.expected_frames),
+                fps,
+                _format_duration(remaining),
+            )
+        else:
+            logger.info("Progress: %d frames, %.1f fps", self.frames, fps)
+
+    def snapshot(self) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self._started
+        counters = dict(self.counters)
+        for collector in self._collectors:
+            counters.update(collector())
+        return {
+            "video": self.video,
+            "frames": self.frames,
+            "expected_frames": self.expected_frames,
+            "elapsed_s": elapsed,
+            "fps": self.frames / elapsed if elapsed > 0 else 0.0,
+            "stages": {name: stage.to_dict() for name, stage in list(self.stages.items())},
+            "counters": counters,
+        }
+
+    def _emit(self, final: bool) -> Dict[str, Any]:
+        snapshot = self.snapshot()
+        for sink in self.sinks:
+            try:
+                sink.emit(snapshot, final)
+            except OSError as exc:
+                logger.warning("Metrics sink %s failed: %s", type(sink).__name__, exc)
+        return snapshot
+
+    def close(self) -> Dict[str, Any]:
+        """Send the final snapshot to every sink and return it."""
+
+        return self._emit(final=True)
+
+
+def _format_duration(seconds: float) -> str:
+    minutes, secs = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m{secs:02d}s" if hours else f"{minutes}m{secs:02d}s"
+
+
+@contextmanager
+def profiling(mode: Optional[str], output_dir: Path) -> Iterator[None]:
+    """Capture a cProfile or tracemalloc profile of the enclosed block.
+
+    ``cprofile`` writes ``profile.pstats`` and a ``profile.txt`` summary; it
+    only sees the calling thread, so profile without ``pipelined``.
+    ``tracemalloc`` writes the top allocation sites and peak traced memory to
+    ``tracemalloc.txt``.
+    """
+
+    if mode is None:
+        yield
+        return
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Unknown profile mode: {mode}")
+
+    if mode == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(str(output_dir / "profile.pstats"))
+            summary = io.StringIO()
+            pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(40)
+            (output_dir / "profile.txt").write_text(summary.getvalue(), encoding="utf-8")
+            logger.info("cProfile output saved to %s", output_dir / "profile.pstats")
+        return
+
+    tracemalloc.start(25)
+    try:
+        yield
+    finally:
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        lines = [
+            f"Current traced memory: {current / 1024**2:.1f} MiB",
+            f"Peak traced memory: {peak / 1024**2:.1f} MiB",
+            "",
+        ]
+        lines.extend(str(stat) for stat in snapshot.statistics("lineno")[:40])
+        (output_dir / "tracemalloc.txt").write_text("\n".join(lines) + "\n", encoding="utf-8")
+        logger.info(
+            "tracemalloc peak %.1f MiB; top allocations saved to %s",
+            peak / 1024**2,
+            output_dir / "tracemalloc.txt",
+        )
@@ -2,11 +2,12 @@ from __future__ import annotations
 
 import logging
 from dataclasses import dataclass, field
-from typing import Dict, List, Tuple
+from typing import Dict, List, Mapping, Optional, Tuple
 
 import numpy as np
 
-from utils.math_utils import angle_between_vectors
+from pose_detector import JOINT_INDEX, JOINT_NAMES, points_to_array
+from utils.math_utils import angles_between_vectors
 
 logger = logging.getLogger(__name__)
 
@@ -24,75 +25,281 @@ class MotionReport:
     segment_lengths: Dict[str, float] = field(default_factory=dict)
     joint_metrics: Dict[str, JointMetrics] = field(default_factory=dict)
     math_operations: List[str] = field(default_factory=list)
+    # Operations per ``OPERATION_TEMPLATES`` kind; None when the log is off.
+    operation_counts: Optional[Dict[str, int]] = None
+    # Joint-indexed arrays behind ``joint_metrics`` (``JOINT_NAMES`` order).
+    positions: Optional[np.ndarray] = field(default=None, repr=False)
+    velocities: Optional[np.ndarray] = field(default=None, repr=False)
+    accelerations: Optional[np.ndarray] = field(default=None, repr=False)
+    valid: Optional[np.ndarray] = field(default=None, repr=False)
+    # ``pose_detector.KEYPOINT_SOURCES`` entry of the frame's keypoints.
+    keypoint_source: str = "detected"
 
 
-class MotionAnalyzer:
-    """Compute motion vectors, angles, lengths, velocity, and acceleration."""
-
-    def __init__(self) -> None:
-        self._previous_positions: Dict[str, np.ndarray] = {}
-        self._previous_velocities: Dict[str, np.ndarray] = {}
-
-    def analyze(self, points_3d: Dict[str, np.ndarray], delta_t: float) -> MotionReport:
-        report = MotionReport()
-
-        # Segment lengths (Euclidean distances)
-        segments = {
-            "left_upper_arm": ("left_shoulder", "left_elbow"),
-            "left_lower_arm": ("left_elbow", "left_wrist"),
-            "right_upper_arm": ("right_shoulder", "right_elbow"),
-            "right_lower_arm": ("right_elbow", "right_wrist"),
-            "left_upper_leg": ("left_hip", "left_knee"),
-            "left_lower_leg": ("left_knee", "left_ankle"),
-            "right_upper_leg": ("right_hip", "right_knee"),
-            "right_lower_leg": ("right_knee", "right_ankle"),
-        }
-        for name, (a, b) in segments.items():
-            if a in points_3d and b in points_3d:
-                vector = points_3d[b] - points_3d[a]
-                length = float(np.linalg.norm(vector))
-                report.segment_lengths[name] = length
-                report.math_operations.append(
-                    f"Segment {name}: length = ||{b} - {a}|| = sqrt(sum((x_i^b - x_i^a)^2))"
-                )
-
-        # Angles at elbows and knees
-        angle_pairs = {
-            "left_elbow": ("left_shoulder", "left_elbow", "left_wrist"),
-            "right_elbow": ("right_shoulder", "right_elbow", "right_wrist"),
-            "left_knee": ("left_hip", "left_knee", "left_ankle"),
-            "right_knee": ("right_hip", "right_knee", "right_ankle"),
-        }
-        for name, (a, b, c) in angle_pairs.items():
-            if a in points_3d and b in points_3d and c in points_3d:
-                v1 = points_3d[a] - points_3d[b]
-                v2 = points_3d[c] - points_3d[b]
-                angle = angle_between_vectors(v1, v2)
-                report.angles_deg[name] = angle
-                report.math_operations.append(
-                    f"Angle {name}: arccos( (v1·v2) / (||v1||*||v2||) )"
-                )
-
-        # Velocity and acceleration
-        for name, position in points_3d.items():
-            prev_pos = self._previous_positions.get(name)
-            velocity = np.zeros_like(position)
-            acceleration = np.zeros_like(position)
-            if prev_pos is not None and delta_t > 0:
-                velocity = (position - prev_pos) / delta_t
-                prev_vel = self._previous_velocities.get(name)
-                if prev_vel is not None:
-                    acceleration = (velocity - prev_vel) / delta_t
-                report.math_operations.append(
-                    f"Velocity {name}: v = (p_t - p_(t-1)) / Δt; Accel a = (v_t - v_(t-1)) / Δt"
-                )
-
-            report.joint_metrics[name] = JointMetrics(
-                position=position,
-                velocity=velocity,
-                acceleration=acceleration,
-            )
-            self._previous_positions[name] = position
-            self._previous_velocities[name] = velocity
+SEGMENTS: Dict[str, Tuple[str, str]] = {
+    "left_upper_arm": ("left_shoulder", "left_elbow"),
+    "left_lower_arm": ("left_elbow", "left_wrist"),
+    "right_upper_arm": ("right_shoulder", "right_elbow"),
+    "right_lower_arm": ("right_elbow", "right_wrist"),
+    "left_upper_leg": ("left_hip", "left_knee"),
+    "left_lower_leg": ("left_knee", "left_ankle"),
+    "right_upper_leg": ("right_hip", "right_knee"),
+    "right_lower_leg": ("right_knee", "right_ankle"),
+}
+
+ANGLE_JOINTS: Dict[str, Tuple[str, str, str]] = {
+    "left_elbow": ("left_shoulder", "left_elbow", "left_wrist"),
+    "right_elbow": ("right_shoulder", "right_elbow", "right_wrist"),
+    "left_knee": ("left_hip", "left_knee", "left_ankle"),
+    "right_knee": ("right_hip", "right_knee", "right_ankle"),
+}
+
+SEGMENT_NAMES: Tuple[str, ...] = tuple(SEGMENTS)
+ANGLE_NAMES: Tuple[str, ...] = tuple(ANGLE_JOINTS)
+
+_SEGMENT_A = np.array([JOINT_INDEX[a] for a, _ in SEGMENTS.values()])
+_SEGMENT_B = np.array([JOINT_INDEX[b] for _, b in SEGMENTS.values()])
+_ANGLE_A = np.array([JOINT_INDEX[a] for a, _, _ in ANGLE_JOINTS.values()])
+_ANGLE_B = np.array([JOINT_INDEX[b] for _, b, _ in ANGLE_JOINTS.values()])
+_ANGLE_C = np.array([JOINT_INDEX[c] for _, _, c in ANGLE_JOINTS.values()])
+
+# Formula log templates, stored once per report; frames only reference them.
+OPERATION_TEMPLATES: Dict[str, str] = {
+    "segment": "Segment {name}: length = ||{b} - {a}|| = sqrt(sum((x_i^b - x_i^a)^2))",
+    "angle": "Angle {name}: arccos( (v1·v2) / (||v1||*||v2||) )",
+    "velocity": "Velocity {name}: v = (p_t - p_(t-1)) / Δt; Accel a = (v_t - v_(t-1)) / Δt",
+}
+
+# "full" expands every template per frame (legacy), "templates" records
+# per-frame counts by template, "off" records nothing.
+OPERATION_LOG_MODES = ("full", "templates", "off")
+
+_SEGMENT_OPERATIONS = [
+    OPERATION_TEMPLATES["segment"].format(name=name, a=a, b=b) for name, (a, b) in SEGMENTS.items()
+]
+_ANGLE_OPERATIONS = [OPERATION_TEMPLATES["angle"].format(name=name) for name in ANGLE_JOINTS]
+_VELOCITY_OPERATIONS = [OPERATION_TEMPLATES["velocity"].format(name=name) for name in JOINT_NAMES]
+
+
+def expand_operation_templates() -> Dict[str, List[str]]:
+    """Every concrete operation string per ``OPERATION_TEMPLATES`` kind."""
+
+    return {
+        "segment": list(_SEGMENT_OPERATIONS),
+        "angle": list(_ANGLE_OPERATIONS),
+        "velocity": list(_VELOCITY_OPERATIONS),
+    }
+
 
+def _segments_and_angles(positions: np.ndarray, valid: np.ndarray) -> Tuple[np.ndarray, ...]:
+    """Segment lengths and joint angles for ``(..., joints, 3)`` positions."""
+
+    lengths = np.linalg.norm(positions[..., _SEGMENT_B, :] - positions[..., _SEGMENT_A, :], axis=-1)
+    segment_valid = valid[..., _SEGMENT_A] & valid[..., _SEGMENT_B]
+    angles = angles_between_vectors(
+        positions[..., _ANGLE_A, :] - positions[..., _ANGLE_B, :],
+        positions[..., _ANGLE_C, :] - positions[..., _ANGLE_B, :],
+    )
+    angle_valid = valid[..., _ANGLE_A] & valid[..., _ANGLE_B] & valid[..., _ANGLE_C]
+    return lengths, segment_valid, angles, angle_valid
+
+
+def _build_report(
+    positions: np.ndarray,
+    velocities: np.ndarray,
+    accelerations: np.ndarray,
+    valid: np.ndarray,
+    moving: np.ndarray,
+    lengths: np.ndarray,
+    segment_valid: np.ndarray,
+    angles: np.ndarray,
+    angle_valid: np.ndarray,
+    operation_log: str,
+) -> MotionReport:
+    segment_idx = np.flatnonzero(segment_valid)
+    angle_idx = np.flatnonzero(angle_valid)
+    joint_idx = np.flatnonzero(valid)
+    report = MotionReport(
+        angles_deg=dict(zip((ANGLE_NAMES[i] for i in angle_idx), angles[angle_idx].tolist())),
+        segment_lengths=dict(zip((SEGMENT_NAMES[i] for i in segment_idx), lengths[segment_idx].tolist())),
+        joint_metrics={
+            JOINT_NAMES[i]: JointMetrics(position=positions[i], velocity=velocities[i], acceleration=accelerations[i])
+            for i in joint_idx
+        },
+        positions=positions,
+        velocities=velocities,
+        accelerations=accelerations,
+        valid=valid,
+    )
+    if operation_log == "off":
         return report
+    moving_idx = np.flatnonzero(moving)
+    report.operation_counts = {
+        "segment": len(segment_idx),
+        "angle": len(angle_idx),
+        "velocity": len(moving_idx),
+    }
+    if operation_log == "full":
+        report.math_operations.extend(_SEGMENT_OPERATIONS[i] for i in segment_idx)
+        report.math_operations.extend(_ANGLE_OPERATIONS[i] for i in angle_idx)
+        report.math_operations.extend(_VELOCITY_OPERATIONS[i] for i in moving_idx)
+    return report
+
+
+@dataclass
+class TrajectoryMetrics:
+    """Motion metrics for a whole ``(frames, joints, 3)`` trajectory."""
+
+    positions: np.ndarray
+    valid: np.ndarray
+    velocities: np.ndarray
+    accelerations: np.ndarray
+    moving: np.ndarray
+    segment_lengths: np.ndarray
+    segment_valid: np.ndarray
+    angles_deg: np.ndarray
+    angle_valid: np.ndarray
+    operation_log: str = "full"
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def report(self, frame: int) -> MotionReport:
+        """Per-frame ``MotionReport`` equal to what ``MotionAnalyzer.analyze`` returns."""
+
+        return _build_report(
+            self.positions[frame],
+            self.velocities[frame],
+            self.accelerations[frame],
+            self.valid[frame],
+            self.moving[frame],
+            self.segment_lengths[frame],
+            self.segment_valid[frame],
+            self.angles_deg[frame],
+            self.angle_valid[frame],
+            self.operation_log,
+        )
+
+
+def trajectory_metrics(
+    positions: np.ndarray,
+    velocities: np.ndarray,
+    accelerations: np.ndarray,
+    valid: np.ndarray,
+    moving: np.ndarray,
+    operation_log: str = "full",
+) -> TrajectoryMetrics:
+    """``TrajectoryMetrics`` for given kinematics, adding segment lengths and angles."""
+
+    lengths, segment_valid, angles, angle_valid = _segments_and_angles(positions, valid)
+    return TrajectoryMetrics(
+        positions=positions,
+        valid=valid,
+        velocities=velocities,
+        accelerations=accelerations,
+        moving=moving,
+        segment_lengths=lengths,
+        segment_valid=segment_valid,
+        angles_deg=angles,
+        angle_valid=angle_valid,
+        operation_log=operation_log,
+    )
+
+
+class MotionAnalyzer:
+    """Compute motion vectors, angles, lengths, velocity, and acceleration.
+
+    All segments, angles, and joints are computed together with array
+    operations over a joint-indexed ``(joints, 3)`` array. ``operation_log``
+    is one of ``OPERATION_LOG_MODES``.
+    """
+
+    def __init__(self, operation_log: str = "full") -> None:
+        if operation_log not in OPERATION_LOG_MODES:
+            raise ValueError(f"Unsupported operation log mode: {operation_log}")
+        self.operation_log = operation_log
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget previous positions and velocities."""
+
+        joints = len(JOINT_NAMES)
+        self._previous_positions = np.zeros((joints, 3), dtype=float)
+        self._previous_velocities = np.zeros((joints, 3), dtype=float)
+        self._has_previous = np.zeros(joints, dtype=bool)
+
+    def analyze(
+        self,
+        points_3d: Mapping[str, np.ndarray] | np.ndarray,
+        delta_t: float,
+        valid: Optional[np.ndarray] = None,
+    ) -> MotionReport:
+        """Analyze one frame.
+
+        ``points_3d`` is either a ``{joint: point}`` mapping or a ``(joints, 3)``
+        array in ``JOINT_NAMES`` order with an optional ``valid`` mask.
+        """
+
+        if isinstance(points_3d, np.ndarray):
+            positions = np.asarray(points_3d, dtype=float)
+            if valid is None:
+                valid = np.ones(len(JOINT_NAMES), dtype=bool)
+        else:
+            positions, valid = points_to_array(points_3d)
+
+        # Velocity v = (p_t - p_(t-1)) / Δt and acceleration a = (v_t - v_(t-1)) / Δt
+        moving = valid & self._has_previous if delta_t > 0 else np.zeros_like(valid)
+        velocities = np.zeros_like(positions)
+        accelerations = np.zeros_like(positions)
+        if moving.any():
+            velocities[moving] = (positions[moving] - self._previous_positions[moving]) / delta_t
+            accelerations[moving] = (velocities[moving] - self._previous_velocities[moving]) / delta_t
+        self._previous_positions[valid] = positions[valid]
+        self._previous_velocities[valid] = velocities[valid]
+        self._has_previous |= valid
+
+        return _build_report(
+            positions,
+            velocities,
+            accelerations,
+            valid,
+            moving,
+            *_segments_and_angles(positions, valid),
+            self.operation_log,
+        )
+
+    def analyze_trajectory(
+        self,
+        positions: np.ndarray,
+        delta_t: np.ndarray | float,
+        valid: Optional[np.ndarray] = None,
+    ) -> TrajectoryMetrics:
+        """Analyze a whole ``(frames, joints, 3)`` trajectory in one batch.
+
+        ``delta_t`` is a scalar or a per-frame array of time since the previous
+        frame. Results match calling ``analyze`` frame by frame on a fresh
+        analyzer; the analyzer's own streaming state is not touched.
+        """
+
+        positions = np.asarray(positions, dtype=float)
+        frames, joints = positions.shape[:2]
+        if valid is None:
+            valid = np.ones((frames, joints), dtype=bool)
+        delta_t = np.broadcast_to(np.asarray(delta_t, dtype=float), (frames,))
+
+        # Index of the latest earlier frame where each joint was valid (-1 if none).
+        seen = np.where(valid, np.arange(frames)[:, None], -1)
+        latest = np.maximum.accumulate(seen, axis=0)
+        previous = np.vstack([np.full((1, joints), -1), latest[:-1]])
+        moving = valid & (previous >= 0) & (delta_t[:, None] > 0)
+
+        joint_idx = np.arange(joints)
+        prev_frame = np.maximum(previous, 0)
+        safe_dt = np.where(delta_t > 0, delta_t, 1.0)[:, None, None]
+        velocities = np.where(
+            moving[..., None], (positions - positions[prev_frame, joint_idx]) / safe_dt, 0.0
+        )
+        accelerations = np.where(
+            moving[..., None], (velocities - velocities[prev_frame, joint_idx]) / safe_dt, 0.0
+        )
+        return trajectory_metrics(positions, velocities, accelerations, valid, moving, self.operation_log)
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from motion_analysis import ANGLE_NAMES, SEGMENT_NAMES, MotionReport
+from pose_detector import JOINT_NAMES, KEYPOINT_SOURCES
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("npz", "npy", "parquet", "arrow")
+
+_FLOAT_COLUMNS = ("positions", "velocities", "accelerations")
+
+_ARROW_FORMATS = ("parquet", "arrow")
+
+
+def _import_pyarrow(export_format: str) -> Tuple[Any, Any, Any]:
+    try:
+        import pyarrow as pa
+        import pyarrow.feather as feather
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise RuntimeError(f"pyarrow is required for {export_format} export (pip install pyarrow)") from exc
+    return pa, feather, pq
+
+
+class ColumnarMotionWriter:
+    """Collect motion data per frame into column arrays and export them.
+
+    Columns (F frames, J joints, A angles, S segments):
+    ``timestamp_s`` (F,), ``positions``/``velocities``/``accelerations``
+    (F, J, 3) float32, ``valid`` (F, J), ``angles_deg`` (F, A) and
+    ``segment_lengths`` (F, S) float32 with NaN where not computed, and
+    ``keypoint_source`` (F,) uint8 indices into ``KEYPOINT_SOURCES``.
+
+    Formats: ``npz`` (compressed archive), ``npy`` (one ``.npy`` per column,
+    memory-mappable with ``load_motion_data``), ``parquet`` and ``arrow``
+    (flat per-joint columns, need ``pyarrow``; Arrow IPC files can be
+    memory-mapped). A missing ``pyarrow`` is reported on construction,
+    before any frames are processed.
+    """
+
+    def __init__(self, output_dir: Path, formats: Sequence[str] = ("npz",), initial_capacity: int = 1024) -> None:
+        unknown = set(formats) - set(EXPORT_FORMATS)
+        if unknown:
+            raise ValueError(f"Unsupported export formats: {', '.join(sorted(unknown))}")
+        self.output_dir = output_dir
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.formats = tuple(formats)
+        for export_format in self.formats:
+            if export_format in _ARROW_FORMATS:
+                _import_pyarrow(export_format)
+        self._size = 0
+        self._columns = self._allocate(max(1, initial_capacity))
+
+    @staticmethod
+    def _allocate(capacity: int) -> Dict[str, np.ndarray]:
+        joints = len(JOINT_NAMES)
+        columns: Dict[str, np.ndarray] = {
+            "timestamp_s": np.zeros(capacity, dtype=np.float64),
+            "keypoint_source": np.zeros(capacity, dtype=np.uint8),
+            "valid": np.zeros((capacity, joints), dtype=bool),
+            "angles_deg": np.full((capacity, len(ANGLE_NAMES)), np.nan, dtype=np.float32),
+            "segment_lengths": np.full((capacity, len(SEGMENT_NAMES)), np.nan, dtype=np.float32),
+        }
+        for name in _FLOAT_COLUMNS:
+            columns[name] = np.zeros((capacity, joints, 3), dtype=np.float32)
+        return columns
+
+    def _grow(self) -> None:
+        grown = self._allocate(2 * len(self._columns["timestamp_s"]))
+        for name, column in self._columns.items():
+            grown[name][: self._size] = column[: self._size]
+        self._columns = grown
+
+    def write_frame(self, report: MotionReport, timestamp_s: float) -> None:
+        if self._size == len(self._columns["timestamp_s"]):
+            self._grow()
+        row = self._size
+        columns = self._columns
+        columns["timestamp_s"][row] = timestamp_s
+        columns["keypoint_source"][row] = KEYPOINT_SOURCES.index(report.keypoint_source)
+        if report.positions is not None:
+            columns["positions"][row] = report.positions
+            columns["velocities"][row] = report.velocities
+            columns["accelerations"][row] = report.accelerations
+            columns["valid"][row] = report.valid
+        columns["angles_deg"][row] = [report.angles_deg.get(name, np.nan) for name in ANGLE_NAMES]
+        columns["segment_lengths"][row] = [report.segment_lengths.get(name, np.nan) for name in SEGMENT_NAMES]
+        self._size += 1
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """Collected columns trimmed to the frames written so far."""
+
+        return {name: column[: self._size] for name, column in self._columns.items()}
+
+    def close(self) -> List[Path]:
+        """Write every requested format and return the created paths."""
+
+        columns = self.columns()
+        names = {
+            "joint_names": np.array(JOINT_NAMES),
+            "angle_names": np.array(ANGLE_NAMES),
+            "segment_names": np.array(SEGMENT_NAMES),
+            "keypoint_sources": np.array(KEYPOINT_SOURCES),
+        }
+        paths: List[Path] = []
+        for export_format in self.formats:
+            if export_format == "npz":
+                path = self.output_dir / "motion_data.npz"
+                np.savez_compressed(path, **columns, **names)
+            elif export_format == "npy":
+                path = self.output_dir / "motion_data"
+                path.mkdir(exist_ok=True)
+                for name, column in {**columns, **names}.items():
+                    np.save(path / f"{name}.npy", np.ascontiguousarray(column))
+            else:
+                path = self._write_arrow_table(columns, export_format)
+            logger.info("Motion data exported to %s", path)
+            paths.append(path)
+        return paths
+
+    def _write_arrow_table(self, columns: Dict[str, np.ndarray], export_format: str) -> Path:
+        pa, feather, pq = _import_pyarrow(export_format)
+
+        flat: Dict[str, np.ndarray] = {
+            "frame": np.arange(len(columns["timestamp_s"])),
+            "timestamp_s": columns["timestamp_s"],
+            "keypoint_source": np.array(KEYPOINT_SOURCES)[columns["keypoint_source"]],
+        }
+        for joint_idx, joint in enumerate(JOINT_NAMES):
+            flat[f"{joint}.valid"] = columns["valid"][:, joint_idx]
+            for name in _FLOAT_COLUMNS:
+                for axis_idx, axis in enumerate("xyz"):
+                    flat[f"{joint}.{name}.{axis}"] = columns[name][:, joint_idx, axis_idx]
+        for angle_idx, angle in enumerate(ANGLE_NAMES):
+            flat[f"angle.{angle}"] = columns["angles_deg"][:, angle_idx]
+        for segment_idx, segment in enumerate(SEGMENT_NAMES):
+            flat[f"segment.{segment}"] = columns["segment_lengths"][:, segment_idx]
+
+        table = pa.table({name: pa.array(np.ascontiguousarray(values)) for name, values in flat.items()})
+        if export_format == "parquet":
+            path = self.output_dir / "motion_data.parquet"
+            pq.write_table(table, path, compression="zstd")
+        else:
+            # Uncompressed so the file can be memory-mapped with pyarrow.memory_map.
+            path = self.output_dir / "motion_data.arrow"
+            feather.write_feather(table, path, compression="uncompressed")
+        return path
+
+
+def load_motion_data(path: Path, mmap: bool = True) -> Dict[str, np.ndarray]:
+    """Load columns written by ``ColumnarMotionWriter`` (``.npz`` file or ``.npy`` directory).
+
+    A ``.npy`` directory is memory-mapped read-only when ``mmap`` is set.
+    """
+
+    path = Path(path)
+    if path.is_dir():
+        mode = "r" if mmap else None
+        return {item.stem: np.load(item, mmap_mode=mode) for item in sorted(path.glob("*.npy"))}
+    with np.load(path) as archive:
+        return {name: archive[name] for name in archive.files}
+
@@ -0,0 +1,304 @@
+from __future__ import annotations
+
+import logging
+import math
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from motion_analysis import ANGLE_NAMES, SEGMENT_NAMES, MotionReport
+from pose_detector import JOINT_INDEX, JOINT_NAMES
+
+logger = logging.getLogger(__name__)
+
+# Percentiles of joint speed reported in the summary.
+SPEED_PERCENTILES = (50, 90, 95, 99)
+
+
+@dataclass(frozen=True)
+class SummaryConfig:
+    """Settings for ``MotionSummary``.
+
+    A repetition of an angle (see ``motion_analysis.ANGLE_JOINTS``) is a
+    cycle from above ``extended_deg`` to below ``flexed_deg`` and back;
+    the gap between the thresholds keeps jitter from counting as reps.
+    Cycles shorter than ``min_rep_s`` are ignored. Speed percentiles come
+    from a log-spaced histogram accurate to ``speed_relative_error``.
+    """
+
+    flexed_deg: float = 100.0
+    extended_deg: float = 150.0
+    min_rep_s: float = 0.3
+    speed_relative_error: float = 0.01
+
+    def __post_init__(self) -> None:
+        if self.flexed_deg >= self.extended_deg:
+            raise ValueError("flexed_deg must be below extended_deg")
+        if not 0.0 < self.speed_relative_error < 1.0:
+            raise ValueError("speed_relative_error must be in (0, 1)")
+
+    def params(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class RunningStats:
+    """Count, mean, variance (Welford), min, and max per column, in constant memory."""
+
+    def __init__(self, columns: int) -> None:
+        self.count = np.zeros(columns, dtype=np.int64)
+        self.mean = np.zeros(columns, dtype=float)
+        self._m2 = np.zeros(columns, dtype=float)
+        self.minimum = np.full(columns, np.inf)
+        self.maximum = np.full(columns, -np.inf)
+
+    def update(self, values: np.ndarray, mask: np.ndarray) -> None:
+        """Add one sample per column where ``mask`` is set."""
+
+        idx = np.flatnonzero(mask)
+        if not idx.size:
+            return
+        x = values[idx]
+        self.count[idx] += 1
+        delta = x - self.mean[idx]
+        self.mean[idx] += delta / self.count[idx]
+        self._m2[idx] += delta * (x - self.mean[idx])
+        self.minimum[idx] = np.minimum(self.minimum[idx], x)
+        self.maximum[idx] = np.maximum(self.maximum[idx], x)
+
+    @property
+    def std(self) -> np.ndarray:
+        return np.sqrt(np.divide(self._m2, self.count, out=np.zeros_like(self._m2), where=self.count > 0))
+
+
+class LogHistogram:
+    """Streaming quantile sketch: per-column counts over log-spaced bins.
+
+    Values at or below ``min_value`` share the first bin (reported as 0);
+    any other quantile is within ``relative_error`` of the exact value up to
+    ``max_value``. Memory is fixed by the value range, not the sample count.
+    """
+
+    def __init__(
+        self,
+        columns: int,
+        relative_error: float = 0.01,
+        min_value: float = 1e-2,
+        max_value: float = 1e6,
+    ) -> None:
+        self._gamma = (1.0 + relative_error) / (1.0 - relative_error)
+        self._log_gamma = math.log(self._gamma)
+        self._min_value = min_value
+        bins = int(math.ceil(math.log(max_value / min_value) / self._log_gamma)) + 2
+        self.counts = np.zeros((columns, bins), dtype=np.int64)
+
+    def update(self, values: np.ndarray, mask: np.ndarray) -> None:
+        idx = np.flatnonzero(mask)
+        if not idx.size:
+            return
+        ratio = np.maximum(values[idx], self._min_value) / self._min_value
+        bins = np.ceil(np.log(ratio) / self._log_gamma).astype(np.int64)
+        np.add.at(self.counts, (idx, np.clip(bins, 0, self.counts.shape[1] - 1)), 1)
+
+    def quantiles(self, q: Sequence[float]) -> np.ndarray:
+        """``(columns, len(q))`` estimates of quantiles ``q`` (0-1); NaN for empty columns."""
+
+        totals = self.counts.sum(axis=1)
+        cumulative = np.cumsum(self.counts, axis=1)
+        result = np.full((len(self.counts), len(q)), np.nan)
+        for col, quantile in enumerate(q):
+            rank = np.ceil(quantile * totals).clip(min=1)
+            bins = (cumulative < rank[:, None]).sum(axis=1)
+            # Midpoint (in relative terms) of the bin's value range.
+            values = self._min_value * self._gamma**bins * 2.0 / (1.0 + self._gamma)
+            result[:, col] = np.where(bins == 0, 0.0, values)
+        result[totals == 0] = np.nan
+        return result
+
+
+class RepCounter:
+    """Count flex-extend cycles of every angle with a hysteresis state machine."""
+
+    def __init__(self, names: Sequence[str], config: SummaryConfig) -> None:
+        self.names = list(names)
+        self.config = config
+        self.counts = np.zeros(len(names), dtype=np.int64)
+        self.events: List[Dict[str, Any]] = []
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget partial cycles (counts and events are kept)."""
+
+        angles = len(self.names)
+        self._armed = np.zeros(angles, dtype=bool)
+        self._flexed = np.zeros(angles, dtype=bool)
+        self._start = np.zeros(angles, dtype=float)
+        self._bottom = np.zeros(angles, dtype=float)
+        self._bottom_deg = np.full(angles, np.inf)
+
+    def update(self, angles: np.ndarray, valid: np.ndarray, frame: int, timestamp_s: float) -> None:
+        config = self.config
+        extended = valid & (angles > config.extended_deg)
+        flexed = valid & (angles < config.flexed_deg)
+
+        done = extended & self._flexed
+        for idx in np.flatnonzero(done).tolist():
+            if timestamp_s - self._start[idx] < config.min_rep_s:
+                continue
+            self.counts[idx] += 1
+            self.events.append(
+                {
+                    "event": "rep",
+                    "angle": self.names[idx],
+                    "rep": int(self.counts[idx]),
+                    "frame": frame,
+                    "start_s": round(float(self._start[idx]), 6),
+                    "bottom_s": round(float(self._bottom[idx]), 6),
+                    "end_s": round(float(timestamp_s), 6),
+                    "min_deg": round(float(self._bottom_deg[idx]), 3),
+                }
+            )
+        self._flexed &= ~done
+        # Every extended frame restarts the clock, so a rep starts when the joint last left full extension.
+        self._start[extended] = timestamp_s
+        self._armed |= extended
+
+        descending = flexed & self._armed & ~self._flexed
+        self._flexed |= descending
+        self._bottom_deg[descending] = np.inf
+        lower = self._flexed & valid & (angles < self._bottom_deg)
+        self._bottom_deg[lower] = angles[lower]
+        self._bottom[lower] = timestamp_s
+
+
+class MotionSummary:
+    """Aggregate motion reports into a compact per-run summary in constant memory.
+
+    Per joint: speed min/max/mean/std, percentiles from ``LogHistogram``,
+    and the time of the peak. Per angle: range of motion and repetitions
+    (``RepCounter``). Per segment: length mean, spread, and coefficient of
+    variation, a measure of tracking stability. Only the rep event list
+    grows, by one entry per repetition.
+    """
+
+    def __init__(self, config: Optional[SummaryConfig] = None) -> None:
+        self.config = config or SummaryConfig()
+        joints = len(JOINT_NAMES)
+        self.frames = 0
+        self._segment = 0
+        self._first_time: Optional[float] = None
+        self._last_time: Optional[float] = None
+        self._speeds = RunningStats(joints)
+        self._speed_sketch = LogHistogram(joints, self.config.speed_relative_error)
+        self._peak_time = np.zeros(joints, dtype=float)
+        self._peak_frame = np.zeros(joints, dtype=np.int64)
+        self._angles = RunningStats(len(ANGLE_NAMES))
+        self._lengths = RunningStats(len(SEGMENT_NAMES))
+        self._reps = RepCounter(ANGLE_NAMES, self.config)
+
+    def update(self, report: MotionReport, timestamp_s: Optional[float] = None, segment: int = 0) -> None:
+        """Add one frame; a new ``segment`` (time range) restarts partial rep cycles."""
+
+        frame = self.frames
+        self.frames += 1
+        if timestamp_s is None:
+            timestamp_s = float(frame)
+        if self._first_time is None:
+            self._first_time = timestamp_s
+        self._last_time = timestamp_s
+        if segment != self._segment:
+            self._segment = segment
+            self._reps.reset()
+
+        if report.velocities is not None and report.valid is not None:
+            speeds = np.linalg.norm(report.velocities, axis=1)
+            valid = report.valid
+        else:
+            speeds = np.zeros(len(JOINT_NAMES))
+            valid = np.zeros(len(JOINT_NAMES), dtype=bool)
+            for joint, metrics in report.joint_metrics.items():
+                idx = JOINT_INDEX[joint]
+                speeds[idx] = float(np.linalg.norm(metrics.velocity))
+                valid[idx] = True
+        peak = valid & (speeds > self._speeds.maximum)
+        self._peak_time[peak] = timestamp_s
+        self._peak_frame[peak] = frame
+        self._speeds.update(speeds, valid)
+        self._speed_sketch.update(speeds, valid)
+
+        angles = np.array([report.angles_deg.get(name, np.nan) for name in ANGLE_NAMES])
+        angle_valid = ~np.isnan(angles)
+        self._angles.update(angles, angle_valid)
+        self._reps.update(angles, angle_valid, frame, timestamp_s)
+
+        lengths = np.array([report.segment_lengths.get(name, np.nan) for name in SEGMENT_NAMES])
+        self._lengths.update(lengths, ~np.isnan(lengths))
+
+    def to_dict(self) -> Dict[str, Any]:
+        speeds = self._speeds
+        percentiles = self._speed_sketch.quantiles([p / 100.0 for p in SPEED_PERCENTILES])
+        # Bin midpoints can fall just outside the observed range.
+        percentiles = np.clip(percentiles, speeds.minimum[:, None], speeds.maximum[:, None])
+        joints: Dict[str, Any] = {}
+        for idx, name in enumerate(JOINT_NAMES):
+            if not speeds.count[idx]:
+                continue
+            joints[name] = {
+                "frames": int(speeds.count[idx]),
+                "speed_min": _round(speeds.minimum[idx]),
+                "speed_max": _round(speeds.maximum[idx]),
+                "speed_mean": _round(speeds.mean[idx]),
+                "speed_std": _round(speeds.std[idx]),
+                **{f"speed_p{p}": _round(percentiles[idx, col]) for col, p in enumerate(SPEED_PERCENTILES)},
+                "peak_frame": int(self._peak_frame[idx]),
+                "peak_s": _round(self._peak_time[idx]),
+            }
+
+        angles = self._angles
+        angle_summary: Dict[str, Any] = {}
+        for idx, name in enumerate(ANGLE_NAMES):
+            if not angles.count[idx]:
+                continue
+            angle_summary[name] = {
+                "frames": int(angles.count[idx]),
+                "min_deg": _round(angles.minimum[idx]),
+                "max_deg": _round(angles.maximum[idx]),
+                "range_of_motion_deg": _round(angles.maximum[idx] - angles.minimum[idx]),
+                "mean_deg": _round(angles.mean[idx]),
+                "std_deg": _round(angles.std[idx]),
+                "reps": int(self._reps.counts[idx]),
+            }
+
+        lengths = self._lengths
+        segments: Dict[str, Any] = {}
+        for idx, name in enumerate(SEGMENT_NAMES):
+            if not lengths.count[idx]:
+                continue
+            mean = lengths.mean[idx]
+            segments[name] = {
+                "frames": int(lengths.count[idx]),
+                "length_mean": _round(mean),
+                "length_std": _round(lengths.std[idx]),
+                "length_min": _round(lengths.minimum[idx]),
+                "length_max": _round(lengths.maximum[idx]),
+                "length_cv": _round(lengths.std[idx] / mean) if mean > 0 else None,
+            }
+
+        duration = None
+        if self._first_time is not None and self._last_time is not None:
+            duration = _round(self._last_time - self._first_time)
+        return {
+            "frames": self.frames,
+            "duration_s": duration,
+            "settings": self.config.params(),
+            "joints": joints,
+            "angles": angle_summary,
+            "segments": segments,
+            "reps": {name: int(count) for name, count in zip(ANGLE_NAMES, self._reps.counts.tolist())},
+            "events": self._reps.events,
+        }
+
+
+def _round(value: float, digits: int = 4) -> Optional[float]:
+    value = float(value)
+    return round(value, digits) if math.isfinite(value) else None
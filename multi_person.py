@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from math_report import MathReportWriter
+from metrics import PipelineMetrics, create_sink, profiling
+from motion_analysis import MotionAnalyzer, MotionReport
+from motion_summary import SummaryConfig
+from pipeline import PipelineResult
+from pose_detector import DetectorConfig, MultiPoseDetector
+from skeleton_builder import SkeletonBuilder, SkeletonFrame
+from tracking import PersonTracker
+from video_encoder import EncoderConfig
+from video_loader import TimeRange, VideoLoader, merge_ranges
+from visualizer import RENDER_MODES, OverlayStyle, SkeletonTrackWriter, Visualizer
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TrackOutput:
+    """Smoothing, motion state, and report files of one tracked person."""
+
+    track_id: int
+    builder: SkeletonBuilder
+    analyzer: MotionAnalyzer
+    writer: MathReportWriter
+    track_writer: Optional[SkeletonTrackWriter] = None
+    prev_time: Optional[float] = None
+    summary: Dict[str, Any] = field(default_factory=dict)
+
+    def close(self) -> None:
+        self.writer.close()
+        if self.track_writer is not None:
+            self.track_writer.close()
+
+
+def run_multi_person(
+    input_path: Path,
+    output_dir: Path,
+    target_fps: float | None,
+    *,
+    ranges: Sequence[TimeRange] = (),
+    smoothing: str = "moving_average",
+    smoothing_window: int = 5,
+    report_format: str = "json",
+    report_mode: str = "frames",
+    summary_config: Optional[SummaryConfig] = None,
+    operation_log: str = "templates",
+    render_video: bool = True,
+    render_mode: str = "burn_in",
+    overlay_style: Optional[OverlayStyle] = None,
+    encoder_config: Optional[EncoderConfig] = None,
+    detector_config: Optional[DetectorConfig] = None,
+    detector: Optional[MultiPoseDetector] = None,
+    track_min_iou: float = 0.3,
+    track_max_missed: int = 15,
+    metrics_sinks: Sequence[str] = ("log",),
+    progress_interval_s: float = 10.0,
+    profile: Optional[str] = None,
+) -> PipelineResult:
+    """Detect several people per frame and analyze each one as its own track.
+
+    ``PersonTracker`` gives every person a persistent ID. Each track has
+    its own ``SkeletonBuilder`` and ``MotionAnalyzer`` and writes its
+    reports to ``tracks/track_<id>/``. A track unseen for more than
+    ``track_max_missed`` frames is closed and its state released, so memory
+    depends on the number of people in view, not on video length. The
+    overlay video shows every track with its own bone color and ID
+    (``render_mode="sidecar"`` writes a skeleton file per track instead).
+    ``tracks_summary.json`` lists each track's frame span. Other options
+    match ``main.run_pipeline``.
+    """
+
+    started = time.perf_counter()
+    detector_config = detector_config or DetectorConfig(max_people=2)
+    if render_mode not in RENDER_MODES:
+        raise ValueError(f"Unsupported render mode: {render_mode}")
+    ranges = merge_ranges(ranges)
+    run_metadata: Dict[str, Any] = {"detector": detector_config.params()}
+    if ranges:
+        run_metadata["ranges"] = [[item.start_s, item.end_s] for item in ranges]
+
+    loader = VideoLoader(str(input_path), target_fps=target_fps, reuse_buffers=True, ranges=ranges)
+    fps = loader.output_fps
+    width, height = loader.meta.width, loader.meta.height
+    owns_detector = detector is None
+    if detector is None:
+        detector = MultiPoseDetector(detector_config)
+    else:
+        detector.reset()
+    tracker = PersonTracker(min_iou=track_min_iou, max_missed=track_max_missed)
+    metrics = PipelineMetrics(
+        [create_sink(spec, output_dir) for spec in metrics_sinks],
+        video=Path(input_path).name,
+        expected_frames=loader.output_frame_count,
+        progress_interval_s=progress_interval_s,
+    )
+    metrics.add_collector(lambda: {"frames_decoded": loader.frames_decoded, "frames_dropped": loader.frames_dropped})
+
+    visualizer = None
+    if render_video and render_mode != "sidecar":
+        output_video_path = output_dir / ("skeleton_overlay.mp4" if render_mode == "burn_in" else "skeleton_track.mp4")
+        visualizer = Visualizer(
+            output_path=output_video_path,
+            fps=fps,
+            frame_size=(width, height),
+            style=overlay_style or OverlayStyle(),
+            mode=render_mode,
+            encoder=encoder_config,
+        )
+
+    tracks_dir = output_dir / "tracks"
+    outputs: Dict[int, TrackOutput] = {}
+    finished: List[Dict[str, Any]] = []
+
+    def open_track(track_id: int) -> TrackOutput:
+        track_dir = tracks_dir / f"track_{track_id:03d}"
+        track_dir.mkdir(parents=True, exist_ok=True)
+        writer = MathReportWriter(
+            track_dir,
+            json_format=report_format,
+            operation_log=operation_log,
+            metadata={**run_metadata, "track_id": track_id},
+            mode=report_mode,
+            summary_config=summary_config,
+        )
+        writer.open()
+        track_writer = None
+        if render_video and render_mode == "sidecar":
+            track_writer = SkeletonTrackWriter(track_dir / "skeleton_track.jsonl", fps, (width, height))
+        metrics.increment("tracks_started")
+        return TrackOutput(
+            track_id=track_id,
+            builder=SkeletonBuilder(smoothing=smoothing, smoothing_window=smoothing_window, fps=fps),
+            analyzer=MotionAnalyzer(operation_log=operation_log),
+            writer=writer,
+            track_writer=track_writer,
+            summary={"track_id": track_id, "directory": str(track_dir), "frames": 0},
+        )
+
+    def close_tracks(track_ids: Sequence[int]) -> None:
+        for track_id in track_ids:
+            output = outputs.pop(track_id, None)
+            if output is None:
+                continue
+            output.close()
+            finished.append(output.summary)
+            metrics.increment("tracks_closed")
+
+    segment = 0
+    try:
+        with profiling(profile, output_dir):
+            for frame in metrics.timed_iter("decode", loader.selected_frames()):
+                if frame.segment != segment:
+                    segment = frame.segment
+                    detector.reset()
+                    tracker.reset()
+                    close_tracks(tracker.evicted)
+
+                with metrics.timer("detect"):
+                    people = detector.detect_people(frame.rgb, width, height, frame.timestamp_s)
+                with metrics.timer("track"):
+                    assigned = tracker.update(people)
+                close_tracks(tracker.evicted)
+                metrics.increment("people_detected", len(assigned))
+
+                drawn: List[Tuple[int, SkeletonFrame, MotionReport]] = []
+                for track_id, keypoints in assigned:
+                    output = outputs.get(track_id)
+                    if output is None:
+                        output = outputs[track_id] = open_track(track_id)
+                    with metrics.timer("build"):
+                        skeleton = output.builder.build(keypoints, frame.timestamp_s)
+                    if output.prev_time is None:
+                        delta_t = 1.0 / fps
+                    else:
+                        delta_t = frame.timestamp_s - output.prev_time
+                    output.prev_time = frame.timestamp_s
+                    with metrics.timer("analyze"):
+                        report = output.analyzer.analyze(skeleton.positions, delta_t, skeleton.valid)
+                    with metrics.timer("report"):
+                        output.writer.write_frame(report, frame.timestamp_s, frame.segment)
+                    if output.track_writer is not None:
+                        with metrics.timer("track_file"):
+                            output.track_writer.write_frame(
+                                frame.timestamp_s, skeleton.positions, skeleton.valid, report
+                            )
+                    summary = output.summary
+                    summary.setdefault("first_frame", frame.index)
+                    summary.setdefault("first_timestamp_s", frame.timestamp_s)
+                    summary["last_frame"] = frame.index
+                    summary["last_timestamp_s"] = frame.timestamp_s
+                    summary["frames"] += 1
+                    drawn.append((track_id, skeleton, report))
+
+                if visualizer is not None:
+                    background = frame.bgr if render_mode == "burn_in" else None
+                    with metrics.timer("draw"):
+                        image = visualizer.render_people(
+                            background,
+                            [(track_id, sk.positions, sk.valid, report) for track_id, sk, report in drawn],
+                        )
+                    with metrics.timer("encode"):
+                        visualizer.write(image)
+                metrics.frame_done()
+    finally:
+        close_tracks(list(outputs))
+        if visualizer is not None:
+            visualizer.close()
+        if owns_detector:
+            detector.close()
+        loader.release()
+
+    finished.sort(key=lambda item: item["track_id"])
+    summary_path = output_dir / "tracks_summary.json"
+    summary_path.write_text(json.dumps({"tracks": finished}, indent=2), encoding="utf-8")
+    logger.info("%d person tracks written to %s", len(finished), tracks_dir)
+    snapshot = metrics.close()
+    return PipelineResult(
+        output_dir=output_dir,
+        frames=metrics.frames,
+        elapsed_s=time.perf_counter() - started,
+        metrics=snapshot,
+    )
@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from motion_analysis import TrajectoryMetrics, trajectory_metrics
+from pose_detector import JOINT_NAMES
+from skeleton_builder import SkeletonFrame
+
+try:
+    from scipy.signal import lfilter
+except ImportError:  # optional; a per-frame loop is used instead
+    lfilter = None
+
+logger = logging.getLogger(__name__)
+
+# "savgol" fits a local polynomial (Savitzky-Golay), "forward_backward" runs
+# an exponential moving average forward and then backward over the result,
+# "none" keeps the raw positions. All are zero-phase: smoothing adds no lag.
+OFFLINE_SMOOTHERS = ("savgol", "forward_backward", "none")
+
+
+@dataclass(frozen=True)
+class OfflineConfig:
+    """Whole-trajectory smoothing settings for two-pass offline analysis.
+
+    ``window`` (odd, in frames) and ``polyorder`` apply to Savitzky-Golay,
+    ``alpha`` to the forward-backward exponential moving average.
+    """
+
+    method: str = "savgol"
+    window: int = 9
+    polyorder: int = 2
+    alpha: float = 0.5
+
+    def __post_init__(self) -> None:
+        if self.method not in OFFLINE_SMOOTHERS:
+            raise ValueError(f"Unknown offline smoother: {self.method}")
+        if self.window < 3 or self.window % 2 == 0:
+            raise ValueError("Savitzky-Golay window must be an odd number of at least 3 frames")
+        if not 0 <= self.polyorder < self.window:
+            raise ValueError("polyorder must be non-negative and smaller than the window")
+        if not 0.0 < self.alpha <= 1.0:
+            raise ValueError("alpha must be in (0, 1]")
+
+    def params(self) -> Dict[str, object]:
+        return {"method": self.method, "window": self.window, "polyorder": self.polyorder, "alpha": self.alpha}
+
+
+def savgol_matrix(window: int, polyorder: int) -> np.ndarray:
+    """``(window, window)`` matrix mapping a window of samples to its least-squares polynomial fit.
+
+    Row ``window // 2`` holds the usual Savitzky-Golay smoothing coefficients;
+    the other rows evaluate the same fit off-center and are used at the edges.
+    """
+
+    offsets = np.arange(window) - window // 2
+    vander = np.vander(offsets, polyorder + 1, increasing=True).astype(float)
+    return vander @ np.linalg.pinv(vander)
+
+
+def savgol_smooth(values: np.ndarray, window: int, polyorder: int) -> np.ndarray:
+    """Savitzky-Golay filter along axis 0 of ``values``.
+
+    The window shrinks to fit short trajectories; the first and last
+    ``window // 2`` samples come from the polynomial fitted to the first and
+    last full window instead of padding.
+    """
+
+    frames = len(values)
+    window = min(window, frames if frames % 2 else frames - 1)
+    if window < 3:
+        return values.copy()
+    polyorder = min(polyorder, window - 1)
+    fit = savgol_matrix(window, polyorder)
+    half = window // 2
+    windows = np.lib.stride_tricks.sliding_window_view(values, window, axis=0)
+    smoothed = np.empty_like(values)
+    smoothed[half : frames - half] = windows @ fit[half]
+    smoothed[:half] = np.tensordot(fit[:half], values[:window], axes=1)
+    smoothed[frames - half :] = np.tensordot(fit[half + 1 :], values[frames - window :], axes=1)
+    return smoothed
+
+
+def forward_backward_smooth(values: np.ndarray, alpha: float) -> np.ndarray:
+    """Exponential moving average along axis 0, run forward and then backward.
+
+    Each pass starts from the first sample it sees. With ``scipy`` both
+    passes run as one vectorized IIR filter (``lfilter``) over all joints;
+    otherwise as a per-frame loop with the same result.
+    """
+
+    smoothed = values.astype(float)
+    if not len(smoothed):
+        return smoothed
+    if lfilter is not None:
+        # y[n] = alpha * x[n] + (1 - alpha) * y[n - 1], with y[0] = x[0] via the initial state.
+        b, a = [alpha], [1.0, alpha - 1.0]
+        smoothed, _ = lfilter(b, a, smoothed, axis=0, zi=(1.0 - alpha) * smoothed[:1])
+        backward, _ = lfilter(b, a, smoothed[::-1], axis=0, zi=(1.0 - alpha) * smoothed[-1:])
+        return backward[::-1].copy()
+    for frame in range(1, len(values)):
+        smoothed[frame] = alpha * smoothed[frame] + (1.0 - alpha) * smoothed[frame - 1]
+    for frame in range(len(values) - 2, -1, -1):
+        smoothed[frame] = alpha * smoothed[frame] + (1.0 - alpha) * smoothed[frame + 1]
+    return smoothed
+
+
+def fill_invalid(positions: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    """Linearly interpolate each joint over frames where it is invalid (held at the ends).
+
+    Only used so the smoother and the derivatives see a continuous signal;
+    joints that are never valid stay at zero.
+    """
+
+    filled = positions.copy()
+    frames = np.arange(len(positions))
+    for joint in np.flatnonzero(valid.any(axis=0) & ~valid.all(axis=0)):
+        known = valid[:, joint]
+        for axis in range(positions.shape[2]):
+            filled[:, joint, axis] = np.interp(frames, frames[known], positions[known, joint, axis])
+    return filled
+
+
+def smooth_trajectory(positions: np.ndarray, valid: np.ndarray, config: OfflineConfig) -> np.ndarray:
+    """Zero-phase smoothing of a ``(frames, joints, 3)`` trajectory with gaps filled."""
+
+    filled = fill_invalid(positions, valid)
+    if config.method == "savgol":
+        return savgol_smooth(filled, config.window, config.polyorder)
+    if config.method == "forward_backward":
+        return forward_backward_smooth(filled, config.alpha)
+    return filled
+
+
+def central_differences(positions: np.ndarray, timestamps: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Velocity and acceleration along axis 0 from central differences over real timestamps.
+
+    ``np.gradient`` uses second-order central differences for uneven spacing
+    and one-sided differences at the ends. A single frame has no motion.
+    """
+
+    if len(positions) < 2:
+        return np.zeros_like(positions), np.zeros_like(positions)
+    velocities = np.gradient(positions, timestamps, axis=0)
+    accelerations = np.gradient(velocities, timestamps, axis=0)
+    return velocities, accelerations
+
+
+def analyze_offline(
+    positions: np.ndarray,
+    valid: np.ndarray,
+    timestamps: np.ndarray,
+    segments: np.ndarray,
+    config: OfflineConfig,
+    operation_log: str = "templates",
+) -> TrajectoryMetrics:
+    """Smooth a whole trajectory and compute its motion metrics without causal lag.
+
+    Each segment (time range) is smoothed and differentiated separately.
+    Positions, velocities, and accelerations of invalid joints are zeroed
+    as in the streaming analysis; a joint has motion whenever it is valid in
+    a segment of at least two frames.
+    """
+
+    positions = np.asarray(positions, dtype=float)
+    smoothed = np.zeros_like(positions)
+    velocities = np.zeros_like(positions)
+    accelerations = np.zeros_like(positions)
+    moving = np.zeros_like(valid)
+    bounds = np.flatnonzero(np.diff(segments)) + 1
+    for start, end in zip(np.r_[0, bounds], np.r_[bounds, len(positions)]):
+        part = slice(start, end)
+        smoothed[part] = smooth_trajectory(positions[part], valid[part], config)
+        velocities[part], accelerations[part] = central_differences(smoothed[part], timestamps[part])
+        moving[part] = valid[part] & (end - start > 1)
+    smoothed[~valid] = 0.0
+    velocities[~moving] = 0.0
+    accelerations[~moving] = 0.0
+    return trajectory_metrics(smoothed, velocities, accelerations, valid, moving, operation_log)
+
+
+class TrajectoryRecorder:
+    """Collect unsmoothed skeletons of a whole run for ``analyze_offline``."""
+
+    def __init__(self) -> None:
+        self.indices: List[int] = []
+        self.sources: List[str] = []
+        self._timestamps: List[float] = []
+        self._segments: List[int] = []
+        self._positions: List[np.ndarray] = []
+        self._valid: List[np.ndarray] = []
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def add(self, index: int, timestamp_s: float, segment: int, skeleton: SkeletonFrame) -> None:
+        self.indices.append(index)
+        self.sources.append(skeleton.keypoints.source)
+        self._timestamps.append(timestamp_s)
+        self._segments.append(segment)
+        self._positions.append(skeleton.positions)
+        self._valid.append(skeleton.valid)
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return np.asarray(self._timestamps, dtype=float)
+
+    @property
+    def segments(self) -> np.ndarray:
+        return np.asarray(self._segments, dtype=int)
+
+    def analyze(self, config: OfflineConfig, operation_log: str = "templates") -> TrajectoryMetrics:
+        joints = len(JOINT_NAMES)
+        positions = np.asarray(self._positions, dtype=float).reshape(-1, joints, 3)
+        valid = np.asarray(self._valid, dtype=bool).reshape(-1, joints)
+        return analyze_offline(positions, valid, self.timestamps, self.segments, config, operation_log)
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Generator, Iterable, Iterator, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+Stage = Callable[[Iterable[Any]], Iterable[Any]]
+
+_END = object()
+
+
+@dataclass(frozen=True)
+class PipelineResult:
+    """Outcome of ``main.run_pipeline`` (or ``multi_person.run_multi_person``) for one video."""
+
+    output_dir: Path
+    frames: int
+    elapsed_s: float
+    metrics: Dict[str, Any] = field(default_factory=dict)
+
+
+def run_sequential(source: Iterable[Any], stages: Sequence[Stage]) -> Generator[Any, None, None]:
+    """Chain stages on the calling thread."""
+
+    stream: Iterable[Any] = source
+    for stage in stages:
+        stream = stage(stream)
+    yield from stream
+
+
+class StagedPipeline:
+    """Run a source and a chain of stages on separate threads.
+
+    Each stage is a callable that consumes an iterable and yields results, so
+    stateful stages (delta time tracking, buffering) keep working unchanged.
+    Stages are connected with bounded FIFO queues and every stage runs on a
+    single thread, which keeps items in source order. The first error raised
+    by any stage stops the whole pipeline and is re-raised from ``run``.
+    """
+
+    def __init__(
+        self,
+        source: Iterable[Any],
+        stages: Sequence[Stage],
+        queue_depths: int | Sequence[int] = 4,
+        poll_interval_s: float = 0.1,
+    ) -> None:
+        if not stages:
+            raise ValueError("StagedPipeline needs at least one stage")
+        if isinstance(queue_depths, int):
+            queue_depths = [queue_depths] * len(stages)
+        if len(queue_depths) != len(stages):
+            raise ValueError("queue_depths must have one entry per stage")
+        self._source = source
+        self._stages = list(stages)
+        self._queues: List[queue.Queue] = [queue.Queue(maxsize=max(1, depth)) for depth in queue_depths]
+        self._output: queue.Queue = queue.Queue(maxsize=max(1, queue_depths[-1]))
+        self._poll_interval_s = poll_interval_s
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._error_lock = threading.Lock()
+
+    def run(self) -> Generator[Any, None, None]:
+        """Start worker threads and yield outputs of the last stage in order.
+
+        Close the returned generator (``contextlib.closing``) when stopping
+        early: only that stops and joins the worker threads.
+        """
+
+        threads = [threading.Thread(target=self._feed, name="pipeline-source", daemon=True)]
+        for idx, stage in enumerate(self._stages):
+            out_queue = self._queues[idx + 1] if idx + 1 < len(self._stages) else self._output
+            threads.append(
+                threading.Thread(
+                    target=self._work,
+                    args=(stage, self._queues[idx], out_queue),
+                    name=f"pipeline-stage-{idx}",
+                    daemon=True,
+                )
+            )
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                item = self._get(self._output)
+                if item is _END:
+                    break
+                yield item
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+
+        if self._error is not None:
+            raise self._error
+
+    def _feed(self) -> None:
+        try:
+            for item in self._source:
+                if not self._put(self._queues[0], item):
+                    return
+        except BaseException as exc:  # noqa: BLE001 - propagated to the consumer
+            self._fail(exc)
+        finally:
+            self._put(self._queues[0], _END)
+
+    def _work(self, stage: Stage, in_queue: queue.Queue, out_queue: queue.Queue) -> None:
+        try:
+            for result in stage(self._drain(in_queue)):
+                if not self._put(out_queue, result):
+                    return
+        except BaseException as exc:  # noqa: BLE001 - propagated to the consumer
+            self._fail(exc)
+        finally:
+            self._put(out_queue, _END)
+
+    def _drain(self, in_queue: queue.Queue) -> Iterator[Any]:
+        while True:
+            item = self._get(in_queue)
+            if item is _END:
+                return
+            yield item
+
+    def _get(self, in_queue: queue.Queue) -> Any:
+        while not self._stop.is_set():
+            try:
+                return in_queue.get(timeout=self._poll_interval_s)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _put(self, out_queue: queue.Queue, item: Any) -> bool:
+        while not self._stop.is_set():
+            try:
+                out_queue.put(item, timeout=self._poll_interval_s)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _fail(self, exc: BaseException) -> None:
+        with self._error_lock:
+            if self._error is None:
+                self._error = exc
+                logger.error("Pipeline stage failed: %s", exc)
+        self._stop.set()
@@ -2,9 +2,10 @@ from __future__ import annotations
 
 import importlib
 import logging
-from dataclasses import dataclass
-from typing import Dict
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Mapping, Optional, Tuple
 
+import cv2
 import numpy as np
 import mediapipe as mp
 
@@ -41,6 +42,11 @@ POSE_LANDMARKS = {
 }
 
 
+JOINT_NAMES: Tuple[str, ...] = tuple(POSE_LANDMARKS)
+JOINT_INDEX: Dict[str, int] = {name: idx for idx, name in enumerate(JOINT_NAMES)}
+_LANDMARK_IDS = np.array([int(landmark_id) for landmark_id in POSE_LANDMARKS.values()])
+
+
 @dataclass(frozen=True)
 class Keypoint:
     name: str
@@ -50,37 +56,315 @@ class Keypoint:
     visibility: float
 
 
+# Where a frame's keypoints came from; recorded in reports and exports.
+# "interpolated" frames lie between keyframes (see ``keyframes``), "gap_filled"
+# frames have joints filled in over missed detections (see ``gap_filling``).
+KEYPOINT_SOURCES: Tuple[str, ...] = ("detected", "interpolated", "gap_filled")
+
+
+@dataclass
+class KeypointArray:
+    """Keypoints of one frame in ``JOINT_NAMES`` order.
+
+    ``data`` is a ``(joints, 4)`` float32 array of x, y, z, visibility and
+    ``valid`` marks the joints that were detected. ``source`` is one of
+    ``KEYPOINT_SOURCES``.
+    """
+
+    data: np.ndarray
+    valid: np.ndarray
+    source: str = "detected"
+
+    @classmethod
+    def empty(cls) -> "KeypointArray":
+        return cls(
+            data=np.zeros((len(JOINT_NAMES), 4), dtype=np.float32),
+            valid=np.zeros(len(JOINT_NAMES), dtype=bool),
+        )
+
+    @classmethod
+    def from_dict(cls, keypoints: Mapping[str, Keypoint]) -> "KeypointArray":
+        array = cls.empty()
+        for name, kp in keypoints.items():
+            idx = JOINT_INDEX[name]
+            array.data[idx] = (kp.x, kp.y, kp.z, kp.visibility)
+            array.valid[idx] = True
+        return array
+
+    @property
+    def xyz(self) -> np.ndarray:
+        return self.data[:, :3]
+
+    @property
+    def visibility(self) -> np.ndarray:
+        return self.data[:, 3]
+
+    @property
+    def detected(self) -> bool:
+        return bool(self.valid.any())
+
+    def to_dict(self) -> Dict[str, Keypoint]:
+        """Dict view for code written against ``Dict[str, Keypoint]``."""
+
+        return {
+            JOINT_NAMES[idx]: Keypoint(JOINT_NAMES[idx], *(float(value) for value in self.data[idx]))
+            for idx in np.flatnonzero(self.valid)
+        }
+
+
+def as_keypoint_array(keypoints: KeypointArray | Mapping[str, Keypoint]) -> KeypointArray:
+    if isinstance(keypoints, KeypointArray):
+        return keypoints
+    return KeypointArray.from_dict(keypoints)
+
+
+def points_to_array(points: Mapping[str, np.ndarray], dims: int = 3) -> Tuple[np.ndarray, np.ndarray]:
+    """Convert a ``{joint: point}`` mapping to a ``(joints, dims)`` array and validity mask."""
+
+    array = np.zeros((len(JOINT_NAMES), dims), dtype=float)
+    valid = np.zeros(len(JOINT_NAMES), dtype=bool)
+    for name, point in points.items():
+        idx = JOINT_INDEX[name]
+        array[idx] = point[:dims]
+        valid[idx] = True
+    return array, valid
+
+
+# MediaPipe Pose model complexity per speed/accuracy profile.
+DETECTOR_PROFILES: Dict[str, int] = {"lite": 0, "full": 1, "heavy": 2}
+
+
+@dataclass(frozen=True)
+class DetectorConfig:
+    """Detector settings; ``params()`` is recorded in reports and cache keys.
+
+    ``inference_scale`` < 1 downsizes the (cropped) frame before inference.
+    With ``roi_tracking`` the next frame is cropped to the previous skeleton's
+    bounding box grown by ``roi_margin``; full-frame detection is used when
+    no pose is found in the crop. ``max_people > 1`` selects
+    ``MultiPoseDetector``, which needs a MediaPipe ``PoseLandmarker`` model
+    file (``landmarker_model``, a ``.task`` bundle).
+    """
+
+    profile: str = "heavy"
+    inference_scale: float = 1.0
+    roi_tracking: bool = False
+    roi_margin: float = 0.25
+    min_detection_confidence: float = 0.5
+    min_tracking_confidence: float = 0.5
+    max_people: int = 1
+    landmarker_model: Optional[str] = None
+
+    def __post_init__(self) -> None:
+        if self.profile not in DETECTOR_PROFILES:
+            raise ValueError(f"Unknown detector profile: {self.profile}")
+        if not 0 < self.inference_scale <= 1:
+            raise ValueError("inference_scale must be in (0, 1]")
+        if self.max_people < 1:
+            raise ValueError("max_people must be at least 1")
+
+    @property
+    def model_complexity(self) -> int:
+        return DETECTOR_PROFILES[self.profile]
+
+    def params(self) -> Dict[str, object]:
+        return {**asdict(self), "model_complexity": self.model_complexity}
+
+
 class PoseDetector:
-    """MediaPipe Pose wrapper for extracting keypoints."""
+    """MediaPipe Pose wrapper for extracting keypoints.
+
+    Full frames go through a tracking (``static_image_mode=False``) graph,
+    which reuses the previous frame's landmarks. ROI crops move every
+    frame, so landmarks normalized to one crop would be wrong in the next;
+    crops therefore go through a separate static-mode graph, and the
+    tracking graph starts over when detection falls back to the full frame.
+    """
 
-    def __init__(self) -> None:
-        self._pose = mp_solutions.pose.Pose(
-            static_image_mode=False,
-            model_complexity=2,
+    _MIN_ROI_SIZE = 64
+
+    def __init__(self, config: Optional[DetectorConfig] = None) -> None:
+        self.config = config or DetectorConfig()
+        self.params = self.config.params()
+        self._pose = self._create_pose(static_image_mode=False)
+        self._roi_pose = self._create_pose(static_image_mode=True) if self.config.roi_tracking else None
+        self._roi: Optional[Tuple[int, int, int, int]] = None
+        self._tracking_stale = False
+
+    def _create_pose(self, static_image_mode: bool) -> Any:
+        return mp_solutions.pose.Pose(
+            static_image_mode=static_image_mode,
+            model_complexity=self.config.model_complexity,
             enable_segmentation=False,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5,
+            min_detection_confidence=self.config.min_detection_confidence,
+            min_tracking_confidence=self.config.min_tracking_confidence,
         )
 
     def detect(self, rgb_frame: np.ndarray, frame_width: int, frame_height: int) -> Dict[str, Keypoint]:
         """Detect pose keypoints for a single RGB frame."""
 
-        results = self._pose.process(rgb_frame)
-        if not results.pose_landmarks:
+        return self.detect_array(rgb_frame, frame_width, frame_height).to_dict()
+
+    def detect_array(self, rgb_frame: np.ndarray, frame_width: int, frame_height: int) -> KeypointArray:
+        """Detect pose keypoints for a single RGB frame as a ``KeypointArray``."""
+
+        full_frame = (0, 0, frame_width, frame_height)
+        box = self._roi or full_frame
+        landmarks = self._process(rgb_frame, box)
+        if landmarks is None and box != full_frame:
+            logger.debug("Pose lost inside ROI, falling back to full frame")
+            box = full_frame
+            landmarks = self._process(rgb_frame, box)
+        if landmarks is None:
             logger.debug("No pose landmarks detected")
-            return {}
-
-        keypoints: Dict[str, Keypoint] = {}
-        for name, landmark_id in POSE_LANDMARKS.items():
-            landmark = results.pose_landmarks.landmark[landmark_id]
-            keypoints[name] = Keypoint(
-                name=name,
-                x=landmark.x * frame_width,
-                y=landmark.y * frame_height,
-                z=landmark.z * frame_width,
-                visibility=landmark.visibility,
+            self._roi = None
+            return KeypointArray.empty()
+
+        x0, y0, x1, y1 = box
+        box_width, box_height = x1 - x0, y1 - y0
+        # Landmarks are normalized to the processed box; map back to frame pixels.
+        points = landmarks[:, :3] * (box_width, box_height, box_width) + (x0, y0, 0.0)
+        if self.config.roi_tracking:
+            self._roi = self._next_roi(points, frame_width, frame_height)
+
+        data = np.empty((len(JOINT_NAMES), 4), dtype=np.float32)
+        data[:, :3] = points[_LANDMARK_IDS, :]
+        data[:, 3] = landmarks[_LANDMARK_IDS, 3]
+        return KeypointArray(data=data, valid=np.ones(len(JOINT_NAMES), dtype=bool))
+
+    def _process(self, rgb_frame: np.ndarray, box: Tuple[int, int, int, int]) -> Optional[np.ndarray]:
+        """Run MediaPipe on ``box`` of the frame; return ``(33, 4)`` normalized landmarks or None."""
+
+        x0, y0, x1, y1 = box
+        image = rgb_frame
+        pose = self._pose
+        if (x0, y0, x1, y1) != (0, 0, rgb_frame.shape[1], rgb_frame.shape[0]):
+            image = np.ascontiguousarray(rgb_frame[y0:y1, x0:x1])
+            pose = self._roi_pose
+            self._tracking_stale = True
+        elif self._tracking_stale:
+            # The tracking graph last saw a full frame before the crops; drop its outdated landmarks.
+            self._pose.reset()
+            self._tracking_stale = False
+        if self.config.inference_scale < 1:
+            image = cv2.resize(
+                image,
+                None,
+                fx=self.config.inference_scale,
+                fy=self.config.inference_scale,
+                interpolation=cv2.INTER_AREA,
             )
-        return keypoints
+        results = pose.process(image)
+        if not results.pose_landmarks:
+            return None
+        return np.array(
+            [(lm.x, lm.y, lm.z, lm.visibility) for lm in results.pose_landmarks.landmark],
+            dtype=np.float64,
+        )
+
+    def _next_roi(self, points: np.ndarray, frame_width: int, frame_height: int) -> Optional[Tuple[int, int, int, int]]:
+        """Bounding box of all landmarks grown by ``roi_margin`` and clipped to the frame."""
+
+        (min_x, min_y), (max_x, max_y) = points[:, :2].min(axis=0), points[:, :2].max(axis=0)
+        margin_x = max((max_x - min_x) * self.config.roi_margin, self._MIN_ROI_SIZE / 2)
+        margin_y = max((max_y - min_y) * self.config.roi_margin, self._MIN_ROI_SIZE / 2)
+        x0 = int(max(0, min_x - margin_x))
+        y0 = int(max(0, min_y - margin_y))
+        x1 = int(min(frame_width, max_x + margin_x))
+        y1 = int(min(frame_height, max_y + margin_y))
+        if x1 - x0 < self._MIN_ROI_SIZE or y1 - y0 < self._MIN_ROI_SIZE:
+            return None
+        return x0, y0, x1, y1
+
+    def reset(self) -> None:
+        """Forget tracking state so the detector can start on another video."""
+
+        self._pose.reset()
+        if self._roi_pose is not None:
+            self._roi_pose.reset()
+        self._roi = None
+        self._tracking_stale = False
 
     def close(self) -> None:
         self._pose.close()
+        if self._roi_pose is not None:
+            self._roi_pose.close()
+
+
+class MultiPoseDetector:
+    """MediaPipe ``PoseLandmarker`` wrapper that detects up to ``max_people`` poses per frame.
+
+    Runs in video mode, so frames must be passed in order with their
+    timestamps. ROI tracking is not used; ``inference_scale`` applies to the
+    whole frame.
+    """
+
+    def __init__(self, config: DetectorConfig) -> None:
+        if not config.landmarker_model:
+            raise ValueError("Multi-person detection needs a PoseLandmarker model file (landmarker_model)")
+        self.config = config
+        self.params = config.params()
+        self._create()
+
+    def _create(self) -> None:
+        vision = mp.tasks.vision
+        options = vision.PoseLandmarkerOptions(
+            base_options=mp.tasks.BaseOptions(model_asset_path=self.config.landmarker_model),
+            running_mode=vision.RunningMode.VIDEO,
+            num_poses=self.config.max_people,
+            min_pose_detection_confidence=self.config.min_detection_confidence,
+            min_tracking_confidence=self.config.min_tracking_confidence,
+        )
+        self._landmarker = vision.PoseLandmarker.create_from_options(options)
+        self._last_timestamp_ms = -1
+
+    def detect_people(
+        self,
+        rgb_frame: np.ndarray,
+        frame_width: int,
+        frame_height: int,
+        timestamp_s: float,
+    ) -> List[KeypointArray]:
+        """Detect every pose in an RGB frame; one ``KeypointArray`` per person."""
+
+        image = rgb_frame
+        if self.config.inference_scale < 1:
+            image = cv2.resize(
+                image,
+                None,
+                fx=self.config.inference_scale,
+                fy=self.config.inference_scale,
+                interpolation=cv2.INTER_AREA,
+            )
+        mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=np.ascontiguousarray(image))
+        # Video mode requires strictly increasing timestamps.
+        timestamp_ms = max(self._last_timestamp_ms + 1, int(round(timestamp_s * 1000)))
+        self._last_timestamp_ms = timestamp_ms
+        result = self._landmarker.detect_for_video(mp_image, timestamp_ms)
+
+        people = []
+        for pose in result.pose_landmarks:
+            landmarks = np.array([(lm.x, lm.y, lm.z, lm.visibility or 0.0) for lm in pose], dtype=np.float64)
+            data = np.empty((len(JOINT_NAMES), 4), dtype=np.float32)
+            data[:, :3] = landmarks[_LANDMARK_IDS, :3] * (frame_width, frame_height, frame_width)
+            data[:, 3] = landmarks[_LANDMARK_IDS, 3]
+            people.append(KeypointArray(data=data, valid=np.ones(len(JOINT_NAMES), dtype=bool)))
+        return people
+
+    def reset(self) -> None:
+        """Forget tracking state so the detector can start on another video."""
+
+        self._landmarker.close()
+        self._create()
+
+    def close(self) -> None:
+        self._landmarker.close()
+
+
+def create_detector(config: Optional[DetectorConfig] = None) -> PoseDetector | MultiPoseDetector:
+    """``MultiPoseDetector`` when ``config.max_people > 1``, ``PoseDetector`` otherwise."""
+
+    config = config or DetectorConfig()
+    if config.max_people > 1:
+        return MultiPoseDetector(config)
+    return PoseDetector(config)
@@ -2,12 +2,12 @@ from __future__ import annotations
 
 import logging
 from dataclasses import dataclass, field
-from typing import Dict, List, Tuple
+from typing import Dict, Mapping, Optional
 
 import numpy as np
 
-from utils.math_utils import moving_average
-from pose_detector import Keypoint
+from utils.filters import create_filter
+from pose_detector import JOINT_NAMES, Keypoint, KeypointArray, as_keypoint_array
 
 logger = logging.getLogger(__name__)
 
@@ -30,38 +30,78 @@ SKELETON_CONNECTIONS = [
 
 @dataclass
 class SkeletonFrame:
-    keypoints: Dict[str, Keypoint]
-    points_2d: Dict[str, np.ndarray]
-    points_3d: Dict[str, np.ndarray]
+    """Smoothed skeleton of one frame in ``JOINT_NAMES`` order.
 
+    ``positions`` is a ``(joints, 3)`` array and ``valid`` marks present joints.
+    ``fallbacks`` counts joints that reused their last position because of
+    low visibility.
+    """
 
-@dataclass
-class SkeletonBuilder:
-    """Builds 2D and pseudo-3D skeleton from detected keypoints."""
-
-    smoothing_window: int = 5
-    history: Dict[str, List[np.ndarray]] = field(default_factory=dict)
+    keypoints: KeypointArray
+    positions: np.ndarray
+    valid: np.ndarray
+    fallbacks: int = 0
 
-    def _smooth_point(self, name: str, point: np.ndarray) -> np.ndarray:
-        history = self.history.setdefault(name, [])
-        history.append(point)
-        return moving_average(history, self.smoothing_window)
+    @property
+    def points_2d(self) -> Dict[str, np.ndarray]:
+        return {JOINT_NAMES[idx]: self.positions[idx, :2] for idx in np.flatnonzero(self.valid)}
 
-    def build(self, keypoints: Dict[str, Keypoint]) -> SkeletonFrame:
-        points_2d: Dict[str, np.ndarray] = {}
-        points_3d: Dict[str, np.ndarray] = {}
+    @property
+    def points_3d(self) -> Dict[str, np.ndarray]:
+        return {JOINT_NAMES[idx]: self.positions[idx] for idx in np.flatnonzero(self.valid)}
 
-        for name, kp in keypoints.items():
-            point_2d = np.array([kp.x, kp.y], dtype=float)
-            point_3d = np.array([kp.x, kp.y, kp.z], dtype=float)
 
-            # Interpolation: if visibility is low, reuse last valid position.
-            if kp.visibility < 0.5 and name in self.history:
-                point_2d = self.history[name][-1][:2]
-                point_3d = self.history[name][-1]
+@dataclass
+class SkeletonBuilder:
+    """Builds 2D and pseudo-3D skeleton from detected keypoints.
 
-            smoothed = self._smooth_point(name, point_3d)
-            points_2d[name] = smoothed[:2]
-            points_3d[name] = smoothed
+    ``smoothing`` selects a filter from ``utils.filters.FILTERS``; extra filter
+    arguments go in ``filter_params``. For the moving average the window is
+    ``smoothing_window``. State is a fixed-size per-joint buffer, so memory
+    does not grow with video length.
+    """
 
-        return SkeletonFrame(keypoints=keypoints, points_2d=points_2d, points_3d=points_3d)
+    smoothing_window: int = 5
+    smoothing: str = "moving_average"
+    filter_params: Dict[str, float] = field(default_factory=dict)
+    fps: float = 30.0
+
+    def __post_init__(self) -> None:
+        params = dict(self.filter_params)
+        if self.smoothing == "moving_average":
+            params.setdefault("window", self.smoothing_window)
+        self._filter = create_filter(self.smoothing, len(JOINT_NAMES), 3, **params)
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget smoothing state and last valid positions."""
+
+        self._filter.reset()
+        self._last_points = np.zeros((len(JOINT_NAMES), 3), dtype=float)
+        self._has_last = np.zeros(len(JOINT_NAMES), dtype=bool)
+        self._last_timestamp: Optional[float] = None
+
+    def build(
+        self,
+        keypoints: KeypointArray | Mapping[str, Keypoint],
+        timestamp_s: Optional[float] = None,
+    ) -> SkeletonFrame:
+        keypoints = as_keypoint_array(keypoints)
+        valid = keypoints.valid.copy()
+        points = keypoints.xyz.astype(float)
+
+        # Interpolation: if visibility is low, reuse last valid position.
+        fallback = valid & (keypoints.visibility < 0.5) & self._has_last
+        points[fallback] = self._last_points[fallback]
+        self._last_points[valid] = points[valid]
+        self._has_last |= valid
+
+        delta_t = 1.0 / self.fps
+        if timestamp_s is not None:
+            if self._last_timestamp is not None and timestamp_s > self._last_timestamp:
+                delta_t = timestamp_s - self._last_timestamp
+            self._last_timestamp = timestamp_s
+
+        positions = self._filter.update(points, valid, delta_t)
+        positions[~valid] = 0.0
+        return SkeletonFrame(keypoints=keypoints, positions=positions, valid=valid, fallbacks=int(fallback.sum()))
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from pose_detector import KeypointArray
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:  # optional; greedy matching is used instead
+    linear_sum_assignment = None
+
+logger = logging.getLogger(__name__)
+
+
+def skeleton_box(keypoints: KeypointArray) -> np.ndarray:
+    """``(x0, y0, x1, y1)`` bounding box of the valid joints (zeros without any)."""
+
+    if not keypoints.detected:
+        return np.zeros(4)
+    points = keypoints.xyz[keypoints.valid, :2]
+    return np.concatenate((points.min(axis=0), points.max(axis=0))).astype(float)
+
+
+def box_iou(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of ``(n, 4)`` and ``(m, 4)`` boxes as an ``(n, m)`` matrix."""
+
+    a = boxes_a[:, None, :]
+    b = boxes_b[None, :, :]
+    width = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    height = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = width * height
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    union = area_a + area_b - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+
+def match_boxes(iou: np.ndarray, min_iou: float) -> List[Tuple[int, int]]:
+    """Assign rows to columns maximizing total IoU; pairs below ``min_iou`` are dropped.
+
+    Uses the Hungarian algorithm from SciPy when it is installed and greedy
+    highest-IoU-first matching otherwise (the same result for the usual case
+    of well separated people).
+    """
+
+    if iou.size == 0:
+        return []
+    if linear_sum_assignment is not None:
+        rows, cols = linear_sum_assignment(-iou)
+        pairs = zip(rows.tolist(), cols.tolist())
+    else:
+        pairs = []
+        used_rows, used_cols = set(), set()
+        for flat in np.argsort(-iou, axis=None).tolist():
+            row, col = divmod(flat, iou.shape[1])
+            if row not in used_rows and col not in used_cols:
+                used_rows.add(row)
+                used_cols.add(col)
+                pairs.append((row, col))
+    return [(row, col) for row, col in pairs if iou[row, col] >= min_iou]
+
+
+@dataclass
+class Track:
+    track_id: int
+    box: np.ndarray
+    hits: int = 1
+    missed: int = 0
+
+
+@dataclass
+class PersonTracker:
+    """Give detected people persistent IDs by matching skeleton boxes frame to frame.
+
+    Detections are matched to the tracks' last boxes by IoU. Unmatched
+    detections start new tracks; a track unmatched for more than
+    ``max_missed`` frames is removed and its ID listed in ``evicted`` after
+    that ``update``, so per-track state can be released.
+    """
+
+    min_iou: float = 0.3
+    max_missed: int = 15
+    tracks: Dict[int, Track] = field(default_factory=dict)
+    evicted: List[int] = field(default_factory=list)
+    _next_id: int = field(default=1, init=False, repr=False)
+
+    def update(self, people: Sequence[KeypointArray]) -> List[Tuple[int, KeypointArray]]:
+        """Return ``(track_id, keypoints)`` for every detected person, ordered by ID."""
+
+        people = [person for person in people if person.detected]
+        boxes = np.array([skeleton_box(person) for person in people]).reshape(-1, 4)
+        track_ids = list(self.tracks)
+        track_boxes = np.array([self.tracks[track_id].box for track_id in track_ids]).reshape(-1, 4)
+
+        assigned: List[Tuple[int, KeypointArray]] = []
+        matched_people = set()
+        matched_tracks = set()
+        for row, col in match_boxes(box_iou(track_boxes, boxes), self.min_iou):
+            track = self.tracks[track_ids[row]]
+            track.box = boxes[col]
+            track.hits += 1
+            track.missed = 0
+            matched_tracks.add(track.track_id)
+            matched_people.add(col)
+            assigned.append((track.track_id, people[col]))
+
+        self.evicted = []
+        for track_id in track_ids:
+            if track_id in matched_tracks:
+                continue
+            track = self.tracks[track_id]
+            track.missed += 1
+            if track.missed > self.max_missed:
+                del self.tracks[track_id]
+                self.evicted.append(track_id)
+
+        for col, person in enumerate(people):
+            if col in matched_people:
+                continue
+            track = Track(track_id=self._next_id, box=boxes[col])
+            self._next_id += 1
+            self.tracks[track.track_id] = track
+            assigned.append((track.track_id, person))
+        return sorted(assigned, key=lambda item: item[0])
+
+    def reset(self) -> None:
+        """Drop all tracks (their IDs go to ``evicted``); IDs keep counting up."""
+
+        self.evicted = list(self.tracks)
+        self.tracks.clear()
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import math
+from typing import Dict, Type
+
+import numpy as np
+
+
+class JointFilter:
+    """Base class for smoothing filters over a ``(joints, dims)`` array.
+
+    Every joint has its own state, but all joints are updated together with
+    array operations. Only rows selected by ``mask`` are updated; each
+    ``update`` call costs the same regardless of how many frames came before.
+    """
+
+    def __init__(self, joints: int, dims: int = 3) -> None:
+        self.joints = joints
+        self.dims = dims
+        self.reset()
+
+    def reset(self) -> None:
+        self._initialized = np.zeros(self.joints, dtype=bool)
+        self._state = np.zeros((self.joints, self.dims), dtype=float)
+
+    def update(self, points: np.ndarray, mask: np.ndarray, delta_t: float) -> np.ndarray:
+        """Feed the points selected by ``mask`` and return the smoothed array."""
+
+        idx = np.flatnonzero(mask)
+        if idx.size:
+            fresh = idx[~self._initialized[idx]]
+            self._state[fresh] = points[fresh]
+            seen = idx[self._initialized[idx]]
+            if seen.size:
+                self._step(seen, points[seen], max(delta_t, 1e-6))
+            self._initialized[fresh] = True
+            self._after_init(fresh)
+        return self._state.copy()
+
+    def _step(self, idx: np.ndarray, points: np.ndarray, delta_t: float) -> None:
+        raise NotImplementedError
+
+    def _after_init(self, idx: np.ndarray) -> None:
+        """Hook for filters that keep extra state per joint."""
+
+
+class MovingAverageFilter(JointFilter):
+    """Moving average over the last ``window`` points using a ring buffer and running sums."""
+
+    def __init__(self, joints: int, dims: int = 3, window: int = 5) -> None:
+        self.window = max(1, int(window))
+        super().__init__(joints, dims)
+
+    def reset(self) -> None:
+        super().reset()
+        self._buffer = np.zeros((self.window, self.joints, self.dims), dtype=float)
+        self._sums = np.zeros((self.joints, self.dims), dtype=float)
+        self._counts = np.zeros(self.joints, dtype=int)
+        self._heads = np.zeros(self.joints, dtype=int)
+
+    def update(self, points: np.ndarray, mask: np.ndarray, delta_t: float) -> np.ndarray:
+        idx = np.flatnonzero(mask)
+        if idx.size:
+            slots = self._heads[idx]
+            full = self._counts[idx] == self.window
+            self._sums[idx] -= np.where(full[:, None], self._buffer[slots, idx], 0.0)
+            self._buffer[slots, idx] = points[idx]
+            self._sums[idx] += points[idx]
+            self._heads[idx] = (slots + 1) % self.window
+            self._counts[idx] = np.minimum(self._counts[idx] + 1, self.window)
+            self._state[idx] = self._sums[idx] / self._counts[idx, None]
+            self._initialized[idx] = True
+        return self._state.copy()
+
+
+class EmaFilter(JointFilter):
+    """Exponential moving average: s_t = alpha * x_t + (1 - alpha) * s_(t-1)."""
+
+    def __init__(self, joints: int, dims: int = 3, alpha: float = 0.5) -> None:
+        self.alpha = float(alpha)
+        super().__init__(joints, dims)
+
+    def _step(self, idx: np.ndarray, points: np.ndarray, delta_t: float) -> None:
+        self._state[idx] += self.alpha * (points - self._state[idx])
+
+
+class OneEuroFilter(JointFilter):
+    """One-Euro filter: an EMA whose cutoff frequency rises with speed.
+
+    Casiez et al., 2012. ``min_cutoff`` (Hz) controls jitter at rest and
+    ``beta`` controls lag during fast motion.
+    """
+
+    def __init__(
+        self,
+        joints: int,
+        dims: int = 3,
+        min_cutoff: float = 1.0,
+        beta: float = 0.05,
+        d_cutoff: float = 1.0,
+    ) -> None:
+        self.min_cutoff = float(min_cutoff)
+        self.beta = float(beta)
+        self.d_cutoff = float(d_cutoff)
+        super().__init__(joints, dims)
+
+    def reset(self) -> None:
+        super().reset()
+        self._derivative = np.zeros((self.joints, self.dims), dtype=float)
+
+    @staticmethod
+    def _alpha(cutoff: np.ndarray | float, delta_t: float) -> np.ndarray | float:
+        tau = 1.0 / (2.0 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / delta_t)
+
+    def _step(self, idx: np.ndarray, points: np.ndarray, delta_t: float) -> None:
+        previous = self._state[idx]
+        derivative = (points - previous) / delta_t
+        self._derivative[idx] += self._alpha(self.d_cutoff, delta_t) * (derivative - self._derivative[idx])
+        cutoff = self.min_cutoff + self.beta * np.abs(self._derivative[idx])
+        self._state[idx] = previous + self._alpha(cutoff, delta_t) * (points - previous)
+
+    def _after_init(self, idx: np.ndarray) -> None:
+        self._derivative[idx] = 0.0
+
+
+class KalmanFilter(JointFilter):
+    """Constant-velocity Kalman filter, independent per joint coordinate.
+
+    State is position and velocity; ``process_noise`` is the white-noise
+    acceleration variance (px^2/s^4) and ``measurement_noise`` the position
+    variance (px^2). The defaults suit pixel coordinates of a moving person.
+    """
+
+    def __init__(
+        self,
+        joints: int,
+        dims: int = 3,
+        process_noise: float = 20000.0,
+        measurement_noise: float = 9.0,
+    ) -> None:
+        self.process_noise = float(process_noise)
+        self.measurement_noise = float(measurement_noise)
+        super().__init__(joints, dims)
+
+    def reset(self) -> None:
+        super().reset()
+        shape = (self.joints, self.dims)
+        self._velocity = np.zeros(shape, dtype=float)
+        # Symmetric 2x2 covariance stored as its three distinct entries.
+        self._p00 = np.zeros(shape, dtype=float)
+        self._p01 = np.zeros(shape, dtype=float)
+        self._p11 = np.zeros(shape, dtype=float)
+
+    def _step(self, idx: np.ndarray, points: np.ndarray, delta_t: float) -> None:
+        q = self.process_noise
+        dt = delta_t
+        position = self._state[idx] + self._velocity[idx] * dt
+        velocity = self._velocity[idx]
+        p00 = self._p00[idx] + dt * (2.0 * self._p01[idx] + dt * self._p11[idx]) + q * dt**4 / 4.0
+        p01 = self._p01[idx] + dt * self._p11[idx] + q * dt**3 / 2.0
+        p11 = self._p11[idx] + q * dt**2
+
+        innovation = points - position
+        gain_s = p00 + self.measurement_noise
+        k0 = p00 / gain_s
+        k1 = p01 / gain_s
+        self._state[idx] = position + k0 * innovation
+        self._velocity[idx] = velocity + k1 * innovation
+        self._p00[idx] = (1.0 - k0) * p00
+        self._p01[idx] = (1.0 - k0) * p01
+        self._p11[idx] = p11 - k1 * p01
+
+    def _after_init(self, idx: np.ndarray) -> None:
+        self._velocity[idx] = 0.0
+        self._p00[idx] = self.measurement_noise
+        self._p01[idx] = 0.0
+        self._p11[idx] = self.process_noise
+
+
+FILTERS: Dict[str, Type[JointFilter]] = {
+    "moving_average": MovingAverageFilter,
+    "ema": EmaFilter,
+    "one_euro": OneEuroFilter,
+    "kalman": KalmanFilter,
+}
+
+
+def create_filter(name: str, joints: int, dims: int = 3, **params: float) -> JointFilter:
+    """Create a smoothing filter by name (see ``FILTERS``)."""
+
+    try:
+        filter_cls = FILTERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown smoothing filter: {name} (expected one of {', '.join(FILTERS)})") from None
+    return filter_cls(joints, dims, **params)
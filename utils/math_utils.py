@@ -1,7 +1,8 @@
 from __future__ import annotations
 
+from collections import deque
 from dataclasses import dataclass
-from typing import Iterable
+from typing import Iterable, Sequence
 
 import numpy as np
 
@@ -36,14 +37,30 @@ def angle_between_vectors(v1: np.ndarray, v2: np.ndarray) -> float:
     return float(np.degrees(np.arccos(cos_theta)))
 
 
+def angles_between_vectors(v1: np.ndarray, v2: np.ndarray) -> np.ndarray:
+    """Vectorized ``angle_between_vectors`` over the last axis, in degrees.
+
+    Pairs with a zero-length vector get an angle of 0.
+    """
+
+    denom = np.linalg.norm(v1, axis=-1) * np.linalg.norm(v2, axis=-1)
+    dot = np.sum(v1 * v2, axis=-1)
+    cos_theta = np.clip(np.divide(dot, denom, out=np.zeros_like(dot), where=denom != 0), -1.0, 1.0)
+    return np.where(denom != 0, np.degrees(np.arccos(cos_theta)), 0.0)
+
+
 def moving_average(values: Iterable[np.ndarray], window: int) -> np.ndarray:
-    """Compute moving average over a window for a sequence of vectors."""
+    """Compute moving average over a window for a sequence of vectors.
 
-    value_list = list(values)
+    Only the last ``window`` values are copied. For per-frame smoothing use
+    ``utils.filters.MovingAverageFilter``, which keeps running sums.
+    """
+
+    window = max(1, window)
+    if isinstance(values, Sequence):
+        value_list = list(values[-window:])
+    else:
+        value_list = list(deque(values, maxlen=window))
     if not value_list:
         return np.array([])
-    window = max(1, window)
-    if len(value_list) < window:
-        return np.mean(np.stack(value_list), axis=0)
-    stacked = np.stack(value_list[-window:])
-    return np.mean(stacked, axis=0)
+    return np.mean(np.stack(value_list), axis=0)
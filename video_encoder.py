@@ -0,0 +1,265 @@
+from __future__ import annotations
+
+import logging
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# "auto" uses ffmpeg when it is on PATH and OpenCV otherwise.
+ENCODER_BACKENDS = ("auto", "ffmpeg", "opencv")
+FFMPEG_CODECS = ("libx264", "libx265")
+FFMPEG_PRESETS = (
+    "ultrafast",
+    "superfast",
+    "veryfast",
+    "faster",
+    "fast",
+    "medium",
+    "slow",
+    "slower",
+    "veryslow",
+)
+
+_END = object()
+
+
+@dataclass(frozen=True)
+class EncoderConfig:
+    """Output video encoder settings.
+
+    ``codec``, ``preset``, and ``crf`` apply to the ffmpeg backend (lower CRF
+    means higher quality and larger files). With ``async_write`` frames are
+    encoded on a background thread fed through a queue of ``queue_size``
+    frames; a full queue makes ``write`` wait for the encoder.
+    """
+
+    backend: str = "auto"
+    codec: str = "libx264"
+    preset: str = "veryfast"
+    crf: int = 23
+    async_write: bool = True
+    queue_size: int = 16
+
+    def __post_init__(self) -> None:
+        if self.backend not in ENCODER_BACKENDS:
+            raise ValueError(f"Unknown encoder backend: {self.backend}")
+        if self.codec not in FFMPEG_CODECS:
+            raise ValueError(f"Unsupported codec: {self.codec}")
+        if self.preset not in FFMPEG_PRESETS:
+            raise ValueError(f"Unknown encoder preset: {self.preset}")
+        if not 0 <= self.crf <= 51:
+            raise ValueError("crf must be between 0 and 51")
+        if self.queue_size < 1:
+            raise ValueError("queue_size must be at least 1")
+
+
+class VideoEncoder:
+    """Writes BGR frames of a fixed size to a video file."""
+
+    def write(self, frame: np.ndarray) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        raise NotImplementedError
+
+
+class OpenCVEncoder(VideoEncoder):
+    """``cv2.VideoWriter`` with the ``mp4v`` codec; always available."""
+
+    def __init__(self, output_path: Path, fps: float, frame_size: Tuple[int, int]) -> None:
+        fourcc = cv2.VideoWriter_fourcc(*"mp4v")
+        self._writer = cv2.VideoWriter(str(output_path), fourcc, fps, frame_size)
+        if not self._writer.isOpened():
+            raise ValueError(f"Unable to open output video for writing: {output_path}")
+
+    def write(self, frame: np.ndarray) -> None:
+        self._writer.write(frame)
+
+    def close(self) -> None:
+        self._writer.release()
+
+
+def ffmpeg_rate(fps: float) -> str:
+    """Frame rate argument for ffmpeg that does not drift against source timestamps.
+
+    NTSC rates (29.97, 59.94, 23.976, ...) become exact rationals such as
+    ``30000/1001``; other rates are passed at full float precision.
+    """
+
+    nominal = round(fps * 1.001)
+    if nominal > 0 and fps != nominal and abs(fps * 1.001 - nominal) < 1e-3:
+        return f"{nominal * 1000}/1001"
+    return repr(float(fps))
+
+
+class FfmpegEncoder(VideoEncoder):
+    """Stream raw BGR frames to an ``ffmpeg`` subprocess over its stdin.
+
+    Output is H.264/H.265 in yuv420p, padded to even dimensions as the
+    codecs require. ffmpeg's stderr goes to a temporary file so a chatty
+    encoder cannot fill a pipe and stall; it is included in errors.
+    """
+
+    def __init__(
+        self,
+        output_path: Path,
+        fps: float,
+        frame_size: Tuple[int, int],
+        codec: str = "libx264",
+        preset: str = "veryfast",
+        crf: int = 23,
+        executable: str = "ffmpeg",
+    ) -> None:
+        width, height = frame_size
+        self.output_path = output_path
+        self._frame_bytes = width * height * 3
+        command: List[str] = [
+            executable,
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-y",
+            "-f",
+            "rawvideo",
+            "-pix_fmt",
+            "bgr24",
+            "-s",
+            f"{width}x{height}",
+            "-r",
+            ffmpeg_rate(fps),
+            "-i",
+            "-",
+            "-an",
+            "-vf",
+            "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+            "-c:v",
+            codec,
+            "-preset",
+            preset,
+            "-crf",
+            str(crf),
+            "-pix_fmt",
+            "yuv420p",
+            "-movflags",
+            "+faststart",
+            str(output_path),
+        ]
+        self._stderr = tempfile.TemporaryFile()
+        try:
+            self._process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=self._stderr)
+        except OSError as exc:
+            self._stderr.close()
+            raise ValueError(f"Unable to start ffmpeg: {exc}") from exc
+
+    def write(self, frame: np.ndarray) -> None:
+        if frame.nbytes != self._frame_bytes:
+            raise ValueError(f"Frame has {frame.nbytes} bytes, expected {self._frame_bytes}")
+        try:
+            self._process.stdin.write(np.ascontiguousarray(frame).data)
+        except BrokenPipeError as exc:
+            self._process.wait()
+            raise RuntimeError(f"ffmpeg exited while encoding {self.output_path}: {self._error_output()}") from exc
+
+    def close(self) -> None:
+        try:
+            self._process.stdin.close()
+        except BrokenPipeError:
+            pass
+        returncode = self._process.wait()
+        message = self._error_output()
+        self._stderr.close()
+        if returncode != 0:
+            raise RuntimeError(f"ffmpeg failed with exit code {returncode} for {self.output_path}: {message}")
+
+    def _error_output(self) -> str:
+        self._stderr.seek(0)
+        return self._stderr.read().decode("utf-8", errors="replace").strip()
+
+
+class AsyncEncoder(VideoEncoder):
+    """Run another encoder on a background thread fed through a bounded queue.
+
+    ``write`` copies the frame (callers reuse their buffers) and returns once
+    it is queued. An encoder error is re-raised from the next ``write`` or
+    from ``close``.
+    """
+
+    def __init__(self, encoder: VideoEncoder, queue_size: int = 16) -> None:
+        self._encoder = encoder
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name="video-encoder", daemon=True)
+        self._thread.start()
+
+    def write(self, frame: np.ndarray) -> None:
+        if self._error is not None:
+            raise self._error
+        self._queue.put(frame.copy())
+
+    def close(self) -> None:
+        self._queue.put(_END)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def _run(self) -> None:
+        try:
+            while True:
+                frame = self._queue.get()
+                if frame is _END:
+                    break
+                if self._error is None:
+                    self._encoder.write(frame)
+        except BaseException as exc:  # noqa: BLE001 - re-raised on the caller's thread
+            self._error = exc
+            logger.error("Video encoder failed: %s", exc)
+            # Keep draining so the producer never blocks on a full queue.
+            while self._queue.get() is not _END:
+                pass
+        finally:
+            try:
+                self._encoder.close()
+            except BaseException as exc:  # noqa: BLE001 - re-raised on the caller's thread
+                if self._error is None:
+                    self._error = exc
+
+
+def resolve_backend(backend: str) -> str:
+    """Pick the concrete backend, falling back to OpenCV when ffmpeg is not installed."""
+
+    if backend == "opencv":
+        return "opencv"
+    if shutil.which("ffmpeg") is not None:
+        return "ffmpeg"
+    if backend == "ffmpeg":
+        logger.warning("ffmpeg not found on PATH, falling back to the OpenCV encoder")
+    return "opencv"
+
+
+def create_encoder(
+    output_path: Path,
+    fps: float,
+    frame_size: Tuple[int, int],
+    config: Optional[EncoderConfig] = None,
+) -> VideoEncoder:
+    config = config or EncoderConfig()
+    backend = resolve_backend(config.backend)
+    encoder: VideoEncoder
+    if backend == "ffmpeg":
+        encoder = FfmpegEncoder(output_path, fps, frame_size, codec=config.codec, preset=config.preset, crf=config.crf)
+    else:
+        encoder = OpenCVEncoder(output_path, fps, frame_size)
+    logger.debug("Encoding %s with %s", output_path, backend)
+    if config.async_write:
+        encoder = AsyncEncoder(encoder, config.queue_size)
+    return encoder
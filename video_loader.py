@@ -1,14 +1,65 @@
 from __future__ import annotations
 
 import logging
-from dataclasses import dataclass
-from typing import Generator, Tuple
+import math
+from dataclasses import dataclass, field
+from typing import Dict, Generator, List, Optional, Sequence, Tuple
 
 import cv2
 import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# Gaps between ranges up to this many source frames are read through instead
+# of seeking, since a seek restarts decoding at the previous keyframe anyway.
+_SEEK_MIN_GAP_FRAMES = 32
+
+
+@dataclass(frozen=True)
+class TimeRange:
+    """A half-open time range ``[start_s, end_s)``; ``end_s=None`` runs to the end."""
+
+    start_s: float = 0.0
+    end_s: Optional[float] = None
+
+    def __post_init__(self) -> None:
+        if self.start_s < 0:
+            raise ValueError("Range start must not be negative")
+        if self.end_s is not None and self.end_s <= self.start_s:
+            raise ValueError(f"Range end {self.end_s}s must be after its start {self.start_s}s")
+
+
+def parse_time(value: str) -> float:
+    """Parse seconds (``"90.5"``), ``"MM:SS"``, or ``"HH:MM:SS"`` to seconds."""
+
+    seconds = 0.0
+    for part in value.strip().split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def parse_time_range(spec: str) -> TimeRange:
+    """Parse ``"START-END"``; either side may be empty (``"1:30-"``, ``"-45"``)."""
+
+    start, sep, end = spec.partition("-")
+    if not sep:
+        raise ValueError(f"Expected START-END, got {spec}")
+    return TimeRange(parse_time(start) if start.strip() else 0.0, parse_time(end) if end.strip() else None)
+
+
+def merge_ranges(ranges: Sequence[TimeRange]) -> List[TimeRange]:
+    """Sort ranges and merge overlapping or touching ones."""
+
+    merged: List[TimeRange] = []
+    for item in sorted(ranges, key=lambda r: r.start_s):
+        last = merged[-1] if merged else None
+        if last is not None and (last.end_s is None or item.start_s <= last.end_s):
+            end = None if last.end_s is None or item.end_s is None else max(last.end_s, item.end_s)
+            merged[-1] = TimeRange(last.start_s, end)
+        else:
+            merged.append(item)
+    return merged
+
 
 @dataclass(frozen=True)
 class VideoMeta:
@@ -20,19 +71,62 @@ class VideoMeta:
 
 @dataclass(frozen=True)
 class FrameData:
+    """A decoded frame; RGB and grayscale views are converted on first access.
+
+    ``segment`` numbers the selected time range the frame belongs to (see
+    ``VideoLoader.selected_frames``); state carried between frames should be
+    reset when it changes.
+
+    ``rgb_buffer`` and ``gray_buffer`` are optional preallocated destinations.
+    When they are shared between frames, ``rgb``/``gray`` of an older frame are
+    overwritten by the next conversion, so read them before moving on.
+    """
+
     index: int
     timestamp_s: float
     bgr: np.ndarray
-    rgb: np.ndarray
-    gray: np.ndarray
+    source_index: int
+    segment: int = 0
+    rgb_buffer: Optional[np.ndarray] = field(default=None, repr=False, compare=False)
+    gray_buffer: Optional[np.ndarray] = field(default=None, repr=False, compare=False)
+    _converted: Dict[int, np.ndarray] = field(default_factory=dict, init=False, repr=False, compare=False)
+
+    @property
+    def rgb(self) -> np.ndarray:
+        return self._convert(cv2.COLOR_BGR2RGB, self.rgb_buffer)
+
+    @property
+    def gray(self) -> np.ndarray:
+        return self._convert(cv2.COLOR_BGR2GRAY, self.gray_buffer)
+
+    def _convert(self, code: int, buffer: Optional[np.ndarray]) -> np.ndarray:
+        converted = self._converted.get(code)
+        if converted is None:
+            converted = cv2.cvtColor(self.bgr, code, dst=buffer)
+            self._converted[code] = converted
+        return converted
 
 
 class VideoLoader:
-    """Loads video frames with FPS normalization and color conversion."""
+    """Loads video frames with FPS normalization and color conversion.
 
-    def __init__(self, path: str, target_fps: float | None = None) -> None:
+    With ``reuse_buffers=True`` all yielded frames share one RGB and one
+    grayscale destination buffer (see ``FrameData``). ``frames_decoded`` and
+    ``frames_dropped`` count source frames retrieved and skipped so far.
+    ``ranges`` limits ``selected_frames()`` to those time ranges.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        target_fps: float | None = None,
+        reuse_buffers: bool = False,
+        ranges: Sequence[TimeRange] = (),
+    ) -> None:
         self.path = path
         self.target_fps = target_fps
+        self.reuse_buffers = reuse_buffers
+        self.ranges = merge_ranges(ranges)
         self._capture = cv2.VideoCapture(path)
         if not self._capture.isOpened():
             raise ValueError(f"Unable to open video file: {path}")
@@ -41,10 +135,18 @@ class VideoLoader:
         self._frame_count = int(self._capture.get(cv2.CAP_PROP_FRAME_COUNT))
         self._width = int(self._capture.get(cv2.CAP_PROP_FRAME_WIDTH))
         self._height = int(self._capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        self._frame_step = 1
-        if target_fps and target_fps > 0:
-            self._frame_step = max(1, round(self._fps / target_fps))
-            logger.info("Normalizing FPS from %.2f to %.2f using step %d", self._fps, target_fps, self._frame_step)
+        self._resample_ratio = 1.0
+        self.frames_decoded = 0
+        self.frames_dropped = 0
+        self._position = 0
+        if target_fps and target_fps > 0 and self._fps > target_fps:
+            self._resample_ratio = self._fps / target_fps
+            logger.info(
+                "Normalizing FPS from %.2f to %.2f (keeping 1 of every %.3f frames)",
+                self._fps,
+                target_fps,
+                self._resample_ratio,
+            )
 
     @property
     def meta(self) -> VideoMeta:
@@ -55,23 +157,115 @@ class VideoLoader:
             height=self._height,
         )
 
-    def frames(self) -> Generator[FrameData, None, None]:
-        """Yield frames with BGR, RGB, and Grayscale representations."""
+    @property
+    def output_fps(self) -> float:
+        """Frame rate of the frames yielded by ``frames()``."""
 
-        idx = 0
-        out_idx = 0
-        while True:
-            ret, frame = self._capture.read()
-            if not ret:
-                break
-            if idx % self._frame_step != 0:
+        return self._fps / self._resample_ratio
+
+    @property
+    def output_frame_count(self) -> int:
+        """Expected number of frames from ``selected_frames()`` (``frame_count`` is an estimate)."""
+
+        total = 0
+        for start, end in self.source_ranges():
+            end = self._frame_count if end is None else min(end, self._frame_count)
+            if end > start:
+                total += math.ceil(end / self._resample_ratio) - math.ceil(start / self._resample_ratio)
+        return total
+
+    def source_ranges(self) -> List[Tuple[int, Optional[int]]]:
+        """Half-open source frame ranges ``(start, end)`` of ``ranges`` (``end=None`` reads to EOF)."""
+
+        if not self.ranges:
+            return [(0, None)]
+        fps = max(self._fps, 1e-6)
+        # The small epsilon keeps 2.0s at 30 fps on frame 60 despite float error.
+        return [
+            (
+                math.ceil(item.start_s * fps - 1e-6),
+                math.ceil(item.end_s * fps - 1e-6) if item.end_s is not None else None,
+            )
+            for item in self.ranges
+        ]
+
+    def _output_index(self, source_idx: int) -> int | None:
+        """Map a source frame index to its output index, or None if it is dropped.
+
+        Output frame k is the source frame nearest to k / target_fps, i.e.
+        round(k * ratio). This handles non-integer ratios such as 59.94 -> 25
+        and reduces to ``idx % step == 0`` for integer ratios.
+        """
+
+        if self._resample_ratio == 1.0:
+            return source_idx
+        out_idx = round(source_idx / self._resample_ratio)
+        if round(out_idx * self._resample_ratio) != source_idx:
+            return None
+        return out_idx
+
+    def selected_frames(self) -> Generator[FrameData, None, None]:
+        """Yield the frames of every range in ``ranges`` (all frames without ranges).
+
+        Each range is its own ``segment``; timestamps and indices stay those
+        of the full video.
+        """
+
+        for segment, (start, end) in enumerate(self.source_ranges()):
+            yield from self.frames(start, end, segment=segment)
+
+    def _seek(self, source_idx: int) -> None:
+        gap = source_idx - self._position
+        if 0 <= gap <= _SEEK_MIN_GAP_FRAMES:
+            for _ in range(gap):
+                if not self._capture.grab():
+                    break
+        else:
+            self._capture.set(cv2.CAP_PROP_POS_FRAMES, source_idx)
+        self._position = source_idx
+
+    def frames(
+        self,
+        start_frame: int = 0,
+        end_frame: int | None = None,
+        segment: int = 0,
+    ) -> Generator[FrameData, None, None]:
+        """Yield frames with BGR, RGB, and Grayscale representations.
+
+        ``start_frame``/``end_frame`` select a half-open range of source frames;
+        the capture seeks to ``start_frame`` (short gaps are read through).
+        Dropped frames are only grabbed, so they are never decoded into images.
+        """
+
+        rgb_buffer = gray_buffer = None
+        if self.reuse_buffers:
+            rgb_buffer = np.empty((self._height, self._width, 3), dtype=np.uint8)
+            gray_buffer = np.empty((self._height, self._width), dtype=np.uint8)
+
+        idx = max(0, start_frame)
+        if idx != self._position:
+            self._seek(idx)
+        while (end_frame is None or idx < end_frame) and self._capture.grab():
+            self._position = idx + 1
+            out_idx = self._output_index(idx)
+            if out_idx is None:
+                self.frames_dropped += 1
                 idx += 1
                 continue
-            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            timestamp_s = out_idx / max(self._fps / self._frame_step, 1e-6)
-            yield FrameData(index=out_idx, timestamp_s=timestamp_s, bgr=frame, rgb=rgb, gray=gray)
-            out_idx += 1
+            ret, frame = self._capture.retrieve()
+            if not ret:
+                break
+            self.frames_decoded += 1
+            timestamp_s = idx / max(self._fps, 1e-6)
+            yield FrameData(
+                index=out_idx,
+                timestamp_s=timestamp_s,
+                bgr=frame,
+                source_index=idx,
+                segment=segment,
+                rgb_buffer=rgb_buffer,
+                gray_buffer=gray_buffer,
+            )
             idx += 1
 
     def release(self) -> None:
@@ -1,57 +1,259 @@
 from __future__ import annotations
 
+import json
 import logging
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, Iterable, Tuple
+from typing import IO, Mapping, Optional, Sequence, Tuple
 
 import cv2
 import numpy as np
 
 from motion_analysis import MotionReport
+from pose_detector import JOINT_INDEX, JOINT_NAMES, points_to_array
 from skeleton_builder import SKELETON_CONNECTIONS
+from video_encoder import EncoderConfig, create_encoder
 
 logger = logging.getLogger(__name__)
 
+# "burn_in" draws on the source frames, "overlay" draws on a black background
+# (a keyable track without the source picture), "sidecar" writes skeleton data
+# only (see ``SkeletonTrackWriter``).
+RENDER_MODES = ("burn_in", "overlay", "sidecar")
+
+_CONNECTION_A = np.array([JOINT_INDEX[a] for a, _ in SKELETON_CONNECTIONS])
+_CONNECTION_B = np.array([JOINT_INDEX[b] for _, b in SKELETON_CONNECTIONS])
+
+# Fixed-point bits for sub-pixel drawing when anti-aliasing is on.
+_AA_SHIFT = 4
+
+# Bone colors (BGR) cycled over track IDs in multi-person overlays.
+_TRACK_COLORS = (
+    (0, 255, 255),
+    (255, 0, 255),
+    (0, 255, 0),
+    (255, 255, 0),
+    (0, 128, 255),
+    (255, 128, 0),
+)
+
+
+@dataclass(frozen=True)
+class OverlayStyle:
+    """Skeleton drawing style; joint colors go from blue (still) to red at ``max_speed`` px/s."""
+
+    joint_radius: int = 5
+    line_thickness: int = 2
+    line_color: Tuple[int, int, int] = (0, 255, 255)
+    max_speed: float = 50.0
+    antialias: bool = False
+
+    @property
+    def line_type(self) -> int:
+        return cv2.LINE_AA if self.antialias else cv2.LINE_8
+
+
+def speed_color_table(levels: int = 256) -> np.ndarray:
+    """BGR lookup table indexed by speed quantized to ``levels`` steps of [0, max_speed]."""
+
+    norm = np.linspace(0.0, 1.0, levels)
+    table = np.zeros((levels, 3), dtype=np.int32)
+    table[:, 0] = (255 * (1 - norm)).astype(np.int32)
+    table[:, 2] = (255 * norm).astype(np.int32)
+    return table
+
+
+def joint_speeds(report: MotionReport) -> np.ndarray:
+    """Speed of every joint in ``JOINT_NAMES`` order (0 where not measured)."""
+
+    if report.velocities is not None:
+        speeds = np.linalg.norm(report.velocities, axis=1)
+        if report.valid is not None:
+            speeds = np.where(report.valid, speeds, 0.0)
+        return speeds
+    speeds = np.zeros(len(JOINT_NAMES))
+    for joint, metrics in report.joint_metrics.items():
+        speeds[JOINT_INDEX[joint]] = float(np.linalg.norm(metrics.velocity))
+    return speeds
+
 
 @dataclass
 class Visualizer:
+    """Draw the skeleton overlay and write it as a video.
+
+    ``mode="burn_in"`` draws on the source frames. ``mode="overlay"`` draws
+    on a black canvas of ``frame_size`` instead, so source frames are not
+    needed and the track can be composited later. ``encoder`` selects the
+    video encoder backend (see ``video_encoder``).
+    """
+
     output_path: Path
     fps: float
     frame_size: Tuple[int, int]
+    style: OverlayStyle = field(default_factory=OverlayStyle)
+    mode: str = "burn_in"
+    encoder: Optional[EncoderConfig] = None
 
     def __post_init__(self) -> None:
-        fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-        self._writer = cv2.VideoWriter(str(self.output_path), fourcc, self.fps, self.frame_size)
-        if not self._writer.isOpened():
-            raise ValueError(f"Unable to open output video for writing: {self.output_path}")
-
-    def draw(self, frame: np.ndarray, points_2d: Dict[str, np.ndarray], report: MotionReport) -> None:
-        """Draw skeleton on a BGR frame with color indicating joint speed."""
-
-        for joint, metrics in report.joint_metrics.items():
-            speed = float(np.linalg.norm(metrics.velocity))
-            color = self._speed_color(speed)
-            if joint in points_2d:
-                x, y = points_2d[joint].astype(int)
-                cv2.circle(frame, (x, y), 5, color, thickness=-1)
-
-        for a, b in SKELETON_CONNECTIONS:
-            if a in points_2d and b in points_2d:
-                pt_a = tuple(points_2d[a].astype(int))
-                pt_b = tuple(points_2d[b].astype(int))
-                cv2.line(frame, pt_a, pt_b, (0, 255, 255), thickness=2)
+        if self.mode not in ("burn_in", "overlay"):
+            raise ValueError(f"Unsupported video render mode: {self.mode}")
+        self._writer = create_encoder(self.output_path, self.fps, self.frame_size, self.encoder)
+        self._colors = speed_color_table()
+        self._canvas: Optional[np.ndarray] = None
+        if self.mode == "overlay":
+            width, height = self.frame_size
+            self._canvas = np.zeros((height, width, 3), dtype=np.uint8)
+
+    def draw(
+        self,
+        frame: Optional[np.ndarray],
+        points_2d: Mapping[str, np.ndarray] | np.ndarray,
+        report: MotionReport,
+        valid: Optional[np.ndarray] = None,
+    ) -> None:
+        """Render the skeleton and write the frame to the video."""
 
+        self.write(self.render(frame, points_2d, report, valid))
+
+    def render(
+        self,
+        frame: Optional[np.ndarray],
+        points_2d: Mapping[str, np.ndarray] | np.ndarray,
+        report: MotionReport,
+        valid: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Draw skeleton with color indicating joint speed and return the drawn image.
+
+        ``points_2d`` is a ``{joint: point}`` mapping or a ``(joints, >=2)`` array
+        in ``JOINT_NAMES`` order with an optional ``valid`` mask. In
+        ``"burn_in"`` mode the BGR ``frame`` is drawn on in place; in
+        ``"overlay"`` mode ``frame`` is ignored (it may be None) and the
+        cleared canvas is drawn on instead.
+        """
+
+        if self._canvas is not None:
+            self._canvas.fill(0)
+            frame = self._canvas
+        self._draw_skeleton(frame, points_2d, report, valid, self.style.line_color)
+        return frame
+
+    def render_people(
+        self,
+        frame: Optional[np.ndarray],
+        people: Sequence[Tuple[int, np.ndarray, np.ndarray, MotionReport]],
+    ) -> np.ndarray:
+        """Draw several tracked skeletons and return the drawn image.
+
+        ``people`` holds ``(track_id, positions, valid, report)`` per person;
+        each track gets its own bone color and an ID label.
+        """
+
+        if self._canvas is not None:
+            self._canvas.fill(0)
+            frame = self._canvas
+        for track_id, positions, valid, report in people:
+            color = _TRACK_COLORS[(track_id - 1) % len(_TRACK_COLORS)]
+            self._draw_skeleton(frame, positions, report, valid, color)
+            if valid.any():
+                x, y = positions[valid, :2].min(axis=0)
+                cv2.putText(
+                    frame,
+                    f"#{track_id}",
+                    (int(x), max(12, int(y) - 8)),
+                    cv2.FONT_HERSHEY_SIMPLEX,
+                    0.5,
+                    color,
+                    1,
+                    self.style.line_type,
+                )
+        return frame
+
+    def _draw_skeleton(
+        self,
+        frame: np.ndarray,
+        points_2d: Mapping[str, np.ndarray] | np.ndarray,
+        report: MotionReport,
+        valid: Optional[np.ndarray],
+        line_color: Tuple[int, int, int],
+    ) -> None:
+        """Draw speed-colored joints and ``line_color`` bones on ``frame`` in place."""
+
+        if isinstance(points_2d, np.ndarray):
+            points = points_2d[:, :2]
+            if valid is None:
+                valid = np.ones(len(JOINT_NAMES), dtype=bool)
+        else:
+            points, valid = points_to_array(points_2d, dims=2)
+
+        style = self.style
+        shift = _AA_SHIFT if style.antialias else 0
+        if shift:
+            pixels = np.rint(points * (1 << shift)).astype(np.int32)
+        else:
+            pixels = points.astype(np.int32)
+
+        if report.valid is not None:
+            measured = report.valid
+        else:
+            measured = np.isin(np.arange(len(JOINT_NAMES)), [JOINT_INDEX[joint] for joint in report.joint_metrics])
+        drawn = np.flatnonzero(valid & measured)
+        if drawn.size:
+            levels = len(self._colors) - 1
+            speed_idx = np.minimum(joint_speeds(report)[drawn] / style.max_speed, 1.0) * levels
+            colors = self._colors[speed_idx.astype(np.int32)].tolist()
+            radius = style.joint_radius << shift
+            for (x, y), color in zip(pixels[drawn].tolist(), colors):
+                cv2.circle(frame, (x, y), radius, color, thickness=-1, lineType=style.line_type, shift=shift)
+
+        connected = valid[_CONNECTION_A] & valid[_CONNECTION_B]
+        if connected.any():
+            segments = np.stack((pixels[_CONNECTION_A[connected]], pixels[_CONNECTION_B[connected]]), axis=1)
+            cv2.polylines(
+                frame,
+                list(segments),
+                False,
+                line_color,
+                thickness=style.line_thickness,
+                lineType=style.line_type,
+                shift=shift,
+            )
+
+    def write(self, frame: np.ndarray) -> None:
         self._writer.write(frame)
 
     def close(self) -> None:
-        self._writer.release()
+        self._writer.close()
+
 
-    @staticmethod
-    def _speed_color(speed: float) -> Tuple[int, int, int]:
-        """Map speed to BGR color (slow=blue, fast=red)."""
+class SkeletonTrackWriter:
+    """Write skeleton data for rendering elsewhere, without encoding any video.
 
-        speed_norm = min(speed / 50.0, 1.0)
-        blue = int(255 * (1 - speed_norm))
-        red = int(255 * speed_norm)
-        return (blue, 0, red)
+    The JSON Lines file starts with a header (fps, frame size, joint names,
+    connections) followed by one line per frame with the timestamp, 2D
+    pixel positions (``null`` for missing joints), and joint speeds.
+    """
+
+    def __init__(self, output_path: Path, fps: float, frame_size: Tuple[int, int]) -> None:
+        self.output_path = output_path
+        self._handle: IO[str] = output_path.open("w", encoding="utf-8")
+        header = {
+            "fps": fps,
+            "width": frame_size[0],
+            "height": frame_size[1],
+            "joints": list(JOINT_NAMES),
+            "connections": [[int(a), int(b)] for a, b in zip(_CONNECTION_A, _CONNECTION_B)],
+        }
+        self._handle.write(json.dumps(header) + "\n")
+
+    def write_frame(self, timestamp_s: float, positions: np.ndarray, valid: np.ndarray, report: MotionReport) -> None:
+        points = np.round(positions[:, :2], 1).tolist()
+        speeds = np.round(joint_speeds(report), 2).tolist()
+        frame = {
+            "t": round(timestamp_s, 6),
+            "points": [point if ok else None for point, ok in zip(points, valid.tolist())],
+            "speeds": speeds,
+        }
+        self._handle.write(json.dumps(frame) + "\n")
+
+    def close(self) -> None:
+        self._handle.close()